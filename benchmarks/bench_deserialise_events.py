@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   bench_deserialise_events.py
+
+@Time    :   2021/4/29 10:12 上午
+
+@Desc    :   比较通过类型注册表和遍历子类两种方式反序列化事件的耗时
+
+"""
+
+import argparse
+import timeit
+from typing import Any, Dict, List, Optional, Text, Type
+
+import wechatter.shared.utils.common
+from wechatter.shared.dm.events import (
+    ActionExecuted,
+    BotUttered,
+    Event,
+    SlotSet,
+    UserUttered,
+    deserialise_events,
+)
+
+
+def serialised_tracker(number_of_events: int) -> List[Dict[Text, Any]]:
+    """Returns the serialised events of a tracker with `number_of_events` events."""
+    turn = [
+        UserUttered("hello", {"name": "greet", "confidence": 1.0}),
+        SlotSet("name", "Xu"),
+        ActionExecuted("utter_greet"),
+        BotUttered("Hi!"),
+        ActionExecuted("action_listen"),
+    ]
+    return [turn[i % len(turn)].as_dict() for i in range(number_of_events)]
+
+
+def _resolve_by_scanning(
+    type_name: Text, default: Optional[Type[Event]] = None
+) -> Optional[Type[Event]]:
+    # resolution without the registry, as it was done before
+    for cls in wechatter.shared.utils.common.all_subclasses(Event):
+        if cls.type_name == type_name:
+            return cls
+    return default
+
+
+def main(number_of_events: int = 2000, repeat: int = 20) -> None:
+    serialised = serialised_tracker(number_of_events)
+
+    with_registry = timeit.timeit(lambda: deserialise_events(serialised), number=repeat)
+
+    resolve_by_type = Event.resolve_by_type
+    Event.resolve_by_type = staticmethod(_resolve_by_scanning)
+    try:
+        with_scan = timeit.timeit(lambda: deserialise_events(serialised), number=repeat)
+    finally:
+        Event.resolve_by_type = resolve_by_type
+
+    print(f"deserialise_events of {number_of_events} events:")
+    print(f"  type registry:      {with_registry / repeat * 1000:8.2f} ms")
+    print(f"  subclass scanning:  {with_scan / repeat * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the deserialization of events."
+    )
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.events, args.repeat)
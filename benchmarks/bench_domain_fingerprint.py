@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   bench_domain_fingerprint.py
+
+@Time    :   2021/4/29 10:45 下午
+
+@Desc    :   比较大domain指纹的计算耗时：md5和缩进的json、blake2b和紧凑的json、缓存的指纹
+
+"""
+
+import argparse
+import timeit
+from typing import Any, Dict, Text
+
+import wechatter.shared.utils.common
+import wechatter.shared.utils.io
+from wechatter.shared.dm.domain import KEY_ACTIONS, KEY_INTENTS, Domain
+
+
+def create_domain(number_of_intents: int) -> Domain:
+    """Creates a domain with an intent, a response and an action per topic."""
+    return Domain.from_dict(
+        {
+            "intents": [f"intent_{i}" for i in range(number_of_intents)],
+            "entities": ["city", "people"],
+            "slots": {
+                "city": {"type": "text"},
+                "people": {"type": "float", "min_value": 1, "max_value": 20},
+            },
+            "responses": {
+                f"utter_topic_{i}": [
+                    {"text": f"Here is what I know about topic {i}."},
+                    {"text": f"Topic {i} in {{city}}, for {{people}} people."},
+                ]
+                for i in range(number_of_intents)
+            },
+            "actions": [f"action_topic_{i}" for i in range(number_of_intents)],
+        }
+    )
+
+
+def _fingerprint_dict(domain: Domain) -> Dict[Text, Any]:
+    self_as_dict = domain.as_dict()
+    self_as_dict[
+        KEY_INTENTS
+    ] = wechatter.shared.utils.common.sort_list_of_dicts_by_first_key(
+        self_as_dict[KEY_INTENTS]
+    )
+    self_as_dict[KEY_ACTIONS] = domain.action_names_or_texts
+    return self_as_dict
+
+
+def md5_fingerprint(domain: Domain) -> Text:
+    """How the fingerprint was computed before, on every call."""
+    return wechatter.shared.utils.io.get_dictionary_fingerprint(
+        _fingerprint_dict(domain)
+    )
+
+
+def uncached_fingerprint(domain: Domain) -> Text:
+    domain._fingerprint = None
+    return domain.fingerprint()
+
+
+def main(number_of_intents: int = 3000, repeat: int = 20) -> None:
+    domain = create_domain(number_of_intents)
+    same = create_domain(number_of_intents)
+    if domain.fingerprint() != same.fingerprint() or hash(domain) != hash(same):
+        raise ValueError("The fingerprint isn't stable.")
+    changed = create_domain(number_of_intents)
+    changed.responses = dict(changed.responses, utter_topic_0=[{"text": "changed"}])
+    if changed.fingerprint() == domain.fingerprint():
+        raise ValueError("The fingerprint didn't change with the domain.")
+
+    print(
+        f"fingerprint of a domain with {number_of_intents} intents, responses and "
+        f"actions:"
+    )
+    print(f"  {'fingerprint':36} {'ms/call':>10}")
+    fingerprints = [
+        ("as_dict() only", lambda: _fingerprint_dict(domain)),
+        ("md5, indented JSON (before)", lambda: md5_fingerprint(domain)),
+        ("blake2b, compact JSON, first call", lambda: uncached_fingerprint(domain)),
+        ("memoized hash()", lambda: hash(domain)),
+    ]
+    for name, fingerprint in fingerprints:
+        seconds = timeit.timeit(fingerprint, number=repeat) / repeat
+        print(f"  {name:36} {seconds * 1000:10.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the fingerprint of large domains."
+    )
+    parser.add_argument("--intents", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.intents, args.repeat)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   bench_domain_from_directory.py
+
+@Time    :   2021/4/29 5:10 下午
+
+@Desc    :   比较重复解析、逐个解析和多线程解析目录中domain文件的耗时
+
+"""
+
+import argparse
+import concurrent.futures
+import os
+import shutil
+import tempfile
+import timeit
+from typing import Callable, Dict, List, Text
+
+from wechatter.shared.data import is_likely_yaml_file
+from wechatter.shared.dm.domain import Domain, DomainBuilder
+
+
+def create_skills(directory: Text, number_of_skills: int) -> None:
+    """Creates a tree with a domain, a NLU and an invalid YAML file per skill."""
+    for i in range(number_of_skills):
+        skill_directory = os.path.join(directory, f"group_{i % 20}", f"skill_{i}")
+        os.makedirs(skill_directory)
+
+        intents = "".join(f"- skill_{i}_intent_{j}\n" for j in range(10))
+        responses = "".join(
+            f"  utter_skill_{i}_{j}:\n  - text: response {j}\n" for j in range(10)
+        )
+        with open(os.path.join(skill_directory, "domain.yml"), "w") as f:
+            f.write(f'version: "2.0"\nintents:\n{intents}responses:\n{responses}')
+        with open(os.path.join(skill_directory, "nlu.yml"), "w") as f:
+            f.write(
+                'version: "2.0"\nnlu:\n- intent: greet\n  examples: |\n    - hello\n'
+            )
+        with open(os.path.join(skill_directory, "broken.yml"), "w") as f:
+            f.write("key: [\n")
+
+
+def parse_twice(directory: Text) -> Domain:
+    """Checks every file with `is_domain_file` and parses it again to load it."""
+    builder = DomainBuilder(override=True)
+    for root, _, files in os.walk(directory, followlinks=True):
+        for file in files:
+            path = os.path.join(root, file)
+            if Domain.is_domain_file(path):
+                builder.add(Domain.from_file(path))
+    return builder.build()
+
+
+def _candidates(directory: Text) -> List[Text]:
+    return [
+        os.path.join(root, file)
+        for root, _, files in os.walk(directory, followlinks=True)
+        for file in files
+        if is_likely_yaml_file(file)
+    ]
+
+
+def parse_threaded(directory: Text) -> Domain:
+    """Parses every file once, the files are parsed in a thread pool."""
+    builder = DomainBuilder(override=True)
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        # `map` keeps the order of the files
+        for domain in executor.map(Domain._from_domain_file, _candidates(directory)):
+            builder.add(domain)
+    return builder.build()
+
+
+def main(number_of_skills: int = 200, repeat: int = 3) -> None:
+    directory = tempfile.mkdtemp()
+    try:
+        create_skills(directory, number_of_skills)
+
+        loaders: Dict[Text, Callable[[Text], Domain]] = {
+            "parse twice": parse_twice,
+            "parse once": Domain.from_directory,
+            "threaded": parse_threaded,
+        }
+        fingerprints = {
+            name: load(directory).fingerprint() for name, load in loaders.items()
+        }
+        if len(set(fingerprints.values())) != 1:
+            raise ValueError(f"The loaders disagree: {fingerprints}.")
+
+        number_of_files = 3 * number_of_skills
+        print(f"loading a tree of {number_of_files} files ({number_of_skills} domains):")
+        print(f"  {'loader':12} {'seconds':>8} {'files/s':>8}")
+        for name, load in loaders.items():
+            seconds = timeit.timeit(lambda: load(directory), number=repeat) / repeat
+            print(f"  {name:12} {seconds:8.3f} {number_of_files / seconds:8.0f}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmarks loading the domain files of a directory tree."
+    )
+    parser.add_argument("--skills", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.skills, args.repeat)
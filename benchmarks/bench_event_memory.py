@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   bench_event_memory.py
+
+@Time    :   2021/4/29 10:20 下午
+
+@Desc    :   用tracemalloc测量反序列化后用户消息事件占用的内存
+
+"""
+
+import argparse
+import gc
+import json
+import tracemalloc
+from typing import Any, Callable, Dict, List, Text
+
+from wechatter.shared.dm.events import Event, UserUttered
+
+
+def serialised_user_events(number_of_events: int) -> List[Dict[Text, Any]]:
+    """Returns distinct serialised user messages as they are persisted."""
+    events = []
+    for i in range(number_of_events):
+        intent = {"name": "book_table", "confidence": 0.9 + i % 100 / 1000}
+        event = UserUttered(
+            f"I would like to book a table for {i} people",
+            intent,
+            [{"entity": "people", "value": str(i), "start": 33, "end": 34}],
+            {
+                "intent": intent,
+                "intent_ranking": [intent, {"name": "greet", "confidence": 0.01}],
+            },
+            timestamp=1600000000.0 + i,
+            message_id=f"{i:032x}",
+        )
+        events.append(event.as_dict())
+    # the events are restored from JSON, nothing is shared with the caller
+    return json.loads(json.dumps(events))
+
+
+def _allocated(create: Callable[[], Any]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    created = create()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del created
+    return size
+
+
+def main(number_of_events: int = 10000) -> None:
+    serialised = serialised_user_events(number_of_events)
+    events = [Event.from_parameters(parameters) for parameters in serialised]
+    if [event.as_dict() for event in events] != serialised:
+        raise ValueError("The events are not restored exactly.")
+
+    def restore() -> List[Event]:
+        return [Event.from_parameters(parameters) for parameters in serialised]
+
+    def restore_and_serialise() -> List[Event]:
+        restored = restore()
+        for event in restored:
+            event.as_dict()
+        return restored
+
+    print(f"memory of {number_of_events} restored user messages:")
+    print(f"  {'after':24} {'bytes/event':>12}")
+    for name, create in [
+        ("restoring", restore),
+        ("restoring and as_dict()", restore_and_serialise),
+    ]:
+        print(f"  {name:24} {_allocated(create) / number_of_events:12.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measures the memory of restored user message events."
+    )
+    parser.add_argument("--events", type=int, default=10000)
+    args = parser.parse_args()
+    main(args.events)
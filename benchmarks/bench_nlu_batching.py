@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   bench_nlu_batching.py
+
+@Time    :   2021/4/29 4:05 下午
+
+@Desc    :   用模拟NLU服务比较批量解析和逐条解析的吞吐量
+
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, Text
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from wechatter.dm.interpreter import WechatterNLUHttpInterpreter
+from wechatter.utils.endpoints import EndpointConfig
+
+
+def stub_nlu_server(latency: float, batch_route: bool = True) -> web.Application:
+    """Returns an NLU server which answers every request after `latency` seconds."""
+    app = web.Application()
+    app["stats"] = {"requests": 0}
+
+    def parse_result(message: Dict[Text, Any]) -> Dict[Text, Any]:
+        return {
+            "text": message["text"],
+            "intent": {"name": "greet", "confidence": 1.0},
+            "entities": [],
+        }
+
+    async def parse(request: web.Request) -> web.Response:
+        app["stats"]["requests"] += 1
+        message = await request.json()
+        await asyncio.sleep(latency)
+        return web.json_response(parse_result(message))
+
+    async def parse_batch(request: web.Request) -> web.Response:
+        app["stats"]["requests"] += 1
+        messages = (await request.json())["messages"]
+        await asyncio.sleep(latency)
+        return web.json_response({"results": [parse_result(m) for m in messages]})
+
+    app.router.add_post("/model/parse", parse)
+    if batch_route:
+        app.router.add_post("/model/parse/batch", parse_batch)
+    return app
+
+
+async def _run(
+    number_of_messages: int, latency: float, max_batch_size: int, batch_route: bool
+) -> Dict[Text, float]:
+    app = stub_nlu_server(latency, batch_route)
+    async with TestServer(app) as server:
+        endpoint = EndpointConfig(str(server.make_url("/")))
+        interpreter = WechatterNLUHttpInterpreter(endpoint, max_batch_size)
+        try:
+            start = time.perf_counter()
+            await asyncio.gather(
+                *[interpreter.parse(f"hello {i}") for i in range(number_of_messages)]
+            )
+            duration = time.perf_counter() - start
+        finally:
+            await endpoint.close()
+
+    return {"seconds": duration, "requests": app["stats"]["requests"]}
+
+
+def main(number_of_messages: int = 500, latency: float = 0.005) -> None:
+    setups = {
+        "one by one": (1, True),
+        "batched": (32, True),
+        "no batch route": (32, False),
+    }
+
+    print(f"parsing {number_of_messages} concurrent messages:")
+    for name, (max_batch_size, batch_route) in setups.items():
+        result = asyncio.run(
+            _run(number_of_messages, latency, max_batch_size, batch_route)
+        )
+        print(
+            f"  {name:15} {number_of_messages / result['seconds']:8.0f} messages/s "
+            f"{result['requests']:6} requests"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmarks batched parse requests against a stub NLU server."
+    )
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.005)
+    args = parser.parse_args()
+    main(args.messages, args.latency)
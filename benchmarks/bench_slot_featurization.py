@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   bench_slot_featurization.py
+
+@Time    :   2021/4/29 6:05 下午
+
+@Desc    :   比较逐个slot生成特征和SlotTable读取特征的耗时
+
+"""
+
+import argparse
+import random
+import timeit
+from types import SimpleNamespace
+from typing import Any, Dict, List, Text
+
+from wechatter.shared.dm.domain import Domain
+from wechatter.shared.dm.slots import BooleanSlot, ListSlot, Slot, SlotTable, TextSlot
+
+
+def create_slots(number_of_slots: int) -> List[Slot]:
+    """Creates text, boolean and list slots, every tenth slot is unfeaturized."""
+    slot_classes = [TextSlot, BooleanSlot, ListSlot]
+    return [
+        slot_classes[i % len(slot_classes)](
+            f"slot_{i}", influence_conversation=i % 10 != 0
+        )
+        for i in range(number_of_slots)
+    ]
+
+
+def turns(slot_names: List[Text], number_of_turns: int) -> List[Dict[Text, Any]]:
+    """Creates the slots which are set in every turn."""
+    rng = random.Random(42)
+    values = [None, "value", True, False, ["item"], []]
+    return [
+        {name: rng.choice(values) for name in rng.sample(slot_names, 3)}
+        for _ in range(number_of_turns)
+    ]
+
+
+def featurize(slots: Dict[Text, Slot], slot_values: List[Dict[Text, Any]]) -> None:
+    tracker = SimpleNamespace(slots=slots)
+    for values in slot_values:
+        for name, value in values.items():
+            slots[name].value = value
+        Domain._get_slots_sub_state(tracker)
+
+
+def main(number_of_slots: int = 300, number_of_turns: int = 2000) -> None:
+    slot_values = turns([f"slot_{i}" for i in range(number_of_slots)], number_of_turns)
+
+    slots = {slot.name: slot for slot in create_slots(number_of_slots)}
+    table = SlotTable(create_slots(number_of_slots))
+    featurize(slots, slot_values)
+    featurize(table, slot_values)
+    if Domain._get_slots_sub_state(
+        SimpleNamespace(slots=slots)
+    ) != table.sub_state():
+        raise ValueError("The slot table doesn't featurize like the slots.")
+
+    print(
+        f"setting 3 of {number_of_slots} slots and featurizing all slots, "
+        f"{number_of_turns} turns:"
+    )
+    print(f"  {'slots':12} {'seconds':>8} {'turns/s':>8}")
+    for name, slot_store in [("per slot", slots), ("slot table", table)]:
+        seconds = timeit.timeit(lambda: featurize(slot_store, slot_values), number=1)
+        print(f"  {name:12} {seconds:8.3f} {number_of_turns / seconds:8.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmarks featurizing slots with and without a slot table."
+    )
+    parser.add_argument("--slots", type=int, default=300)
+    parser.add_argument("--turns", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.slots, args.turns)
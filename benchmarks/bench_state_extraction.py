@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   bench_state_extraction.py
+
+@Time    :   2021/4/29 7:20 下午
+
+@Desc    :   比较逐轮生成状态和单次遍历提取长对话状态的耗时
+
+"""
+
+import argparse
+import random
+import timeit
+from typing import List
+
+from wechatter.shared.dm.domain import Domain, State
+from wechatter.shared.dm.events import (
+    ActionExecuted,
+    BotUttered,
+    Event,
+    SessionStarted,
+    SlotSet,
+    UserUttered,
+)
+from wechatter.shared.dm.trackers import DialogueStateTracker
+
+
+def create_domain(number_of_slots: int) -> Domain:
+    slot_types = ["text", "bool", "list"]
+    slots = "".join(
+        f"  slot_{i}:\n    type: {slot_types[i % len(slot_types)]}\n"
+        for i in range(number_of_slots)
+    )
+    return Domain.from_yaml(
+        'version: "2.0"\n'
+        "intents:\n- greet\n- inform\n- affirm\n"
+        "entities:\n- city\n"
+        f"slots:\n{slots}"
+        "actions:\n- action_search\n- action_book\n"
+    )
+
+
+def create_conversation(number_of_turns: int, number_of_slots: int) -> List[Event]:
+    """Creates a conversation in which every turn sets two slots."""
+    rng = random.Random(42)
+    events = [
+        ActionExecuted("action_session_start"),
+        SessionStarted(),
+        ActionExecuted("action_listen"),
+    ]
+    for _ in range(number_of_turns):
+        entities = [{"entity": "city", "value": "Berlin"}] if rng.random() < 0.5 else []
+        intent = rng.choice(["greet", "inform", "affirm"])
+        events.append(UserUttered("hi", {"name": intent}, entities))
+        for slot in rng.sample(range(number_of_slots), 2):
+            events.append(SlotSet(f"slot_{slot}", rng.choice([None, "value", True])))
+        events.append(ActionExecuted(rng.choice(["action_search", "action_book"])))
+        events.append(BotUttered("ok"))
+        events.append(ActionExecuted("action_listen"))
+    return events
+
+
+def states_of_prior_trackers(
+    domain: Domain, tracker: DialogueStateTracker
+) -> List[State]:
+    """Creates the states from scratch for every prior tracker."""
+    return [
+        domain.get_active_states(prior_tracker)
+        for prior_tracker, _ in tracker.generate_all_prior_trackers()
+    ]
+
+
+def main(number_of_turns: int = 1000, number_of_slots: int = 100) -> None:
+    domain = create_domain(number_of_slots)
+    tracker = DialogueStateTracker.from_events(
+        "benchmark",
+        create_conversation(number_of_turns, number_of_slots),
+        domain.slots,
+    )
+    if states_of_prior_trackers(domain, tracker) != domain.states_for_tracker_history(
+        tracker
+    ):
+        raise ValueError("The extracted states differ.")
+
+    print(
+        f"extracting the states of {len(tracker.events)} events "
+        f"({number_of_turns} turns, {number_of_slots} slots):"
+    )
+    print(f"  {'extraction':14} {'seconds':>8} {'events/s':>9}")
+    extractions = [
+        ("prior trackers", lambda: states_of_prior_trackers(domain, tracker)),
+        ("single pass", lambda: domain.states_for_tracker_history(tracker)),
+    ]
+    for name, extract in extractions:
+        seconds = timeit.timeit(extract, number=1)
+        print(f"  {name:14} {seconds:8.3f} {len(tracker.events) / seconds:9.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmarks extracting the states of a long conversation."
+    )
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--slots", type=int, default=100)
+    args = parser.parse_args()
+    main(args.turns, args.slots)
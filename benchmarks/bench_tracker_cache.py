@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   bench_tracker_cache.py
+
+@Time    :   2021/4/29 8:10 下午
+
+@Desc    :   比较缓存命中（版本校验和反序列化）与从存储中读取对话的耗时
+
+"""
+
+import argparse
+import copy
+import timeit
+
+from wechatter.dm.tracker_store import CachedTrackerStore, InMemoryTrackerStore
+from wechatter.shared.dm.events import (
+    ActionExecuted,
+    BotUttered,
+    SessionStarted,
+    SlotSet,
+    UserUttered,
+)
+from wechatter.shared.dm.trackers import DialogueStateTracker
+
+
+def create_tracker(number_of_turns: int) -> DialogueStateTracker:
+    tracker = DialogueStateTracker("benchmark", None)
+    tracker.update(ActionExecuted("action_session_start"))
+    tracker.update(SessionStarted())
+    tracker.update(ActionExecuted("action_listen"))
+    for i in range(number_of_turns):
+        tracker.update(
+            UserUttered(
+                f"I would like to book a table for {i}",
+                {"name": "book_table", "confidence": 0.97},
+                [{"entity": "people", "value": str(i), "start": 33, "end": 35}],
+            )
+        )
+        tracker.update(SlotSet("people", str(i)))
+        tracker.update(ActionExecuted("utter_ask_time"))
+        tracker.update(BotUttered("When would you like to come?"))
+        tracker.update(ActionExecuted("action_listen"))
+    return tracker
+
+
+def main(number_of_turns: int = 200, repeat: int = 200) -> None:
+    wrapped = InMemoryTrackerStore(None)
+    store = CachedTrackerStore(wrapped, ttl=None)
+    tracker = create_tracker(number_of_turns)
+    wrapped.save(tracker)
+
+    # the first lookup is a miss which caches the tracker
+    store.retrieve("benchmark")
+    if store.retrieve("benchmark") != wrapped.retrieve("benchmark"):
+        raise ValueError("The cached tracker differs from the persisted one.")
+
+    print(
+        f"retrieving a tracker with {len(tracker.events)} events "
+        f"({number_of_turns} turns):"
+    )
+    print(f"  {'lookup':16} {'ms/retrieve':>12}")
+    lookups = [
+        ("tracker store", lambda: wrapped.retrieve("benchmark")),
+        ("cache hit", lambda: store.retrieve("benchmark")),
+        # how cache hits copied the tracker before
+        ("deepcopy", lambda: copy.deepcopy(tracker)),
+    ]
+    for name, lookup in lookups:
+        seconds = timeit.timeit(lookup, number=repeat) / repeat
+        print(f"  {name:16} {seconds * 1000:12.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmarks cache hits of the CachedTrackerStore."
+    )
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    main(args.turns, args.repeat)
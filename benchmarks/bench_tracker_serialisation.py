@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   bench_tracker_serialisation.py
+
+@Time    :   2021/4/29 2:40 下午
+
+@Desc    :   比较JSON和二进制格式序列化对话的大小和速度
+
+"""
+
+import argparse
+import json
+import timeit
+from typing import Any, Callable, Dict, List, Text
+
+from wechatter.shared.dm import binary_format
+from wechatter.shared.dm.conversation import Dialogue
+from wechatter.shared.dm.events import (
+    ActionExecuted,
+    BotUttered,
+    Event,
+    SlotSet,
+    UserUttered,
+)
+
+
+def dialogue(number_of_events: int) -> Dialogue:
+    """Returns a dialogue with `number_of_events` distinct events."""
+    events: List[Event] = []
+    turn = 0
+    while len(events) < number_of_events:
+        events += [
+            UserUttered(
+                f"I would like to book a table for {turn} people",
+                {"name": "book_table", "confidence": 0.9 + turn % 100 / 1000},
+                [{"entity": "people", "value": str(turn), "start": 33, "end": 34}],
+            ),
+            SlotSet("people", str(turn)),
+            ActionExecuted(
+                "utter_ask_time", policy="policy_0_TEDPolicy", confidence=0.9
+            ),
+            BotUttered(f"When would you like to come, party of {turn}?"),
+            ActionExecuted("action_listen"),
+        ]
+        turn += 1
+    return Dialogue("bench", events[:number_of_events])
+
+
+def _measure(
+    encode: Callable[[], Any],
+    decode: Callable[[Any], List[Dict[Text, Any]]],
+    repeat: int,
+) -> Dict[Text, float]:
+    payload = encode()
+
+    def restore() -> Dialogue:
+        return Dialogue.from_parameters({"events": decode(payload)})
+
+    return {
+        "bytes": len(payload),
+        "encode": timeit.timeit(encode, number=repeat) / repeat,
+        "decode": timeit.timeit(lambda: decode(payload), number=repeat) / repeat,
+        "restore": timeit.timeit(restore, number=repeat) / repeat,
+    }
+
+
+def main(number_of_events: int = 2000, repeat: int = 20) -> None:
+    conversation = dialogue(number_of_events)
+    serialised = [event.as_dict() for event in conversation.events]
+    if binary_format.decode_events(
+        binary_format.encode_dialogue(conversation)
+    ) != json.loads(json.dumps(serialised)):
+        raise ValueError("The binary format doesn't restore the events.")
+
+    results = {
+        "json": _measure(
+            lambda: json.dumps(conversation.as_dict()).encode("utf-8"),
+            lambda payload: json.loads(payload)["events"],
+            repeat,
+        ),
+        "binary": _measure(
+            lambda: binary_format.encode_dialogue(conversation),
+            binary_format.decode_events,
+            repeat,
+        ),
+    }
+
+    # decoding the payload returns the serialised events, restoring the dialogue
+    # includes creating the events
+    print(f"serialization of a dialogue with {number_of_events} distinct events:")
+    print(
+        f"  {'format':8} {'bytes/event':>12} {'encode ms':>10} {'decode ms':>10} "
+        f"{'restore ms':>11}"
+    )
+    for name, result in results.items():
+        print(
+            f"  {name:8} {result['bytes'] / number_of_events:12.1f} "
+            f"{result['encode'] * 1000:10.2f} {result['decode'] * 1000:10.2f} "
+            f"{result['restore'] * 1000:11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the JSON and the binary tracker serialization."
+    )
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.events, args.repeat)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   bench_tracker_sessions.py
+
+@Time    :   2021/4/29 9:05 下午
+
+@Desc    :   比较按会话分片存储和整条记录存储的多会话对话的读取和保存耗时
+
+"""
+
+import argparse
+import json
+import timeit
+from typing import List
+
+from wechatter.dm.tracker_store import InMemoryTrackerStore
+from wechatter.shared.dm.events import (
+    ActionExecuted,
+    BotUttered,
+    Event,
+    SessionStarted,
+    SlotSet,
+    UserUttered,
+)
+
+
+def create_conversation(
+    number_of_sessions: int, events_per_session: int
+) -> List[Event]:
+    events = []
+    for session in range(number_of_sessions):
+        events += [
+            ActionExecuted("action_session_start"),
+            SessionStarted(),
+            ActionExecuted("action_listen"),
+        ]
+        for turn in range((events_per_session - 3) // 5):
+            events += [
+                UserUttered(
+                    f"session {session}, turn {turn}",
+                    {"name": "book_table", "confidence": 0.97},
+                ),
+                SlotSet("people", str(turn)),
+                ActionExecuted("utter_ask_time"),
+                BotUttered("When would you like to come?"),
+                ActionExecuted("action_listen"),
+            ]
+    return events
+
+
+def main(number_of_sessions: int = 100, events_per_session: int = 103) -> None:
+    events = create_conversation(number_of_sessions, events_per_session)
+
+    sliced = InMemoryTrackerStore(None)
+    tracker = sliced.init_tracker("benchmark")
+    for event in events:
+        tracker.update(event)
+    sliced.save(tracker)
+
+    # the layout of older versions, a single record which contains all sessions
+    single_record = InMemoryTrackerStore(None)
+    single_record.store["benchmark"] = single_record.serialise_tracker(tracker)
+
+    latest_session = sliced.retrieve("benchmark")
+    if list(latest_session.events) != list(
+        single_record.retrieve("benchmark").events
+    ) or list(sliced.retrieve_full_tracker("benchmark").events) != list(
+        tracker.events
+    ):
+        raise ValueError("The retrieved trackers differ.")
+
+    def rewrite_single_record() -> None:
+        # what saving the latest session did before: decode the whole record to
+        # keep the previous sessions and serialise all of them again
+        json.loads(single_record.store["benchmark"])
+        single_record.serialise_tracker(tracker)
+
+    print(
+        f"a conversation with {len(events)} events in {number_of_sessions} "
+        f"sessions, the latest session has {len(latest_session.events)} events:"
+    )
+    print(f"  {'operation':34} {'ms':>8}")
+    operations = [
+        ("retrieve, single record", lambda: single_record.retrieve("benchmark")),
+        ("retrieve, session slices", lambda: sliced.retrieve("benchmark")),
+        ("save latest session, single record", rewrite_single_record),
+        ("save latest session, slices", lambda: sliced.save(latest_session)),
+    ]
+    for name, operation in operations:
+        seconds = timeit.timeit(operation, number=20) / 20
+        print(f"  {name:34} {seconds * 1000:8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmarks retrieving and saving multi-session conversations."
+    )
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--events-per-session", type=int, default=103)
+    args = parser.parse_args()
+    main(args.sessions, args.events_per_session)
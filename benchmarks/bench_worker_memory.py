@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   bench_worker_memory.py
+
+@Time    :   2021/4/29 11:30 下午
+
+@Desc    :   比较主进程预加载模型后fork和每个worker各自加载模型时worker占用的内存
+
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import tarfile
+import tempfile
+from typing import Any, Dict, List, Optional, Text
+
+import numpy as np
+
+from wechatter.server.launcher import memory_usage
+from wechatter.server.model_manager import ModelManager
+from wechatter.shared.dialogue_config import (
+    DEFAULT_CORE_SUBDIRECTORY_NAME,
+    DEFAULT_DOMAIN_PATH,
+    DEFAULT_NLU_SUBDIRECTORY_NAME,
+)
+from wechatter.shared.nlu.interpreter import NatureLanguageInterpreter
+
+
+class EmbeddingInterpreter(NatureLanguageInterpreter):
+    """Classifies messages with word embeddings, a stand-in for a trained NLU model."""
+
+    def __init__(self, model_directory: Text) -> None:
+        self.embeddings = np.load(os.path.join(model_directory, "embeddings.npy"))
+        self.intent_weights = np.load(os.path.join(model_directory, "intents.npy"))
+        with open(os.path.join(model_directory, "vocabulary.json")) as f:
+            self.vocabulary: Dict[Text, int] = json.load(f)
+        self.intents = [f"intent_{i}" for i in range(self.intent_weights.shape[1])]
+
+    async def parse(
+        self,
+        text: Text,
+        message_id: Optional[Text] = None,
+        tracker: Any = None,
+        metadata: Optional[Dict] = None,
+    ) -> Dict[Text, Any]:
+        ids = [self.vocabulary.get(token, 0) for token in text.split()]
+        scores = self.embeddings[ids].mean(axis=0) @ self.intent_weights
+        best = int(scores.argmax())
+        return {
+            "text": text,
+            "intent": {"name": self.intents[best], "confidence": float(scores[best])},
+            "entities": [],
+        }
+
+
+def create_model(
+    directory: Text, vocabulary_size: int, dimensions: int, number_of_intents: int
+) -> Text:
+    """Packs a model with a large domain and an embedding NLU model."""
+    rng = np.random.default_rng(42)
+    core = os.path.join(directory, DEFAULT_CORE_SUBDIRECTORY_NAME)
+    nlu = os.path.join(directory, DEFAULT_NLU_SUBDIRECTORY_NAME)
+    os.makedirs(core)
+    os.makedirs(nlu)
+
+    with open(os.path.join(core, DEFAULT_DOMAIN_PATH), "w") as f:
+        f.write('version: "2.0"\nintents:\n')
+        f.writelines(f"- intent_{i}\n" for i in range(number_of_intents))
+        f.write("responses:\n")
+        f.writelines(
+            f"  utter_intent_{i}:\n  - text: Response to intent {i}.\n"
+            for i in range(number_of_intents)
+        )
+    np.save(
+        os.path.join(nlu, "embeddings.npy"),
+        rng.standard_normal((vocabulary_size, dimensions), dtype=np.float32),
+    )
+    np.save(
+        os.path.join(nlu, "intents.npy"),
+        rng.standard_normal((dimensions, number_of_intents), dtype=np.float32),
+    )
+    with open(os.path.join(nlu, "vocabulary.json"), "w") as f:
+        json.dump({f"token{i}": i for i in range(vocabulary_size)}, f)
+
+    model_file = os.path.join(directory, "model.tar.gz")
+    with tarfile.open(model_file, "w:gz", compresslevel=1) as tar:
+        tar.add(core, arcname=DEFAULT_CORE_SUBDIRECTORY_NAME)
+        tar.add(nlu, arcname=DEFAULT_NLU_SUBDIRECTORY_NAME)
+    return model_file
+
+
+def _manager(state_directory: Text) -> ModelManager:
+    return ModelManager(
+        state_directory,
+        warm_up_messages=["token1 token2"],
+        interpreter_loader=EmbeddingInterpreter,
+    )
+
+
+def _serve(manager: ModelManager, messages: List[Text]) -> None:
+    """Parses messages like a worker which serves requests."""
+    interpreter = manager.active.interpreter
+    loop = asyncio.new_event_loop()
+    for message in messages:
+        loop.run_until_complete(interpreter.parse(message))
+    loop.close()
+    gc.collect()
+
+
+def measure(
+    model_file: Text, preload: bool, number_of_workers: int, messages: List[Text]
+) -> List[Dict[Text, int]]:
+    """Starts the workers like the launcher does and returns their memory usage."""
+    with tempfile.TemporaryDirectory() as state_directory:
+        if preload:
+            gc.disable()
+            manager = _manager(state_directory)
+            manager.preload(model_file)
+            gc.freeze()
+
+        # the workers stop once the write end of this pipe is closed
+        stop, stop_notify = os.pipe()
+        workers = []
+        for _ in range(number_of_workers):
+            ready, notify = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(stop_notify)
+                gc.enable()
+                if not preload:
+                    manager = _manager(state_directory)
+                    manager.preload(model_file)
+                _serve(manager, messages)
+                os.write(notify, b"1")
+                os.read(stop, 1)
+                # removes the model which this worker unpacked
+                del manager
+                gc.collect()
+                os._exit(0)
+            os.close(notify)
+            workers.append((pid, ready))
+
+        for _, ready in workers:
+            os.read(ready, 1)
+            os.close(ready)
+
+        usage = [memory_usage(os.getpid())] + [
+            memory_usage(pid) for pid, _ in workers
+        ]
+
+        os.close(stop_notify)
+        for pid, _ in workers:
+            os.waitpid(pid, 0)
+        os.close(stop)
+        if preload:
+            manager.close()
+            del manager
+            gc.unfreeze()
+            gc.enable()
+            gc.collect()
+    return usage
+
+
+def main(
+    number_of_workers: int = 4,
+    vocabulary_size: int = 200000,
+    number_of_messages: int = 2000,
+) -> None:
+    rng = random.Random(42)
+    messages = [
+        " ".join(f"token{rng.randrange(vocabulary_size)}" for _ in range(8))
+        for _ in range(number_of_messages)
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        model_file = create_model(directory, vocabulary_size, 100, 1000)
+        with tempfile.TemporaryDirectory() as state_directory:
+            manager = _manager(state_directory)
+            manager.preload(model_file)
+            parsed = asyncio.run(manager.active.interpreter.parse(messages[0]))
+            manager.close()
+            del manager
+        if not parsed["intent"]["name"].startswith("intent_"):
+            raise ValueError("The model wasn't loaded.")
+        gc.collect()
+
+        print(
+            f"memory of {number_of_workers} workers which parsed "
+            f"{number_of_messages} messages, model with {vocabulary_size} words:"
+        )
+        print(
+            f"  {'loading':10} {'master rss':>11} {'worker rss':>11} "
+            f"{'worker pss':>11} {'total pss':>10}  (MB)"
+        )
+        # per worker first, the preloaded model stays in the memory of this process
+        for name, preload in [("per worker", False), ("preload", True)]:
+            usage = measure(model_file, preload, number_of_workers, messages)
+            master, workers = usage[0], usage[1:]
+            print(
+                f"  {name:10} {master['rss'] / 1024:11.1f} "
+                f"{sum(u['rss'] for u in workers) / len(workers) / 1024:11.1f} "
+                f"{sum(u['pss'] for u in workers) / len(workers) / 1024:11.1f} "
+                f"{sum(u['pss'] for u in usage) / 1024:10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measures the memory of server workers with a preloaded model."
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--vocabulary", type=int, default=200000)
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.workers, args.vocabulary, args.messages)
@@ -0,0 +1,135 @@
+import sys
+from typing import List, Optional
+
+import numpy as np
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from wechatter.dm.featurizers.state_encoder import StateEncoder
+from wechatter.exceptions import MissingDependencyException
+from wechatter.shared.dm.domain import Domain, State
+
+DOMAIN = """
+version: "2.0"
+intents:
+- greet
+- inform
+entities:
+- city
+slots:
+  city:
+    type: text
+  confirmed:
+    type: bool
+actions:
+- action_search
+forms:
+  booking_form:
+    city:
+    - type: from_entity
+      entity: city
+"""
+
+STATES = [
+    {},
+    {"user": {"intent": "greet"}, "prev_action": {"action_name": "action_listen"}},
+    {
+        "user": {"intent": "inform", "entities": ("city",)},
+        "prev_action": {"action_name": "action_listen"},
+        "slots": {"city": (1.0,), "confirmed": (1.0, 0.0)},
+    },
+    {
+        "prev_action": {"action_name": "booking_form"},
+        "active_loop": {"name": "booking_form"},
+        "slots": {"city": (1.0,)},
+    },
+]
+
+
+@pytest.fixture(scope="module")
+def encoder() -> StateEncoder:
+    return StateEncoder(Domain.from_yaml(DOMAIN))
+
+
+def expected_features(
+    encoder: StateEncoder, states: List[State], history: int
+) -> np.ndarray:
+    features = np.zeros((history, encoder.number_of_features), dtype=np.float32)
+    for index, state in enumerate(states):
+        features[history - len(states) + index] = encoder.encode_state(state)
+    return features
+
+
+def test_encode_state_uses_input_states(encoder: StateEncoder):
+    domain = Domain.from_yaml(DOMAIN)
+    features = encoder.encode_state(STATES[2])
+
+    assert sorted(domain.input_states[i] for i in np.nonzero(features)[0]) == sorted(
+        [
+            "inform",
+            "city",
+            "action_listen",
+            "city_0",
+            "confirmed_0",
+        ]
+    )
+
+
+@pytest.mark.parametrize("max_history", [None, 1, 2, 8])
+def test_encode_pads_at_the_start(encoder: StateEncoder, max_history: Optional[int]):
+    sequences = [STATES, STATES[1:3], [], STATES[:1]]
+
+    features, mask = encoder.encode(sequences, max_history)
+
+    history = max_history or len(STATES)
+    assert features.shape == (len(sequences), history, encoder.number_of_features)
+    assert mask.shape == (len(sequences), history)
+    for index, sequence in enumerate(sequences):
+        window = sequence[-max_history:] if max_history else sequence
+        assert np.array_equal(
+            features[index], expected_features(encoder, window, history)
+        )
+        assert mask[index].sum() == len(window)
+        assert mask[index][history - len(window):].all()
+
+
+@pytest.mark.parametrize("max_history", [None, 2, 8])
+def test_encode_for_training_creates_a_window_per_state(
+    encoder: StateEncoder, max_history: Optional[int]
+):
+    sequences = [STATES, STATES[1:3]]
+
+    features, mask = encoder.encode_for_training(sequences, max_history)
+
+    history = max_history or len(STATES)
+    windows = [
+        sequence[:end][-max_history:] if max_history else sequence[:end]
+        for sequence in sequences
+        for end in range(1, len(sequence) + 1)
+    ]
+    assert features.shape == (len(windows), history, encoder.number_of_features)
+    for index, window in enumerate(windows):
+        assert np.array_equal(
+            features[index], expected_features(encoder, window, history)
+        )
+        assert mask[index].sum() == len(window)
+
+
+def test_sparse_encoding_without_scipy(encoder: StateEncoder, monkeypatch: MonkeyPatch):
+    monkeypatch.setitem(sys.modules, "scipy", None)
+    monkeypatch.setitem(sys.modules, "scipy.sparse", None)
+
+    with pytest.raises(MissingDependencyException):
+        encoder.encode([STATES], max_history=3, sparse=True)
+
+
+def test_sparse_encoding_equals_dense_encoding(encoder: StateEncoder):
+    pytest.importorskip("scipy")
+
+    dense, dense_mask = encoder.encode_for_training([STATES], max_history=3)
+    sparse, sparse_mask = encoder.encode_for_training(
+        [STATES], max_history=3, sparse=True
+    )
+
+    assert np.array_equal(sparse.toarray(), dense.reshape(-1, dense.shape[-1]))
+    assert np.array_equal(sparse_mask, dense_mask)
@@ -0,0 +1,59 @@
+import asyncio
+from typing import Any, Dict, List, Text, Tuple
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from wechatter.dm.interpreter import WechatterNLUHttpInterpreter
+from wechatter.utils.endpoints import EndpointConfig
+
+
+async def _parse_concurrently(
+    texts: List[Text], batch_route: bool
+) -> Tuple[List[Dict[Text, Any]], List[Text]]:
+    paths = []
+
+    def result(message: Dict[Text, Any]) -> Dict[Text, Any]:
+        return {"text": message["text"], "intent": {"name": "greet"}, "entities": []}
+
+    async def parse(request: web.Request) -> web.Response:
+        paths.append(request.path)
+        return web.json_response(result(await request.json()))
+
+    async def parse_batch(request: web.Request) -> web.Response:
+        paths.append(request.path)
+        messages = (await request.json())["messages"]
+        return web.json_response({"results": [result(m) for m in messages]})
+
+    app = web.Application()
+    app.router.add_post("/model/parse", parse)
+    if batch_route:
+        app.router.add_post("/model/parse/batch", parse_batch)
+
+    async with TestServer(app) as server:
+        endpoint = EndpointConfig(str(server.make_url("/")))
+        interpreter = WechatterNLUHttpInterpreter(endpoint, max_batch_size=8)
+        try:
+            results = await asyncio.gather(*[interpreter.parse(t) for t in texts])
+            # without the batch route, later messages aren't batched anymore
+            results.append(await interpreter.parse("later"))
+        finally:
+            await endpoint.close()
+
+    return results, paths
+
+
+def test_parse_batched():
+    texts = [f"hello {i}" for i in range(4)]
+    results, paths = asyncio.run(_parse_concurrently(texts, batch_route=True))
+
+    assert [r["text"] for r in results] == texts + ["later"]
+    assert paths == ["/model/parse/batch", "/model/parse/batch"]
+
+
+def test_parse_falls_back_without_batch_route():
+    texts = [f"hello {i}" for i in range(4)]
+    results, paths = asyncio.run(_parse_concurrently(texts, batch_route=False))
+
+    assert [r["text"] for r in results] == texts + ["later"]
+    assert paths == ["/model/parse"] * 5
@@ -0,0 +1,427 @@
+import json
+import pickle
+from typing import List
+
+import pytest
+
+from wechatter.dm.tracker_store import CachedTrackerStore, InMemoryTrackerStore
+from wechatter.shared.dm.conversation import Dialogue
+from wechatter.shared.dm.events import (
+    ActionExecuted,
+    BotUttered,
+    EntitiesAdded,
+    Event,
+    SessionStarted,
+    UserUttered,
+)
+from wechatter.shared.exceptions import RasaCoreException
+
+
+def _turn(text: str) -> List[Event]:
+    return [
+        UserUttered(text, {"name": "greet"}),
+        ActionExecuted("utter_greet"),
+        BotUttered(f"reply to {text}"),
+        ActionExecuted("action_listen"),
+    ]
+
+
+def _persisted_texts(store: InMemoryTrackerStore, sender_id: str) -> List[str]:
+    events = [
+        event
+        for serialised in store.store[sender_id]
+        for event in json.loads(serialised)
+    ]
+    return [event.get("text") for event in events if event["event"] == "user"]
+
+
+def test_append_only_saves_only_new_events():
+    store = InMemoryTrackerStore(None, append_only=True)
+    tracker = store.get_or_create_tracker("u1")
+    for event in _turn("hi"):
+        tracker.update(event)
+    store.save(tracker)
+
+    tracker = store.retrieve("u1")
+    for event in _turn("again"):
+        tracker.update(event)
+    store.save(tracker)
+    store.save(tracker)
+
+    # the initial `action_listen` and two turns
+    assert len(store.store["u1"]) == 3
+    assert _persisted_texts(store, "u1") == ["hi", "again"]
+
+
+def test_append_only_with_several_writers():
+    # two workers which share the persisted records
+    store = InMemoryTrackerStore(None, append_only=True)
+    other_store = InMemoryTrackerStore(None, append_only=True)
+    other_store.store = store.store
+
+    tracker = store.get_or_create_tracker("u1")
+    for event in _turn("hi"):
+        tracker.update(event)
+    store.save(tracker)
+
+    other_tracker = other_store.retrieve("u1")
+    for event in _turn("from other worker"):
+        other_tracker.update(event)
+    other_store.save(other_tracker)
+
+    tracker = store.retrieve("u1")
+    for event in _turn("again"):
+        tracker.update(event)
+    store.save(tracker)
+
+    assert _persisted_texts(store, "u1") == ["hi", "from other worker", "again"]
+
+
+def test_append_only_with_max_event_history():
+    store = InMemoryTrackerStore(None, append_only=True)
+    tracker = store.get_or_create_tracker("u1", max_event_history=3)
+    for event in _turn("hi"):
+        tracker.update(event)
+    store.save(tracker)
+
+    for event in _turn("again") + _turn("and again"):
+        tracker.update(event)
+    store.save(tracker)
+
+    # the tracker only keeps the last 3 events, all of them are new
+    assert len(store.store["u1"]) == 3
+    assert len(json.loads(store.store["u1"][-1])) == 3
+
+
+def test_append_only_saves_events_with_the_same_timestamp():
+    store = InMemoryTrackerStore(None, append_only=True)
+    tracker = store.get_or_create_tracker("u1")
+    timestamp = tracker.events[-1].timestamp
+    for event in _turn("hi"):
+        event.timestamp = timestamp
+        tracker.update(event)
+    store.save(tracker)
+
+    tracker = store.retrieve("u1")
+    new_event = UserUttered("again", timestamp=timestamp)
+    tracker.update(new_event)
+    # the persisted record isn't read to find the new events
+    store.store["u1"].append("not an event slice")
+    store.save(tracker)
+
+    assert len(store.store["u1"]) == 4
+    assert json.loads(store.store["u1"][1])[-1]["timestamp"] == timestamp
+    assert json.loads(store.store["u1"][-1]) == [new_event.as_dict()]
+
+
+def test_cached_tracker_store_returns_copies():
+    store = CachedTrackerStore(InMemoryTrackerStore(None))
+    tracker = store.get_or_create_tracker("u1")
+    for event in _turn("hi"):
+        tracker.update(event)
+    store.save(tracker)
+
+    # changes which are not saved don't leak into the cache
+    tracker.update(UserUttered("unsaved"))
+    retrieved = store.retrieve("u1")
+    assert retrieved is not tracker
+    assert len(retrieved.events) == len(tracker.events) - 1
+
+    retrieved.update(UserUttered("unsaved"))
+    assert len(store.retrieve("u1").events) == len(tracker.events) - 1
+    assert store.cache_info()["hits"] == 2
+
+
+def test_cached_tracker_store_notices_saves_of_other_processes():
+    wrapped = InMemoryTrackerStore(None)
+    store = CachedTrackerStore(wrapped, ttl=None)
+    tracker = store.get_or_create_tracker("u1")
+    assert store.retrieve("u1") == tracker
+    assert store.cache_info()["hits"] == 1
+
+    # another process saves the conversation
+    other = wrapped.retrieve("u1")
+    for event in _turn("hi"):
+        other.update(event)
+    wrapped.save(other)
+
+    # the first miss is the lookup of `get_or_create_tracker`
+    assert store.retrieve("u1") == other
+    assert store.cache_info()["misses"] == 2
+
+
+def test_cached_tracker_store_does_not_cache_trackers_saved_concurrently():
+    wrapped = InMemoryTrackerStore(None)
+    store = CachedTrackerStore(wrapped, ttl=None)
+    tracker = store.get_or_create_tracker("u1")
+    other = wrapped.retrieve("u1")
+
+    save = wrapped.save
+
+    def save_after_other_process(saved_tracker):
+        other.update(UserUttered("from other process"))
+        save(other)
+        save(saved_tracker)
+
+    wrapped.save = save_after_other_process
+    tracker.update(UserUttered("hi"))
+    store.save(tracker)
+
+    assert store.cache_info()["size"] == 0
+
+
+class UnversionedTrackerStore(InMemoryTrackerStore):
+    def conversation_version(self, sender_id):
+        return None
+
+
+def test_cached_tracker_store_without_versions_uses_ttl(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("wechatter.dm.tracker_store.time.monotonic", lambda: now[0])
+    wrapped = UnversionedTrackerStore(None)
+    store = CachedTrackerStore(wrapped, ttl=1)
+    tracker = store.get_or_create_tracker("u1")
+
+    other = wrapped.retrieve("u1")
+    other.update(UserUttered("from other process"))
+    wrapped.save(other)
+    # the change can't be noticed until the cached tracker expires
+    assert store.retrieve("u1") == tracker
+
+    now[0] = 2.0
+    assert store.retrieve("u1") == other
+
+
+def test_cached_tracker_store_invalidate():
+    wrapped = UnversionedTrackerStore(None)
+    store = CachedTrackerStore(wrapped, ttl=None)
+    store.get_or_create_tracker("u1")
+
+    other = wrapped.retrieve("u1")
+    for event in _turn("hi"):
+        other.update(event)
+    wrapped.save(other)
+
+    store.invalidate("u1")
+    assert store.retrieve("u1") == other
+
+
+@pytest.mark.parametrize(
+    "tracker_store_class", [InMemoryTrackerStore, UnversionedTrackerStore]
+)
+def test_cached_tracker_store_exists(monkeypatch, tracker_store_class):
+    now = [0.0]
+    monkeypatch.setattr("wechatter.dm.tracker_store.time.monotonic", lambda: now[0])
+    wrapped = tracker_store_class(None)
+    store = CachedTrackerStore(wrapped, ttl=1)
+    store.get_or_create_tracker("u1")
+    assert store.exists("u1")
+
+    # the conversation is removed by another process
+    del wrapped.store["u1"]
+    wrapped.versions.pop("u1")
+    now[0] = 2.0
+    assert not store.exists("u1")
+    assert store.retrieve("u1") is None
+
+
+def test_pickled_trackers_are_only_loaded_if_allowed():
+    pickled = pickle.dumps(Dialogue("u1", [SessionStarted()]))
+
+    store = InMemoryTrackerStore(None)
+    store.store["u1"] = pickled
+    with pytest.raises(RasaCoreException):
+        store.retrieve("u1")
+
+    store = InMemoryTrackerStore(None, allow_pickle=True)
+    store.store["u1"] = pickled
+    assert len(store.retrieve("u1").events) == 1
+
+
+def test_restore_from_snapshot():
+    store = InMemoryTrackerStore(None, snapshot_interval=4)
+    tracker = store.get_or_create_tracker("u1")
+    for text in ["hi", "again", "and again"]:
+        for event in _turn(text):
+            tracker.update(event)
+        store.save(tracker)
+
+    snapshot = json.loads(store.snapshots["u1"])
+    assert snapshot["last_event"]["timestamp"] == tracker.events[-1].timestamp
+
+    tracker.update(UserUttered("not in the snapshot"))
+    store.save(tracker)
+
+    restored = store.retrieve("u1")
+    assert list(restored.events) == list(tracker.events)
+    assert restored.latest_message.text == "not in the snapshot"
+
+
+def test_restore_from_snapshot_does_not_change_events():
+    store = InMemoryTrackerStore(None, snapshot_interval=1)
+    tracker = store.get_or_create_tracker("u1")
+    tracker.update(UserUttered("hi", {"name": "greet"}))
+    tracker.update(EntitiesAdded([{"entity": "city", "value": "Berlin"}]))
+    store.save(tracker)
+
+    restored = store.retrieve("u1")
+    assert restored.latest_message.entities == [
+        {"entity": "city", "value": "Berlin"}
+    ]
+    # `EntitiesAdded` is applied to the latest message, not to the persisted event
+    user_uttered = next(e for e in restored.events if isinstance(e, UserUttered))
+    assert user_uttered.entities == []
+    assert user_uttered.parse_data["entities"] == []
+
+
+def test_snapshot_with_several_writers():
+    store = InMemoryTrackerStore(None, snapshot_interval=4)
+    other = InMemoryTrackerStore(None, snapshot_interval=4)
+    other.store = store.store
+    other.snapshots = store.snapshots
+
+    tracker = store.get_or_create_tracker("u1")
+    for event in _turn("hi"):
+        tracker.update(event)
+    store.save(tracker)
+    snapshot = store.snapshots["u1"]
+
+    # the other process knows which events the snapshot covers
+    tracker = other.retrieve("u1")
+    tracker.update(UserUttered("again"))
+    other.save(tracker)
+    assert other.snapshots["u1"] == snapshot
+
+    for event in _turn("and again"):
+        tracker.update(event)
+    other.save(tracker)
+    assert other.snapshots["u1"] != snapshot
+    assert list(store.retrieve("u1").events) == list(tracker.events)
+
+
+def test_snapshot_of_unknown_events_is_ignored():
+    store = InMemoryTrackerStore(None, snapshot_interval=4)
+    tracker = store.get_or_create_tracker("u1")
+    for event in _turn("hi"):
+        tracker.update(event)
+    store.save(tracker)
+
+    store.snapshots["u1"] = json.dumps(
+        {"offset": 3, "domain_fingerprint": None, "slots": {}}
+    )
+    assert list(store.retrieve("u1").events) == list(tracker.events)
+    assert store.should_snapshot(tracker, store.snapshots["u1"])
+
+
+def _session(text: str) -> List[Event]:
+    return [
+        ActionExecuted("action_session_start"),
+        SessionStarted(),
+        ActionExecuted("action_listen"),
+        *_turn(text),
+    ]
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_saving_latest_session_keeps_previous_sessions(binary: bool):
+    store = InMemoryTrackerStore(None, binary=binary)
+    tracker = store.init_tracker("u1")
+    for event in _session("first") + _session("second"):
+        tracker.update(event)
+    store.save(tracker)
+
+    tracker = store.retrieve("u1")
+    assert [
+        event.text for event in tracker.events if isinstance(event, UserUttered)
+    ] == ["second"]
+    for event in _turn("third"):
+        tracker.update(event)
+    store.save(tracker)
+    store.save(store.retrieve("u1"))
+
+    full_tracker = store.retrieve_full_tracker("u1")
+    assert [
+        event.text for event in full_tracker.events if isinstance(event, UserUttered)
+    ] == ["first", "second", "third"]
+
+
+def test_previous_sessions_are_kept_by_other_writers():
+    # two workers which share the persisted records
+    store = InMemoryTrackerStore(None)
+    other_store = InMemoryTrackerStore(None)
+    other_store.store = store.store
+    tracker = store.init_tracker("u1")
+    for event in _session("first") + _session("second"):
+        tracker.update(event)
+    store.save(tracker)
+
+    tracker = store.retrieve("u1")
+    for event in _turn("third"):
+        tracker.update(event)
+    other_store.save(tracker)
+
+    assert _persisted_texts(store, "u1") == ["first", "second", "third"]
+
+
+def test_unknown_persisted_events_do_not_shift_previous_sessions():
+    store = InMemoryTrackerStore(None)
+    tracker = store.init_tracker("u1")
+    for event in _session("first") + _session("second"):
+        tracker.update(event)
+
+    # a tracker persisted as a single record by an older version, an event of a
+    # type which this version doesn't know precedes the session
+    record = tracker.as_dialogue().as_dict()
+    record["events"].insert(0, {"event": "unknown_plugin_event", "timestamp": 0})
+    store.store["u1"] = json.dumps(record)
+
+    tracker = store.retrieve("u1")
+    for event in _turn("third"):
+        tracker.update(event)
+    store.save(tracker)
+
+    events = json.loads(store.store["u1"][0])
+    assert events[0]["event"] == "unknown_plugin_event"
+    assert _persisted_texts(store, "u1") == ["first", "second", "third"]
+    assert len(store.store["u1"]) == 3
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_previous_sessions_are_not_decoded(binary: bool):
+    store = InMemoryTrackerStore(None, binary=binary)
+    tracker = store.init_tracker("u1")
+    for event in _session("first") + _session("second"):
+        tracker.update(event)
+    store.save(tracker)
+    assert len(store.store["u1"]) == 2
+
+    store.store["u1"][0] = "not decodable"
+    tracker = store.retrieve("u1")
+    assert tracker.events[0] == ActionExecuted("action_session_start")
+    assert isinstance(tracker.events[1], SessionStarted)
+
+    for event in _turn("third") + _session("fourth"):
+        tracker.update(event)
+    store.save(tracker)
+
+    assert store.store["u1"][0] == "not decodable"
+    assert len(store.store["u1"]) == 3
+    tracker = store.retrieve("u1")
+    assert [
+        event.text for event in tracker.events if isinstance(event, UserUttered)
+    ] == ["fourth"]
+
+
+def test_append_only_latest_session_across_slices():
+    store = InMemoryTrackerStore(None, append_only=True)
+    tracker = store.init_tracker("u1")
+    for event in _session("first") + [ActionExecuted("action_session_start")]:
+        tracker.update(event)
+    store.save(tracker)
+    for event in _session("second")[1:]:
+        tracker.update(event)
+    store.save(tracker)
+
+    retrieved = store.retrieve("u1")
+    assert list(retrieved.events) == list(tracker.events)[len(_session("first")):]
+    assert list(store.retrieve_full_tracker("u1").events) == list(tracker.events)
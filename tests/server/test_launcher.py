@@ -0,0 +1,63 @@
+import os
+import signal
+import time
+
+import pytest
+
+from wechatter.server import launcher
+
+
+@pytest.fixture
+def fast_supervisor(monkeypatch):
+    monkeypatch.setattr(launcher, "WORKER_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(launcher, "MIN_WORKER_LIFETIME", 0.5)
+    monkeypatch.setattr(launcher, "MEMORY_REPORT_DELAY", 60)
+    handlers = {
+        signum: signal.getsignal(signum) for signum in (signal.SIGTERM, signal.SIGINT)
+    }
+    yield
+    for signum, handler in handlers.items():
+        signal.signal(signum, handler)
+
+
+def _record_start(path) -> int:
+    with open(path, "a") as f:
+        f.write(f"{os.getpid()}\n")
+    with open(path) as f:
+        return len(f.readlines())
+
+
+def test_crashed_worker_is_replaced(tmp_path, monkeypatch, fast_supervisor):
+    starts = tmp_path / "starts"
+
+    def run_worker(_sock) -> None:
+        if _record_start(starts) == 1:
+            time.sleep(1)
+            raise RuntimeError("crash")
+        # the replacement stops the server
+        os.kill(os.getppid(), signal.SIGTERM)
+        time.sleep(30)
+
+    monkeypatch.setattr(launcher, "_run_worker", run_worker)
+
+    assert launcher._supervise(None, 1) == 0
+    assert len(starts.read_text().split()) == 2
+
+
+def test_server_stops_if_a_worker_fails_to_start(
+    tmp_path, monkeypatch, fast_supervisor
+):
+    starts = tmp_path / "starts"
+
+    def run_worker(_sock) -> None:
+        if _record_start(starts) == 1:
+            raise RuntimeError("crash")
+        time.sleep(30)
+
+    monkeypatch.setattr(launcher, "_run_worker", run_worker)
+
+    started = time.monotonic()
+    assert launcher._supervise(None, 2) == 1
+    # the other worker was stopped instead of waited for and nothing was respawned
+    assert time.monotonic() - started < 10
+    assert len(starts.read_text().split()) <= 2
@@ -0,0 +1,124 @@
+import asyncio
+import fcntl
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+from wechatter.server.training_jobs import (
+    JOB_MODEL_DIRECTORY,
+    SLOTS_DIRECTORY,
+    STATUS_CANCELLED,
+    STATUS_FAILED,
+    STATUS_QUEUED,
+    STATUS_RUNNING,
+    TrainingJobManager,
+)
+
+
+def _manager(jobs_directory, **kwargs) -> TrainingJobManager:
+    return TrainingJobManager(str(jobs_directory), poll_interval=0.01, **kwargs)
+
+
+def test_slots_are_shared_by_all_managers(tmp_path):
+    submitting = _manager(tmp_path)
+    other = _manager(tmp_path)
+
+    async def run() -> None:
+        # another worker runs a job in the only slot
+        with open(tmp_path / SLOTS_DIRECTORY / "0.lock", "a") as slot:
+            fcntl.flock(slot, fcntl.LOCK_EX)
+            job = submitting.submit({})
+            await asyncio.sleep(0.1)
+            assert submitting.get(job["id"])["status"] == STATUS_QUEUED
+
+            assert other.cancel(job["id"])["status"] == STATUS_CANCELLED
+            job = await asyncio.wait_for(submitting.wait(job["id"]), 1)
+
+        assert job["status"] == STATUS_CANCELLED
+        assert job["started_at"] is None
+
+    asyncio.run(run())
+
+
+def test_failed_training_is_reported(tmp_path):
+    manager = _manager(tmp_path)
+
+    async def run() -> None:
+        job = manager.submit({"domain": "missing.yml"})
+        return await asyncio.wait_for(manager.wait(job["id"]), 60)
+
+    job = asyncio.run(run())
+    assert job["status"] == STATUS_FAILED
+    assert job["error"]
+    assert job["finished_at"] >= job["started_at"]
+
+
+def test_remove_expired_jobs(tmp_path):
+    manager = _manager(tmp_path, retention=60)
+
+    async def submit_and_cancel() -> str:
+        job = manager.submit({})
+        manager.cancel(job["id"])
+        await manager.wait(job["id"])
+        return job["id"]
+
+    expired = asyncio.run(submit_and_cancel())
+    recent = asyncio.run(submit_and_cancel())
+    with manager._locked_state(expired) as state:
+        state["finished_at"] = time.time() - 120
+
+    manager.remove_expired_jobs()
+
+    assert not os.path.exists(tmp_path / expired)
+    assert os.path.exists(tmp_path / recent)
+
+
+def test_model_without_output_is_removed_with_the_job(tmp_path, monkeypatch):
+    manager = _manager(tmp_path)
+    payloads = []
+
+    async def run_training(job_id, training_payload) -> None:
+        payloads.append(training_payload)
+
+    monkeypatch.setattr(manager, "_run_training", run_training)
+
+    async def run() -> str:
+        job = manager.submit({"output": None})
+        await manager.wait(job["id"])
+        return job["id"]
+
+    job_id = asyncio.run(run())
+    assert payloads[0]["output"] == str(tmp_path / job_id / JOB_MODEL_DIRECTORY)
+
+    manager.remove(job_id)
+    assert not os.path.exists(tmp_path / job_id)
+
+
+def test_jobs_of_stopped_workers_failed(tmp_path):
+    manager = _manager(tmp_path)
+    stopped_worker = subprocess.Popen([sys.executable, "-c", "pass"])
+    stopped_worker.wait()
+
+    job_id = uuid.uuid4().hex
+    os.makedirs(tmp_path / job_id)
+    manager._write_state(
+        job_id,
+        {
+            "id": job_id,
+            "status": STATUS_RUNNING,
+            "created_at": time.time(),
+            "started_at": time.time(),
+            "finished_at": None,
+            "model": None,
+            "error": None,
+            "worker_pid": stopped_worker.pid,
+        },
+    )
+
+    job = manager.get(job_id)
+
+    assert job["status"] == STATUS_FAILED
+    assert str(stopped_worker.pid) in job["error"]
+    assert manager.get(job_id)["finished_at"] == job["finished_at"]
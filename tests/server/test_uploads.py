@@ -0,0 +1,116 @@
+import os
+
+import pytest
+
+from wechatter.server.uploads import (
+    MAX_FIELD_SIZE,
+    MAX_HEADER_SIZE,
+    MultipartError,
+    MultipartSpooler,
+)
+
+BOUNDARY = "----boundary"
+
+
+def _part(disposition: str, content: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; {disposition}\r\n\r\n"
+    ).encode() + content + b"\r\n"
+
+
+def _body(*parts: bytes) -> bytes:
+    return b"preamble\r\n" + b"".join(parts) + f"--{BOUNDARY}--\r\n".encode()
+
+
+def _spool(tmp_path, body: bytes, chunk_size: int) -> MultipartSpooler:
+    spooler = MultipartSpooler(BOUNDARY, str(tmp_path))
+    for start in range(0, len(body), chunk_size):
+        spooler.feed(body[start : start + chunk_size])
+    spooler.close()
+    return spooler
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, len(BOUNDARY) + 4, 1024])
+def test_parts_split_across_chunks(tmp_path, chunk_size):
+    # the content contains something which nearly looks like the delimiter
+    nlu = b"- intent: greet\r\n--" + BOUNDARY[:-1].encode() + b"\r\n  examples: hi"
+    body = _body(
+        _part('name="config"; filename="config.yml"', b"language: zh"),
+        _part('name="nlu"; filename="nlu.yml"', nlu),
+        _part('name="nlu"; filename="more.md"', b"## intent:bye"),
+        _part('name="model_name"', "模型".encode()),
+        _part('name="unknown"', b"ignored"),
+    )
+
+    spooler = _spool(tmp_path, body, chunk_size)
+
+    assert spooler.done
+    assert _read(spooler.files["config"][0]) == b"language: zh"
+    assert [_read(path) for path in spooler.files["nlu"]] == [nlu, b"## intent:bye"]
+    assert spooler.files["nlu"][1].endswith(".md")
+    assert spooler.fields == {"model_name": "模型"}
+    assert sorted(os.listdir(tmp_path)) == ["config_0.yml", "nlu_0.yml", "nlu_1.md"]
+
+
+def test_quoted_names_with_separators(tmp_path):
+    body = _body(
+        _part('name="nlu"; filename="data; v2.json"', b"{}"),
+        _part('name="stories"; filename="a\\"b;c.md"', b"## story"),
+    )
+
+    spooler = _spool(tmp_path, body, 7)
+
+    assert spooler.files["nlu"][0].endswith("nlu_0.json")
+    assert spooler.files["stories"][0].endswith("stories_0.md")
+
+
+def test_boundary_from_content_type():
+    assert (
+        MultipartSpooler.boundary_from_content_type(
+            'multipart/form-data; charset=utf-8; boundary="a;b"'
+        )
+        == "a;b"
+    )
+    assert MultipartSpooler.boundary_from_content_type("application/json") is None
+    assert MultipartSpooler.boundary_from_content_type("multipart/form-data") is None
+
+
+def test_large_part_is_written_in_chunks(tmp_path):
+    content = os.urandom(1024 * 1024).replace(b"\r", b"\n")
+    spooler = MultipartSpooler(BOUNDARY, str(tmp_path))
+    body = _body(_part('name="nlu"; filename="nlu.yml"', content))
+
+    for start in range(0, len(body), 4096):
+        spooler.feed(body[start : start + 4096])
+        # only a possibly split delimiter is kept in memory
+        assert len(spooler._buffer) < 4096 + len(BOUNDARY) + 4
+    spooler.close()
+
+    assert _read(spooler.files["nlu"][0]) == content
+
+
+def test_oversize_headers(tmp_path):
+    spooler = MultipartSpooler(BOUNDARY, str(tmp_path))
+    spooler.feed(f"--{BOUNDARY}\r\nX-Padding: ".encode())
+
+    with pytest.raises(MultipartError):
+        spooler.feed(b"x" * (MAX_HEADER_SIZE + 1))
+
+
+def test_oversize_field(tmp_path):
+    body = _body(_part('name="model_name"', b"x" * (MAX_FIELD_SIZE + 1)))
+
+    with pytest.raises(MultipartError):
+        _spool(tmp_path, body, 1024)
+
+
+def test_truncated_body(tmp_path):
+    body = _body(_part('name="nlu"; filename="nlu.yml"', b"data"))
+
+    with pytest.raises(MultipartError):
+        _spool(tmp_path, body[:-20], 1024)
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from wechatter.shared.dm import binary_format
+from wechatter.shared.dm.conversation import Dialogue, LazyDialogue
+from wechatter.shared.dm.events import (
+    ActionExecuted,
+    BotUttered,
+    SessionStarted,
+    SlotSet,
+    UserUttered,
+)
+
+
+def create_dialogue() -> Dialogue:
+    return Dialogue(
+        "u1",
+        [
+            ActionExecuted("action_session_start"),
+            SessionStarted(),
+            UserUttered(
+                "Ich möchte 2 Plätze 🍕",
+                {"name": "book_table", "confidence": 0.97},
+                [{"entity": "people", "value": "2", "start": 11, "end": 12}],
+            ),
+            SlotSet("people", -2),
+            SlotSet("options", [1.5, None, True, {"nested": ["x"]}]),
+            BotUttered("ok", {"buttons": None}),
+        ],
+    )
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_dialogue_round_trip(lazy: bool):
+    dialogue = create_dialogue()
+
+    payload = binary_format.encode_dialogue(dialogue)
+    decoded = binary_format.decode_dialogue(payload, lazy=lazy)
+
+    assert binary_format.is_binary_payload(payload)
+    assert isinstance(decoded, LazyDialogue) == lazy
+    assert decoded.name == "u1"
+    assert decoded.events == dialogue.events
+    # the events are restored exactly like from JSON
+    assert [event.as_dict() for event in decoded.events] == json.loads(
+        json.dumps(dialogue.as_dict())
+    )["events"]
+
+
+def test_events_round_trip():
+    events = create_dialogue().events
+
+    decoded = binary_format.decode_events(binary_format.encode_events(events))
+
+    assert decoded == [event.as_dict() for event in events]
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        b'{"events": []}',
+        binary_format.MAGIC + bytes([1]) + b"\x00",
+        binary_format.MAGIC + bytes([binary_format.FORMAT_VERSION]) + b"\xc1",
+        binary_format.encode_events([SessionStarted()])[:-3],
+        binary_format.MAGIC + bytes([binary_format.FORMAT_VERSION]) + b"\x90",
+    ],
+)
+def test_invalid_payloads(payload: bytes):
+    with pytest.raises(binary_format.BinaryFormatError):
+        binary_format.decode_events(payload)
+
+
+def test_unsupported_values():
+    with pytest.raises(TypeError):
+        binary_format.encode_events([SlotSet("people", {1, 2})])
@@ -0,0 +1,238 @@
+import os
+import random
+from functools import reduce
+from pathlib import Path
+from typing import List, Text
+
+import pytest
+
+from wechatter.shared.dm.domain import Domain, DomainBuilder, IncrementalStateExtractor
+from wechatter.shared.dm.events import (
+    ActionExecuted,
+    ActionReverted,
+    ActiveLoop,
+    AllSlotsReset,
+    BotUttered,
+    EntitiesAdded,
+    Event,
+    FollowupAction,
+    Restarted,
+    SessionStarted,
+    SlotSet,
+    UserUttered,
+    UserUtteranceReverted,
+)
+from wechatter.shared.dm.trackers import DialogueStateTracker
+
+DOMAIN_FILES = {
+    "a/domain.yml": """
+version: "2.0"
+config:
+  store_entities_as_slots: false
+intents:
+- greet
+- goodbye:
+    use_entities: []
+entities:
+- city
+slots:
+  city:
+    type: text
+  visited:
+    type: bool
+responses:
+  utter_greet:
+  - text: hi
+actions:
+- action_weather
+- booking_form
+forms:
+  booking_form:
+    city:
+    - type: from_entity
+      entity: city
+""",
+    "b/domain.yml": """
+version: "2.0"
+intents:
+- greet:
+    use_entities: true
+- ask_weather
+entities:
+- date
+slots:
+  date:
+    type: text
+  city:
+    type: text
+    influence_conversation: false
+responses:
+  utter_greet:
+  - text: hello
+  utter_goodbye:
+  - text: bye
+forms:
+  weather_form:
+    date:
+    - type: from_entity
+      entity: date
+  booking_form:
+    date:
+    - type: from_entity
+      entity: date
+session_config:
+  session_expiration_time: 10
+  carry_over_slots_to_new_session: false
+""",
+    "b/c/domain.yml": """
+version: "2.0"
+config:
+  store_entities_as_slots: true
+actions:
+- action_weather
+- weather_form
+e2e_actions:
+- how is the weather?
+""",
+}
+
+
+@pytest.fixture
+def domain_files(tmp_path: Path) -> List[Text]:
+    paths = []
+    for name, content in DOMAIN_FILES.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+        paths.append(str(path))
+    return paths
+
+
+def assert_same_domain(domain: Domain, expected: Domain):
+    assert domain.as_dict() == expected.as_dict()
+    assert [slot.name for slot in domain.slots] == [
+        slot.name for slot in expected.slots
+    ]
+    assert list(domain.forms) == list(expected.forms)
+    assert domain.fingerprint() == expected.fingerprint()
+
+
+def test_load_merges_like_pairwise_merge(domain_files: List[Text]):
+    expected = reduce(
+        lambda merged, path: merged.merge(Domain.from_file(path)),
+        domain_files,
+        Domain.empty(),
+    )
+
+    assert_same_domain(Domain.load(domain_files), expected)
+
+
+def test_from_directory_merges_like_pairwise_merge(tmp_path: Path, domain_files):
+    expected = Domain.empty()
+    for root, _, files in os.walk(tmp_path, followlinks=True):
+        for file in files:
+            path = os.path.join(root, file)
+            if Domain.is_domain_file(path):
+                expected = Domain.from_file(path).merge(expected)
+
+    assert_same_domain(Domain.from_directory(str(tmp_path)), expected)
+
+
+@pytest.mark.parametrize("override", [False, True])
+def test_domain_builder_skips_empty_domains(domain_files: List[Text], override):
+    domain = Domain.from_file(domain_files[0])
+
+    builder = DomainBuilder(override=override)
+    builder.add(None).add(Domain.empty()).add(domain).add(Domain.empty())
+
+    assert builder.build() is domain
+
+
+STATES_DOMAIN = """
+version: "2.0"
+intents:
+- greet
+- inform
+- affirm
+- goodbye
+entities:
+- city
+- date
+slots:
+  city:
+    type: text
+  date:
+    type: text
+  confirmed:
+    type: bool
+  items:
+    type: list
+  unfeaturized:
+    type: text
+    influence_conversation: false
+actions:
+- action_search
+- action_book
+forms:
+  booking_form:
+    city:
+    - type: from_entity
+      entity: city
+"""
+
+
+def random_conversation(rng: random.Random, turns: int) -> List[Event]:
+    events = [
+        ActionExecuted("action_session_start"),
+        SessionStarted(),
+        ActionExecuted("action_listen"),
+    ]
+    for _ in range(turns):
+        entities = [{"entity": "city", "value": "Berlin"}] if rng.random() < 0.5 else []
+        intent = rng.choice(["greet", "inform", "affirm", "goodbye"])
+        events.append(UserUttered("hi", {"name": intent}, entities))
+
+        other_events = [
+            SlotSet(
+                rng.choice(["city", "date", "confirmed", "items", "unfeaturized"]),
+                rng.choice([None, "value", True, ["a"]]),
+            ),
+            AllSlotsReset(),
+            ActiveLoop(rng.choice(["booking_form", None])),
+            UserUtteranceReverted(),
+            ActionReverted(),
+            Restarted(),
+            EntitiesAdded([{"entity": "date", "value": "today"}]),
+            FollowupAction("action_book"),
+        ]
+        if rng.random() < 0.7:
+            events.append(rng.choice(other_events))
+
+        action = rng.choice(["action_search", "action_book", "booking_form"])
+        events.append(ActionExecuted(action, hide_rule_turn=rng.random() < 0.3))
+        events.append(BotUttered("ok"))
+        events.append(ActionExecuted("action_listen"))
+    return events
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("omit_unset_slots", [False, True])
+def test_incremental_state_extractor_parity(seed: int, omit_unset_slots: bool):
+    domain = Domain.from_yaml(STATES_DOMAIN)
+    rng = random.Random(seed)
+    tracker = DialogueStateTracker.from_events(
+        "parity", random_conversation(rng, rng.randint(1, 40)), domain.slots
+    )
+
+    expected = [
+        (domain.get_active_states(prior_tracker, omit_unset_slots), hide_rule_turn)
+        for prior_tracker, hide_rule_turn in tracker.generate_all_prior_trackers()
+    ]
+
+    extractor = IncrementalStateExtractor(domain, omit_unset_slots)
+    states = [
+        (extractor.active_states(), hide_rule_turn)
+        for _, hide_rule_turn in extractor.prior_trackers(tracker)
+    ]
+
+    assert states == expected
@@ -0,0 +1,75 @@
+import json
+import os
+from pathlib import Path
+
+from _pytest.monkeypatch import MonkeyPatch
+
+from wechatter.shared.dm import domain_cache
+from wechatter.shared.dm.domain import Domain
+
+DOMAIN = """
+version: "2.0"
+intents:
+- greet
+- goodbye
+slots:
+  name:
+    type: text
+responses:
+  utter_greet:
+  - text: hi
+"""
+
+
+def write_domain(path: Path, content: str = DOMAIN) -> str:
+    path.write_text(content)
+    return str(path)
+
+
+def test_cache_is_disabled_by_default(tmp_path: Path, monkeypatch: MonkeyPatch):
+    monkeypatch.delenv("DOMAIN_CACHE_PATH", raising=False)
+    monkeypatch.chdir(tmp_path)
+    path = write_domain(tmp_path / "domain.yml")
+
+    Domain.load(path)
+
+    assert os.listdir(tmp_path) == ["domain.yml"]
+    assert domain_cache.cache_file([path]) is None
+
+
+def test_cached_domain_equals_loaded_domain(tmp_path: Path):
+    path = write_domain(tmp_path / "domain.yml")
+    cache_directory = str(tmp_path / "cache")
+
+    domain = Domain.load(path, cache_directory=cache_directory)
+    (cache_file,) = os.listdir(cache_directory)
+    with open(os.path.join(cache_directory, cache_file)) as f:
+        cached = json.load(f)
+    cached_domain = Domain.load(path, cache_directory=cache_directory)
+
+    assert cached["domain"] == domain.as_dict()
+    assert cached_domain.as_dict() == domain.as_dict()
+    assert cached_domain.fingerprint() == domain.fingerprint()
+
+
+def test_changed_domain_file_invalidates_cache(tmp_path: Path):
+    path = write_domain(tmp_path / "domain.yml")
+    cache_directory = str(tmp_path / "cache")
+    Domain.load(path, cache_directory=cache_directory)
+
+    write_domain(Path(path), DOMAIN.replace("- goodbye", "- ask"))
+    domain = Domain.load(path, cache_directory=cache_directory)
+
+    assert "ask" in domain.intents
+    assert "goodbye" not in domain.intents
+
+
+def test_cache_key_depends_on_domain_code(tmp_path: Path, monkeypatch: MonkeyPatch):
+    files = [write_domain(tmp_path / "domain.yml")]
+    key = domain_cache.cache_key(Domain, files)
+
+    domain_cache._code_version.cache_clear()
+    monkeypatch.setattr(domain_cache, "DOMAIN_CACHE_VERSION", 2)
+
+    assert domain_cache.cache_key(Domain, files) != key
+    domain_cache._code_version.cache_clear()
@@ -0,0 +1,139 @@
+from typing import Any, List
+
+import pytest
+
+from wechatter.shared.dm.events import (
+    ActionExecuted,
+    Event,
+    LegacyForm,
+    SessionStarted,
+    UserUttered,
+    deserialise_events,
+    do_events_begin_with_session_start,
+)
+
+
+@pytest.mark.parametrize(
+    "type_name, event_class",
+    [
+        ("user", UserUttered),
+        ("action", ActionExecuted),
+        ("session_started", SessionStarted),
+        ("form", LegacyForm),
+    ],
+)
+def test_resolve_by_type_uses_registry(type_name: str, event_class: type):
+    assert Event._registered_types[type_name] is event_class
+    assert Event.resolve_by_type(type_name) is event_class
+
+
+def test_resolve_by_type_finds_events_with_late_type_name():
+    class PluginEvent(Event):
+        def as_story_string(self) -> None:
+            return None
+
+        def __eq__(self, other: Any) -> bool:
+            return isinstance(other, PluginEvent)
+
+    PluginEvent.type_name = "plugin_event_with_late_type_name"
+
+    assert Event.resolve_by_type("plugin_event_with_late_type_name") is PluginEvent
+
+
+def test_resolve_by_type_with_unknown_type():
+    assert Event.resolve_by_type("unknown", default=UserUttered) is UserUttered
+    assert Event.resolve_by_type("topic") is None
+    with pytest.raises(ValueError):
+        Event.resolve_by_type("unknown")
+
+
+def test_deserialise_events():
+    events = [UserUttered("hello", {"name": "greet"}), ActionExecuted("utter_hi")]
+
+    assert deserialise_events([event.as_dict() for event in events]) == events
+
+
+def test_user_uttered_does_not_change_the_intent_of_the_caller():
+    name = "".join(["gre", "et"])
+    intent = {"name": name, "confidence": 0.9}
+
+    event = UserUttered("hello", intent)
+
+    assert event.intent == intent
+    assert event.intent is not intent
+    assert intent["name"] is name
+
+
+def test_user_uttered_is_not_changed_by_the_parse_data_of_the_caller():
+    parse_data = {"intent": {"name": "greet"}, "entities": [], "text": "hello"}
+    event = UserUttered("hello", parse_data["intent"], [], parse_data)
+
+    parse_data["text"] = "changed"
+    parse_data["entities"] = [{"entity": "city", "value": "Berlin"}]
+
+    assert event.parse_data["text"] == "hello"
+    assert event.parse_data["entities"] == []
+
+
+def test_user_uttered_only_keeps_the_parse_data_without_attribute():
+    intent = {"name": "greet", "confidence": 0.9}
+    ranking = [intent, {"name": "goodbye", "confidence": 0.1}]
+    entities = [{"entity": "city", "value": "Berlin"}]
+    parse_data = {
+        "intent": intent,
+        "entities": entities,
+        "text": "hello",
+        "intent_ranking": ranking,
+    }
+
+    event = UserUttered("hello", intent, entities, parse_data)
+
+    assert event._parse_data_extra == {"intent_ranking": ranking}
+    assert event.parse_data == {**parse_data, "message_id": None, "metadata": {}}
+    # the parse data isn't kept once it was created
+    assert event.parse_data is not event.parse_data
+    assert event._parse_data_extra == {"intent_ranking": ranking}
+
+    event.entities.append({"entity": "date", "value": "today"})
+    assert event.parse_data["entities"] == [{"entity": "city", "value": "Berlin"}]
+
+
+def test_user_uttered_keeps_parse_data_which_differs_from_attributes():
+    parse_data = {"text": "other text", "entities": [{"entity": "city"}]}
+
+    event = UserUttered("hello", {"name": "greet"}, [], parse_data)
+
+    assert event.text == "hello"
+    assert event.parse_data["text"] == "other text"
+    assert event.parse_data["entities"] == [{"entity": "city"}]
+    assert event.parse_data["intent"] == {"name": "greet"}
+
+
+def test_deserialised_events_are_not_shared():
+    serialised = ActionExecuted("action_listen", timestamp=1.0).as_dict()
+
+    first, second = deserialise_events([serialised, serialised])
+
+    assert first == second
+    assert first is not second
+    assert first.metadata is not second.metadata
+
+
+@pytest.mark.parametrize(
+    "events, expected",
+    [
+        ([ActionExecuted("action_session_start"), SessionStarted()], True),
+        (
+            [
+                ActionExecuted("action_session_start", timestamp=1.0),
+                SessionStarted(timestamp=2.0),
+                ActionExecuted("action_listen"),
+            ],
+            True,
+        ),
+        ([ActionExecuted("action_listen"), SessionStarted()], False),
+        ([ActionExecuted("action_session_start")], False),
+    ],
+)
+def test_do_events_begin_with_session_start(events: List[Event], expected: bool):
+    assert do_events_begin_with_session_start(events) == expected
@@ -0,0 +1,179 @@
+import copy
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+from wechatter.shared.dm.dm_config import SHOULD_NOT_BE_SET
+from wechatter.shared.dm.domain import Domain
+from wechatter.shared.dm.slots import (
+    BooleanSlot,
+    InvalidSlotTypeException,
+    ListSlot,
+    Slot,
+    SlotTable,
+    TextSlot,
+)
+
+
+def create_slots() -> List[Slot]:
+    return [
+        TextSlot("name"),
+        BooleanSlot("confirmed"),
+        ListSlot("items"),
+        TextSlot("unfeaturized", influence_conversation=False),
+        BooleanSlot("initially_true", initial_value=True),
+    ]
+
+
+@pytest.mark.parametrize("omit_unset_slots", [False, True])
+def test_slot_table_sub_state_parity(omit_unset_slots: bool):
+    slots = {slot.name: slot for slot in create_slots()}
+    table = SlotTable(create_slots())
+
+    for name, value in [
+        ("name", "Ada"),
+        ("confirmed", False),
+        ("items", []),
+        ("unfeaturized", "x"),
+        ("name", SHOULD_NOT_BE_SET),
+        ("items", ["book"]),
+        ("confirmed", None),
+    ]:
+        slots[name].value = value
+        table[name].value = value
+
+        assert table.sub_state(omit_unset_slots) == Domain._get_slots_sub_state(
+            SimpleNamespace(slots=slots), omit_unset_slots
+        )
+
+
+def test_slot_table_keeps_features_in_place():
+    table = SlotTable(create_slots())
+    features = table["confirmed"].features()
+
+    table["confirmed"].value = True
+    assert list(features) == [1.0, 1.0]
+
+    table["confirmed"].reset()
+    assert list(features) == [0.0, 0.0]
+    assert list(table["confirmed"].features()) == BooleanSlot("x").as_feature()
+
+
+class GrowingSlot(Slot):
+    type_name = "growing_test_slot"
+
+    def _as_feature(self) -> List[float]:
+        return [1.0] * (len(self.value) if self.value else 1)
+
+
+def test_slot_with_unexpected_features_leaves_table():
+    slot = GrowingSlot("growing")
+    table = SlotTable([slot, TextSlot("name")])
+
+    slot.value = [1, 2, 3]
+
+    assert slot._table is None
+    assert list(slot.features()) == [1.0, 1.0, 1.0]
+    assert table.sub_state() == {"growing": (1.0, 1.0, 1.0)}
+
+
+def test_copied_slot_is_not_part_of_the_table():
+    table = SlotTable(create_slots())
+    copied = copy.copy(table["name"])
+
+    copied.value = "Ada"
+
+    assert copied._table is None
+    assert "name" not in table.sub_state()
+
+
+def test_deep_copied_table_is_independent():
+    table = SlotTable(create_slots())
+    copied = copy.deepcopy(table)
+
+    copied["name"].value = "Ada"
+
+    assert copied["name"]._table is copied
+    assert copied.sub_state() == {"name": (1.0,), "initially_true": (1.0, 1.0)}
+    assert table.sub_state() == {"initially_true": (1.0, 1.0)}
+
+
+@pytest.fixture
+def slot_registry(monkeypatch: pytest.MonkeyPatch):
+    # slot classes defined in a test are only registered for this test
+    monkeypatch.setattr(Slot, "_registered_types", dict(Slot._registered_types))
+
+
+class CustomSlot(Slot):
+    def _as_feature(self) -> List[float]:
+        return [1.0 if self.value else 0.0]
+
+
+def test_register_custom_slot_type(slot_registry):
+    Slot.register_type(CustomSlot, "custom_test_slot")
+
+    assert Slot.resolve_by_type("custom_test_slot") is CustomSlot
+    domain = Domain.from_yaml(
+        'version: "2.0"\nslots:\n  flag:\n    type: custom_test_slot\n'
+    )
+    assert isinstance(domain.slots[0], CustomSlot)
+
+
+def test_slot_types_are_registered_by_their_type_name(slot_registry):
+    class NamedSlot(CustomSlot):
+        type_name = "named_test_slot"
+
+    assert Slot.resolve_by_type("named_test_slot") is NamedSlot
+    # registering the same class again is fine
+    Slot.register_type(NamedSlot)
+    assert Slot.resolve_by_type("named_test_slot") is NamedSlot
+
+
+def test_register_slot_type_with_duplicate_name(slot_registry):
+    Slot.register_type(CustomSlot, "custom_test_slot")
+
+    class OtherSlot(CustomSlot):
+        pass
+
+    with pytest.raises(InvalidSlotTypeException):
+        Slot.register_type(OtherSlot, "custom_test_slot")
+    with pytest.raises(InvalidSlotTypeException):
+        Slot.register_type(OtherSlot, TextSlot.type_name)
+
+    assert Slot.resolve_by_type("custom_test_slot") is CustomSlot
+    assert Slot.resolve_by_type(TextSlot.type_name) is TextSlot
+
+
+@pytest.mark.parametrize("slot_class", [dict, TextSlot("name"), CustomSlot])
+def test_register_invalid_slot_type(slot_registry, slot_class):
+    # `CustomSlot` doesn't define a type name
+    with pytest.raises(InvalidSlotTypeException):
+        Slot.register_type(slot_class)
+
+
+def test_resolve_slot_type_after_late_registration(slot_registry):
+    with pytest.raises(InvalidSlotTypeException):
+        Slot.resolve_by_type("late_test_slot")
+
+    # failed lookups aren't cached
+    Slot.register_type(CustomSlot, "late_test_slot")
+    assert Slot.resolve_by_type("late_test_slot") is CustomSlot
+
+
+def test_resolve_slot_type_with_late_type_name(slot_registry):
+    class LateSlot(CustomSlot):
+        pass
+
+    LateSlot.type_name = "late_type_name_test_slot"
+
+    assert Slot.resolve_by_type("late_type_name_test_slot") is LateSlot
+    # the subclass lookup is cached
+    assert Slot._registered_types["late_type_name_test_slot"] is LateSlot
+
+
+def test_resolve_slot_type_by_module_path(slot_registry):
+    module_path = f"{__name__}.CustomSlot"
+
+    assert Slot.resolve_by_type(module_path) is CustomSlot
+    assert Slot._registered_types[module_path] is CustomSlot
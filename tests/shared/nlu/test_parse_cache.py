@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from wechatter.shared.nlu.parse_cache import SQLiteParseCache
+
+
+def test_sqlite_parse_cache_is_opened_on_first_use(tmp_path):
+    path = str(tmp_path / "cache" / "parse_cache.db")
+    cache = SQLiteParseCache(path)
+    assert not os.path.exists(path)
+
+    cache.set("key", {"intent": {"name": "greet"}})
+    assert cache.get("key") == {"intent": {"name": "greet"}}
+    assert len(cache) == 1
+    cache.close()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_sqlite_parse_cache_connects_again_after_fork(tmp_path):
+    cache = SQLiteParseCache(str(tmp_path / "parse_cache.db"))
+    cache.set("parent", {"text": "parent"})
+    parent_connection = cache._connection
+
+    pid = os.fork()
+    if pid == 0:
+        # child: must not use the connection of the parent
+        ok = cache._connection is not parent_connection
+        cache.set("child", {"text": "child"})
+        ok = ok and cache.get("parent") == {"text": "parent"}
+        os._exit(0 if ok else 1)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert cache._connection is parent_connection
+    assert cache.get("child") == {"text": "child"}
+    cache.close()
@@ -0,0 +1,64 @@
+import concurrent.futures
+from typing import Any, Text
+
+import pytest
+from ruamel import yaml
+
+import wechatter.shared.utils.io
+
+
+def read_yaml_without_reuse(content: Text, reader_type: Text = "safe") -> Any:
+    """`read_yaml` as it was before parsers were reused."""
+    if all(ord(character) < 128 for character in content):
+        content = (
+            content.encode("utf-8")
+            .decode("raw_unicode_escape")
+            .encode("utf-16", "surrogatepass")
+            .decode("utf-16")
+        )
+
+    yaml_parser = yaml.YAML(typ=reader_type)
+    yaml_parser.preserve_quotes = True
+
+    return yaml_parser.load(content) or {}
+
+
+NLU_CORPUS = "nlu:\n" + "".join(
+    f"- intent: intent_{i}\n  examples: |\n"
+    + "".join(f"    - example {j} of intent {i}\n" for j in range(20))
+    for i in range(100)
+)
+
+
+@pytest.mark.parametrize("reader_type", ["safe", "rt"])
+@pytest.mark.parametrize(
+    "content",
+    [
+        "intents:\n- greet\n- goodbye\n",
+        'responses:\n  utter_greet:\n  - text: "hi \\U0001F600 there"\n',
+        "a: 'single \\n quoted'\nb: yes\nc: on\nd: 1.0\ne: 0o17\nf: ~\n",
+        "text: 你好 \\u4f60\n",
+        "emoji: 😀\nlist: [1, 2]\n",
+        'key: "\\ud83d\\ude00"\n',
+        "nlu:\n- intent: greet\n  examples: |\n    - hello \\ world\n    - hi\n",
+        "",
+        NLU_CORPUS,
+    ],
+)
+def test_read_yaml_parity(content: Text, reader_type: Text):
+    expected = read_yaml_without_reuse(content, reader_type)
+
+    # the second call reuses the parser of the first one
+    assert wechatter.shared.utils.io.read_yaml(content, reader_type) == expected
+    assert wechatter.shared.utils.io.read_yaml(content, reader_type) == expected
+
+
+def test_read_yaml_parity_in_threads():
+    expected = read_yaml_without_reuse(NLU_CORPUS)
+
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        results = list(
+            executor.map(wechatter.shared.utils.io.read_yaml, [NLU_CORPUS] * 16)
+        )
+
+    assert all(result == expected for result in results)
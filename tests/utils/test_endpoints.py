@@ -0,0 +1,91 @@
+import asyncio
+from typing import List
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from wechatter.utils.endpoints import EndpointConfig
+
+
+async def _request_dropped_connection(method: str, retries: int) -> EndpointConfig:
+    calls: List[web.Request] = []
+
+    async def handler(request: web.Request) -> web.Response:
+        calls.append(request)
+        # the endpoint received the request but the connection is lost
+        request.transport.close()
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_route("*", "/", handler)
+    async with TestServer(app) as server:
+        endpoint = EndpointConfig(
+            str(server.make_url("/")), retries=retries, retry_backoff=0
+        )
+        try:
+            with pytest.raises(aiohttp.ClientError):
+                await endpoint.request(method)
+        finally:
+            await endpoint.close()
+
+    assert calls
+    return endpoint
+
+
+def test_idempotent_requests_are_retried():
+    endpoint = asyncio.run(_request_dropped_connection("get", retries=2))
+    assert endpoint.pool_metrics()["retries"] == 2
+
+
+def test_requests_which_were_sent_are_not_retried():
+    endpoint = asyncio.run(_request_dropped_connection("post", retries=2))
+    assert endpoint.pool_metrics()["retries"] == 0
+
+
+def test_requests_which_could_not_be_sent_are_retried(monkeypatch):
+    in_flight_while_waiting = []
+    sleep = asyncio.sleep
+
+    async def record_in_flight(delay: float) -> None:
+        in_flight_while_waiting.append(endpoint.pool_metrics()["requests_in_flight"])
+        await sleep(0)
+
+    async def request() -> None:
+        monkeypatch.setattr(asyncio, "sleep", record_in_flight)
+        try:
+            with pytest.raises(aiohttp.ClientConnectorError):
+                await endpoint.request("post")
+        finally:
+            monkeypatch.undo()
+            await endpoint.close()
+
+    # nothing listens on port 9 (discard) on the test machines
+    endpoint = EndpointConfig("http://127.0.0.1:9", retries=2, retry_backoff=0.01)
+    asyncio.run(request())
+
+    assert endpoint.pool_metrics()["retries"] == 2
+    assert in_flight_while_waiting == [0, 0]
+
+
+def test_session_of_previous_event_loop_is_closed():
+    endpoint = EndpointConfig("http://localhost")
+
+    async def session() -> aiohttp.ClientSession:
+        return endpoint.pooled_session()
+
+    first_loop = asyncio.new_event_loop()
+    second_loop = asyncio.new_event_loop()
+    try:
+        first = first_loop.run_until_complete(session())
+        second = second_loop.run_until_complete(session())
+        first_loop.run_until_complete(asyncio.sleep(0))
+
+        assert first is not second
+        assert first.closed
+        assert not second.closed
+    finally:
+        second_loop.run_until_complete(endpoint.close())
+        first_loop.close()
+        second_loop.close()
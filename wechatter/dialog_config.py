@@ -18,6 +18,13 @@ import os
 DEFAULT_REQUEST_TIMEOUT = 60 * 5  # 5 minutes
 DEFAULT_RESPONSE_TIMEOUT = 60 * 60  # 1 hour
 
+# connection pool of the HTTP session which is shared by all requests to an endpoint
+DEFAULT_CONNECTION_LIMIT = 100  # 0 means no limit
+DEFAULT_CONNECTION_LIMIT_PER_HOST = 0  # 0 means no limit
+DEFAULT_KEEPALIVE_TIMEOUT = 15  # in seconds
+DEFAULT_REQUEST_RETRIES = 0
+DEFAULT_REQUEST_RETRY_BACKOFF = 0.5  # in seconds, doubled for every retry
+
 TEST_DATA_FILE = "test.md"
 TRAIN_DATA_FILE = "train.md"
 NLG_DATA_FILE = "responses.md"
@@ -50,6 +57,18 @@ ENV_LOG_LEVEL_LIBRARIES = "LOG_LEVEL_LIBRARIES"
 DEFAULT_SANIC_WORKERS = 1
 ENV_SANIC_WORKERS = "SANIC_WORKERS"
 ENV_SANIC_BACKLOG = "SANIC_BACKLOG"
+DEFAULT_SANIC_BACKLOG = 100
+
+DEFAULT_MAX_CONCURRENT_TRAININGS = 1  # shared by all server workers
+ENV_MAX_CONCURRENT_TRAININGS = "MAX_CONCURRENT_TRAININGS"
+DEFAULT_TRAINING_JOB_POLL_INTERVAL = 1  # in seconds, checks for free slots / cancels
+DEFAULT_TRAINING_JOB_RETENTION = 60 * 60 * 24 * 7  # in seconds, then jobs are removed
+
+ENV_PARSE_CACHE = "PARSE_CACHE"  # "memory" or "sqlite", no parse cache if unset
+ENV_PARSE_CACHE_PATH = "PARSE_CACHE_PATH"  # file of the "sqlite" parse cache
+
+DEFAULT_MODEL_POLL_INTERVAL = 5  # in seconds, how often workers check for a new model
+DEFAULT_WARM_UP_MESSAGES = ["你好", "谢谢", "再见"]  # parsed by new models before use
 
 ENV_GPU_CONFIG = "TF_GPU_MEMORY_ALLOC"
 ENV_CPU_INTER_OP_CONFIG = "TF_INTER_OP_PARALLELISM_THREADS"
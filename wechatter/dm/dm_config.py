@@ -63,3 +63,16 @@ POSTGRESQL_SCHEMA = "POSTGRESQL_SCHEMA"
 # Names of the environment variables defining PostgreSQL pool size and max overflow
 POSTGRESQL_POOL_SIZE = "SQL_POOL_SIZE"
 POSTGRESQL_MAX_OVERFLOW = "SQL_MAX_OVERFLOW"
+
+# maximum number of trackers kept in memory by the `CachedTrackerStore`
+DEFAULT_TRACKER_CACHE_SIZE = 1000
+
+# seconds after which a cached tracker is considered stale and retrieved again,
+# short as it's the only limit for tracker stores which don't count saves
+DEFAULT_TRACKER_CACHE_TTL = 1
+
+# messages which are sent to the NLU server in a single batched parse request
+DEFAULT_NLU_BATCH_SIZE = 32
+
+# seconds to wait for further messages before a batched parse request is sent
+DEFAULT_NLU_BATCH_DELAY = 0.01
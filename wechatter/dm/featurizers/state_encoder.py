@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   state_encoder.py
+
+@Time    :   2021/4/28 2:25 下午
+
+@Desc    :   批量把对话状态编码成NumPy矩阵，训练和线上预测共用
+
+"""
+
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Text, Tuple
+
+import numpy as np
+
+from wechatter.exceptions import MissingDependencyException
+from wechatter.shared.dm.domain import Domain, State
+from wechatter.shared.dm.dm_config import (
+    ACTIVE_LOOP,
+    LOOP_NAME,
+    PREVIOUS_ACTION,
+    SHOULD_NOT_BE_SET,
+    SLOTS,
+    USER,
+)
+from wechatter.shared.nlu.nlu_config import ACTION_NAME, ACTION_TEXT, ENTITIES, INTENT
+
+logger = logging.getLogger(__name__)
+
+
+class EncodedStates(NamedTuple):
+    """Encoded state sequences.
+
+    `features` has the shape `(number of sequences, max history, number of input
+    states)` if it's dense. A sparse `features` matrix is a `scipy.sparse.csr_matrix`
+    with one row per sequence and time step, i.e. with the shape `(number of
+    sequences * max history, number of input states)`.
+
+    The max history is `max_history` if it's set, even if all sequences are
+    shorter, and otherwise the length of the longest sequence. `mask` has the shape
+    `(number of sequences, max history)` and is `False` for padded time steps.
+    Sequences are padded at the start, so the last time step is always the latest
+    state.
+    """
+
+    features: Any
+    mask: np.ndarray
+
+
+class StateEncoder:
+    """Encodes many `State` sequences into NumPy matrices at once.
+
+    The columns are the input states of the domain, column `i` is
+    `domain.input_states[i]`. Intents, entities, previous actions and active loops
+    are one-hot encoded, slots are encoded with the features of the slot starting
+    at the column of their first slot state.
+    """
+
+    def __init__(self, domain: Domain, dtype: Any = np.float32) -> None:
+        """Creates the encoder and precomputes the column layout.
+
+        Args:
+            domain: The domain which defines the input states.
+            dtype: Type of the encoded features.
+        """
+        self.dtype = dtype
+        self.number_of_features = len(domain.input_states)
+
+        # `input_state_map` maps names which are in several sections (e.g. forms
+        # are actions and loops) to their last column, so the columns are
+        # assigned section by section
+        offset = 0
+        self._intent_columns, offset = self._section_columns(domain.intents, offset)
+        self._entity_columns, offset = self._section_columns(
+            domain.entity_states, offset
+        )
+        slot_states_offset = offset
+        offset += len(domain.slot_states)
+        self._action_columns, offset = self._section_columns(
+            domain.action_names_or_texts, offset
+        )
+        self._loop_columns, offset = self._section_columns(domain.form_names, offset)
+
+        # every slot occupies a consecutive slice of its slot states
+        self._slot_columns: Dict[Text, Tuple[int, int]] = {
+            slot_name: (slot_states_offset + start, slot_states_offset + end)
+            for slot_name, (start, end) in domain.slot_feature_offsets.items()
+        }
+
+        if offset != self.number_of_features:
+            raise ValueError(
+                "The layout of the input states doesn't match the domain's "
+                "`input_states`."
+            )
+
+    @staticmethod
+    def _section_columns(
+            names: List[Text], offset: int
+    ) -> Tuple[Dict[Text, int], int]:
+        return (
+            {name: offset + index for index, name in enumerate(names)},
+            offset + len(names),
+        )
+
+    def encode_state(self, state: State) -> np.ndarray:
+        """Encodes a single state into a vector of length `number_of_features`."""
+        features = np.zeros(self.number_of_features, dtype=self.dtype)
+        columns, values = self._state_entries(state)
+        features[columns] = values
+        return features
+
+    def encode(
+            self,
+            sequences: Sequence[List[State]],
+            max_history: Optional[int] = None,
+            sparse: bool = False,
+    ) -> EncodedStates:
+        """Encodes the latest states of every sequence, e.g. for batched prediction.
+
+        Args:
+            sequences: The state sequences, e.g. the result of
+                `Domain.states_for_tracker_history` for several trackers.
+            max_history: Only the last `max_history` states of a sequence are
+                encoded, shorter sequences are padded to `max_history` states.
+                Defaults to the length of the longest sequence.
+            sparse: If `True` the features are returned as CSR matrix, this
+                requires `scipy`.
+
+        Returns:
+            The encoded sequences.
+        """
+        windows = [
+            (sequence_index, max(0, len(sequence) - max_history), len(sequence))
+            if max_history
+            else (sequence_index, 0, len(sequence))
+            for sequence_index, sequence in enumerate(sequences)
+        ]
+        return self._encode_windows(sequences, windows, max_history, sparse)
+
+    def encode_for_training(
+            self,
+            sequences: Sequence[List[State]],
+            max_history: Optional[int] = None,
+            sparse: bool = False,
+    ) -> EncodedStates:
+        """Encodes a window ending at every state of every sequence.
+
+        This creates the training examples for a policy which predicts the next
+        action from the last `max_history` states. The windows of the first
+        sequence come first, each sequence's windows are ordered by their end.
+
+        Args:
+            sequences: The state sequences of the training trackers.
+            max_history: Length of the windows, shorter windows are padded. Defaults
+                to the length of the longest sequence.
+            sparse: If `True` the features are returned as CSR matrix, this
+                requires `scipy`.
+
+        Returns:
+            The encoded windows.
+        """
+        windows = [
+            (
+                sequence_index,
+                max(0, end - max_history) if max_history else 0,
+                end,
+            )
+            for sequence_index, sequence in enumerate(sequences)
+            for end in range(1, len(sequence) + 1)
+        ]
+        return self._encode_windows(sequences, windows, max_history, sparse)
+
+    def _encode_windows(
+            self,
+            sequences: Sequence[List[State]],
+            windows: List[Tuple[int, int, int]],
+            max_history: Optional[int],
+            sparse: bool,
+    ) -> EncodedStates:
+        if sparse:
+            scipy_sparse = _scipy_sparse()
+
+        # every state is encoded once, the windows only select rows of the
+        # encoded states
+        rows, columns, values, sequence_offsets = self._state_entries_of_sequences(
+            sequences
+        )
+        # the row after the last state is all zeros and used for padding
+        padding_row = sequence_offsets[-1]
+        shape = (padding_row + 1, self.number_of_features)
+
+        window_array = np.array(windows, dtype=np.int64).reshape(-1, 3)
+        sequence_indices, starts, ends = window_array.T
+        if max_history:
+            history = max_history
+        else:
+            history = int((ends - starts).max()) if len(window_array) else 0
+
+        # indices of the encoded states for every time step, padded at the start
+        steps = ends[:, np.newaxis] - history + np.arange(history)[np.newaxis, :]
+        mask = steps >= starts[:, np.newaxis]
+        offsets = np.array(sequence_offsets[:-1], dtype=np.int64)[sequence_indices]
+        indices = np.where(mask, offsets[:, np.newaxis] + steps, padding_row)
+
+        if not sparse:
+            encoded = np.zeros(shape, dtype=self.dtype)
+            encoded[rows, columns] = values
+            return EncodedStates(encoded[indices], mask)
+
+        encoded = scipy_sparse.csr_matrix(
+            (np.array(values, dtype=self.dtype), (rows, columns)), shape=shape
+        )
+        return EncodedStates(encoded[indices.ravel()], mask)
+
+    def _state_entries_of_sequences(
+            self, sequences: Sequence[List[State]]
+    ) -> Tuple[List[int], List[int], List[float], List[int]]:
+        """Returns the non zero features of all states of all sequences.
+
+        Returns:
+            Rows, columns and values of the features, and the row of the first state
+            of every sequence followed by the total number of states.
+        """
+        rows: List[int] = []
+        columns: List[int] = []
+        values: List[float] = []
+        sequence_offsets = [0]
+        row = 0
+        for sequence in sequences:
+            for state in sequence:
+                state_columns, state_values = self._state_entries(state)
+                rows.extend([row] * len(state_columns))
+                columns.extend(state_columns)
+                values.extend(state_values)
+                row += 1
+            sequence_offsets.append(row)
+
+        return rows, columns, values, sequence_offsets
+
+    def _state_entries(self, state: State) -> Tuple[List[int], List[float]]:
+        """Returns the columns and values of the non zero features of a state."""
+        columns: List[int] = []
+        values: List[float] = []
+
+        user = state.get(USER, {})
+        if user:
+            column = self._intent_columns.get(user.get(INTENT))
+            if column is not None:
+                columns.append(column)
+                values.append(1.0)
+            for entity in user.get(ENTITIES, ()):
+                column = self._entity_columns.get(entity)
+                if column is not None:
+                    columns.append(column)
+                    values.append(1.0)
+
+        previous_action = state.get(PREVIOUS_ACTION, {})
+        if previous_action:
+            action = previous_action.get(ACTION_NAME) or previous_action.get(
+                ACTION_TEXT
+            )
+            column = self._action_columns.get(action)
+            if column is not None:
+                columns.append(column)
+                values.append(1.0)
+
+        active_loop = state.get(ACTIVE_LOOP, {})
+        if active_loop:
+            column = self._loop_columns.get(active_loop.get(LOOP_NAME))
+            if column is not None:
+                columns.append(column)
+                values.append(1.0)
+
+        for slot_name, slot_features in state.get(SLOTS, {}).items():
+            if (
+                slot_features == SHOULD_NOT_BE_SET
+                or slot_name not in self._slot_columns
+            ):
+                # a slot which must not be set has no features
+                continue
+            start, end = self._slot_columns[slot_name]
+            for column, value in zip(range(start, end), slot_features):
+                if value:
+                    columns.append(column)
+                    values.append(float(value))
+
+        return columns, values
+
+
+def _scipy_sparse() -> Any:
+    try:
+        import scipy.sparse
+    except ImportError:
+        raise MissingDependencyException(
+            "Encoding the states as sparse matrix requires 'scipy'. Please install "
+            "it with 'pip install scipy' or encode the states densely."
+        )
+    return scipy.sparse
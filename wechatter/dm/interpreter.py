@@ -13,23 +13,178 @@
  
 """
 import aiohttp
+import asyncio
 
 import logging
 
 import os
-from typing import Text, Dict, Any, Union, Optional
+from typing import Text, Dict, Any, Union, Optional, List, Tuple, Callable, Awaitable
 
 from wechatter.dm import dm_config
-from wechatter.utils.endpoints import EndpointConfig
+from wechatter.utils.endpoints import ClientResponseError, EndpointConfig
 
 
 logger = logging.getLogger(__name__)
 
+PARSE_SUBPATH = "model/parse"
+BATCH_PARSE_SUBPATH = "model/parse/batch"
+
+
+class ParseBatcher:
+    """Collects concurrent parse requests and sends them as a single batch.
+
+    A batch is sent as soon as `max_batch_size` messages are waiting or
+    `max_batch_delay` seconds after the first message of the batch arrived.
+    """
+
+    def __init__(
+            self,
+            send_batch: Callable[[List[Dict[Text, Any]]], Awaitable[List[Dict[Text, Any]]]],
+            max_batch_size: int = dm_config.DEFAULT_NLU_BATCH_SIZE,
+            max_batch_delay: float = dm_config.DEFAULT_NLU_BATCH_DELAY,
+    ) -> None:
+        """Creates the batcher.
+
+        Args:
+            send_batch: Coroutine which parses a batch of messages and returns the
+                parse results in the same order.
+            max_batch_size: Maximum number of messages per batch.
+            max_batch_delay: Maximum number of seconds a message waits for further
+                messages before the batch is sent.
+        """
+        self._send_batch = send_batch
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self._pending: List[Tuple[Dict[Text, Any], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def parse(self, message: Dict[Text, Any]) -> Dict[Text, Any]:
+        """Adds a message to the next batch and waits for its parse result."""
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._pending.append((message, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_batch_delay, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._send(batch))
+
+    async def _send(self, batch: List[Tuple[Dict[Text, Any], asyncio.Future]]) -> None:
+        try:
+            results = await self._send_batch([message for message, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(
+                    f"Batched parse returned {len(results)} results for "
+                    f"{len(batch)} messages."
+                )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
 
 class WechatterNLUHttpInterpreter():
 
-    def __init__(self, endpoint_config: Optional[EndpointConfig] = None) -> None:
+    def __init__(
+            self,
+            endpoint_config: Optional[EndpointConfig] = None,
+            max_batch_size: int = dm_config.DEFAULT_NLU_BATCH_SIZE,
+            max_batch_delay: float = dm_config.DEFAULT_NLU_BATCH_DELAY,
+    ) -> None:
+        """Creates an interpreter which parses messages with a remote NLU server.
+
+        Args:
+            endpoint_config: Endpoint of the NLU server.
+            max_batch_size: Maximum number of concurrent messages which are sent to
+                the NLU server in a single request. `1` disables batching. Batching
+                is disabled automatically if the NLU server doesn't support it.
+            max_batch_delay: Maximum number of seconds a message waits for further
+                messages before the batch is sent.
+        """
         if endpoint_config:
             self.endpoint_config = endpoint_config
         else:
             self.endpoint_config = EndpointConfig(dm_config.DEFAULT_SERVER_URL)
+
+        self._batch_parse_supported = True
+        self._batcher: Optional[ParseBatcher] = None
+        if max_batch_size > 1:
+            self._batcher = ParseBatcher(
+                self._parse_batch, max_batch_size, max_batch_delay
+            )
+
+    async def parse(
+            self,
+            text: Text,
+            message_id: Optional[Text] = None,
+            tracker: Optional["DialogueStateTracker"] = None,
+            metadata: Optional[Dict] = None,
+    ) -> Dict[Text, Any]:
+        """Parses a message with the remote NLU server.
+
+        Concurrent calls are combined into batched requests if batching is enabled.
+        """
+        default_return = {
+            "intent": {"name": "", "confidence": 0.0},
+            "entities": [],
+            "text": "",
+        }
+
+        message = {"text": text, "message_id": message_id}
+        if metadata:
+            message["metadata"] = metadata
+
+        # noinspection PyBroadException
+        try:
+            if self._batcher:
+                result = await self._batcher.parse(message)
+            else:
+                result = await self._parse_message(message)
+        except Exception:
+            logger.exception(f"Failed to parse text '{text}' using the NLU server.")
+            return default_return
+
+        return result if result is not None else default_return
+
+    async def _parse_message(self, message: Dict[Text, Any]) -> Dict[Text, Any]:
+        return await self.endpoint_config.request("post", PARSE_SUBPATH, json=message)
+
+    async def _parse_batch(
+            self, messages: List[Dict[Text, Any]]
+    ) -> List[Dict[Text, Any]]:
+        if self._batch_parse_supported:
+            try:
+                response = await self.endpoint_config.request(
+                    "post", BATCH_PARSE_SUBPATH, json={"messages": messages}
+                )
+                return response["results"]
+            except ClientResponseError as e:
+                if e.status not in (404, 405):
+                    raise
+
+                logger.info(
+                    f"The NLU server at '{self.endpoint_config.url}' doesn't support "
+                    f"batched parse requests. Messages are parsed one by one."
+                )
+                self._batch_parse_supported = False
+                self._batcher = None
+
+        return await asyncio.gather(
+            *[self._parse_message(message) for message in messages]
+        )
@@ -14,11 +14,13 @@
 """
 
 import contextlib
-import itertools
+import copy
 import json
 import logging
 import os
 import pickle
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone
 
 from time import sleep
@@ -33,14 +35,31 @@ from typing import (
     Text,
     Union,
     TYPE_CHECKING,
+    Tuple,
 )
-from wechatter.shared.dm.conversation import Dialogue
+import wechatter.shared.utils.io
+from wechatter.dm import dm_config
+from wechatter.shared.dm import binary_format
+from wechatter.shared.dm.conversation import Dialogue, LazyDialogue, session_starts
 from wechatter.shared.dm.domain import Domain
-from wechatter.shared.dm.events import SessionStarted
-from wechatter.shared.exceptions import ConnectionException
+from wechatter.shared.dm.dm_config import ACTION_LISTEN_NAME
+from wechatter.shared.dm.events import (
+    ActionExecuted,
+    BotUttered,
+    Event,
+    SessionStarted,
+    UserUttered,
+)
+from wechatter.shared.dm.trackers import DialogueStateTracker
+from wechatter.shared.exceptions import ConnectionException, RasaCoreException
 
 from wechatter.utils.endpoints import EndpointConfig
 
+if TYPE_CHECKING:
+    # event brokers aren't part of wechatter yet, any object with a `publish`
+    # method which takes the serialised event can be used
+    from rasa.core.brokers.broker import EventBroker
+
 logger = logging.getLogger(__name__)
 
 
@@ -52,7 +71,11 @@ class TrackerStore:
     def __init__(
             self,
             domain: Optional[Domain],
-            event_broker: Optional[EventBroker] = None,
+            event_broker: Optional["EventBroker"] = None,
+            append_only: bool = False,
+            binary: bool = False,
+            snapshot_interval: Optional[int] = None,
+            allow_pickle: bool = False,
             **kwargs: Dict[Text, Any],
     ) -> None:
         """Create a TrackerStore.
@@ -61,11 +84,26 @@ class TrackerStore:
             domain: The `Domain` to initialize the `DialogueStateTracker`.
             event_broker: An event broker to publish any new events to another
                 destination.
+            append_only: If `True`, saving a tracker only writes the events which
+                were added since the tracker was persisted the last time instead of
+                serialising the whole conversation again.
+            binary: If `True`, trackers are persisted in the compact binary format
+                instead of JSON. Both formats can always be read.
+            snapshot_interval: If set, a snapshot of the tracker state is persisted
+                every `snapshot_interval` events. Retrieving a tracker then only
+                replays the events which were added after the latest snapshot.
+            allow_pickle: If `True`, trackers which were persisted with `pickle` by
+                old versions are still loaded. Only enable this for tracker stores
+                whose content is trusted, as unpickling can execute arbitrary code.
             kwargs: Additional kwargs.
         """
         self.domain = domain
         self.event_broker = event_broker
         self.max_event_history = None
+        self.append_only = append_only
+        self.binary = binary
+        self.snapshot_interval = snapshot_interval
+        self.allow_pickle = allow_pickle
 
         # TODO: Remove this in Rasa Open Source 3.0
         self.retrieve_events_from_previous_conversation_sessions: Optional[bool] = None
@@ -77,7 +115,7 @@ class TrackerStore:
         )
 
         if retrieve_events_from_previous_conversation_sessions is not None:
-            rasa.shared.utils.io.raise_deprecation_warning(
+            wechatter.shared.utils.io.raise_deprecation_warning(
                 f"Specifying the `retrieve_events_from_previous_conversation_sessions` "
                 f"kwarg for the `{self.__class__.__name__}` class is deprecated and "
                 f"will be removed in Rasa Open Source 3.0. "
@@ -91,7 +129,7 @@ class TrackerStore:
     def create(
             obj: Union["TrackerStore", EndpointConfig, None],
             domain: Optional[Domain] = None,
-            event_broker: Optional[EventBroker] = None,
+            event_broker: Optional["EventBroker"] = None,
     ) -> "TrackerStore":
         """Factory to create a tracker store."""
         if isinstance(obj, TrackerStore):
@@ -196,6 +234,24 @@ class TrackerStore:
         """
         raise NotImplementedError()
 
+    def conversation_version(self, sender_id: Text) -> Optional[int]:
+        """Returns the number of times the conversation was saved.
+
+        Tracker stores which can tell this cheaply (e.g. from a counter which is
+        stored next to the tracker) should override this method. It allows caches
+        like `CachedTrackerStore` to notice that another process saved the
+        conversation without retrieving the tracker.
+
+        Args:
+            sender_id: Conversation ID.
+
+        Returns:
+            A number which increases by one with every save of the conversation,
+            `0` for unknown conversations and `None` if the tracker store doesn't
+            count saves.
+        """
+        return None
+
     def retrieve_full_tracker(
             self, conversation_id: Text
     ) -> Optional[DialogueStateTracker]:
@@ -214,36 +270,171 @@ class TrackerStore:
 
     def stream_events(self, tracker: DialogueStateTracker) -> None:
         """Streams events to a message broker"""
-        offset = self.number_of_existing_events(tracker.sender_id)
-        events = tracker.events
-        for event in list(itertools.islice(events, offset, len(events))):
+        for event in self.unpersisted_events(tracker):
             body = {"sender_id": tracker.sender_id}
             body.update(event.as_dict())
             self.event_broker.publish(body)
 
-    def number_of_existing_events(self, sender_id: Text) -> int:
-        """Return number of stored events for a given sender id."""
-        old_tracker = self.retrieve(sender_id)
+    def unpersisted_events(self, tracker: DialogueStateTracker) -> List[Event]:
+        """Returns the events of the tracker which were not persisted yet.
+
+        The tracker counts the events which were added since it was saved or
+        retrieved the last time (see `DialogueStateTracker.mark_as_persisted`),
+        hence the persisted record doesn't have to be read. If several processes
+        save the same conversation, each of them only writes its own events.
+
+        Args:
+            tracker: The tracker which is about to be saved.
+
+        Returns:
+            The events which were added after the tracker was persisted.
+        """
+        events = list(tracker.events)
+        number_of_new_events = tracker.number_of_unpersisted_events
+        if number_of_new_events > len(events):
+            # more than `max_event_history` events were added since
+            logger.warning(
+                f"{number_of_new_events - len(events)} events of conversation ID "
+                f"'{tracker.sender_id}' were dropped from the tracker before they "
+                f"were persisted. Increase `max_event_history` to keep them."
+            )
+            return events
 
-        return len(old_tracker.events) if old_tracker else 0
+        return events[len(events) - number_of_new_events:]
 
     def keys(self) -> Iterable[Text]:
         """Returns the set of values for the tracker store's primary key"""
         raise NotImplementedError()
 
     @staticmethod
-    def serialise_tracker(tracker: DialogueStateTracker) -> Text:
-        """Serializes the tracker, returns representation of the tracker."""
+    def serialise_tracker(
+            tracker: DialogueStateTracker, binary: bool = False
+    ) -> Union[Text, bytes]:
+        """Serializes the tracker, returns representation of the tracker.
+
+        Args:
+            tracker: The tracker to serialize.
+            binary: If `True` the compact binary format is used instead of JSON.
+        """
         dialogue = tracker.as_dialogue()
 
+        if binary:
+            return binary_format.encode_dialogue(dialogue)
+
         return json.dumps(dialogue.as_dict())
 
     @staticmethod
+    def serialise_events(
+            events: List[Event], binary: bool = False
+    ) -> Union[Text, bytes]:
+        """Serializes a slice of tracker events for append-only persistence.
+
+        Args:
+            events: The events which should be appended to the stored conversation.
+            binary: If `True` the compact binary format is used instead of JSON.
+
+        Returns:
+            Representation of the events.
+        """
+        return TrackerStore._encode_event_slice(
+            [event.as_dict() for event in events], binary
+        )
+
+    @staticmethod
+    def _encode_event_slice(
+            serialised_events: List[Dict[Text, Any]], binary: bool = False
+    ) -> Union[Text, bytes]:
+        if binary:
+            return binary_format.encode_serialised_events(serialised_events)
+
+        return json.dumps(serialised_events)
+
+    @staticmethod
+    def _decode_event_slice(
+            serialised: Union[Text, bytes, List[Dict[Text, Any]]]
+    ) -> List[Dict[Text, Any]]:
+        if isinstance(serialised, list):
+            # the slice of a tracker which was persisted as a single record
+            return serialised
+
+        if binary_format.is_binary_payload(serialised):
+            return binary_format.decode_events(serialised)
+
+        return json.loads(serialised)
+
+    def _persisted_slices(
+            self,
+            sender_id: Text,
+            persisted: Union[Text, bytes, List[Union[Text, bytes]]],
+    ) -> List[Union[Text, bytes, List[Dict[Text, Any]]]]:
+        """Returns the event slices of a persisted tracker.
+
+        Trackers are persisted as a list of event slices, see `serialise_sessions`
+        and `serialise_events`. Trackers which were persisted as a single record
+        (see `serialise_tracker`) are decoded and returned as a single slice.
+        """
+        if isinstance(persisted, list):
+            return persisted
+
+        dialogue = self._load_dialogue(sender_id, persisted)
+        if isinstance(dialogue, LazyDialogue):
+            return [dialogue.serialised_events]
+
+        return [[event.as_dict() for event in dialogue.events]]
+
+    def serialise_sessions(
+            self,
+            tracker: DialogueStateTracker,
+            persisted: Optional[Union[Text, bytes, List[Union[Text, bytes]]]],
+    ) -> List[Union[Text, bytes]]:
+        """Serializes the tracker as one event slice per conversation session.
+
+        The persisted slices which precede the events of the tracker, e.g. the
+        previous sessions of a tracker which was retrieved with `retrieve`, are kept
+        as they are. They are neither decoded nor serialised again.
+
+        Args:
+            tracker: The tracker which is about to be saved.
+            persisted: The persisted tracker, if any.
+
+        Returns:
+            The event slices which replace the persisted tracker.
+        """
+        serialised_events = [event.as_dict() for event in tracker.events]
+        previous_slices = []
+
+        if persisted is not None and tracker.events:
+            slices = self._persisted_slices(tracker.sender_id, persisted)
+            first_event = tracker.events[0]
+            # the tracker usually starts with the latest session, which is the
+            # latest slice
+            for slice_index in range(len(slices) - 1, -1, -1):
+                persisted_events = self._decode_event_slice(slices[slice_index])
+                index = _index_of_persisted_event(first_event, persisted_events)
+                if index is not None:
+                    previous_slices = slices[:slice_index]
+                    serialised_events = persisted_events[:index] + serialised_events
+                    break
+
+        boundaries = [0, *session_starts(serialised_events), len(serialised_events)]
+        return previous_slices + [
+            self._encode_event_slice(serialised_events[start:end], self.binary)
+            for start, end in zip(boundaries, boundaries[1:])
+            if start < end
+        ]
+
     def _deserialize_dialogue_from_pickle(
-            sender_id: Text, serialised_tracker: bytes
+            self, sender_id: Text, serialised_tracker: bytes
     ) -> Dialogue:
+        if not self.allow_pickle:
+            raise RasaCoreException(
+                f"The tracker of conversation ID '{sender_id}' is neither JSON nor "
+                f"binary encoded. Pickled trackers are only loaded if the tracker "
+                f"store is created with `allow_pickle=True`."
+            )
+
         # TODO: Remove in Rasa Open Source 3.0
-        rasa.shared.utils.io.raise_deprecation_warning(
+        logger.warning(
             f"Found pickled tracker for "
             f"conversation ID '{sender_id}'. Deserialization of pickled "
             f"trackers is deprecated and will be removed in Rasa Open Source 3.0. Rasa "
@@ -254,19 +445,582 @@ class TrackerStore:
         return pickle.loads(serialised_tracker)
 
     def deserialise_tracker(
-            self, sender_id: Text, serialised_tracker: Union[Text, bytes]
+            self,
+            sender_id: Text,
+            serialised_tracker: Union[Text, bytes],
+            serialised_snapshot: Optional[Text] = None,
+            full_tracker: bool = True,
     ) -> Optional[DialogueStateTracker]:
-        """Deserializes the tracker and returns it."""
+        """Deserializes the tracker and returns it.
 
-        tracker = self.init_tracker(sender_id)
+        Args:
+            sender_id: Conversation ID of the tracker.
+            serialised_tracker: The persisted tracker.
+            serialised_snapshot: The latest persisted snapshot of the tracker state
+                (see `serialise_snapshot`), if any.
+            full_tracker: If `False` only the events of the latest conversation
+                session are deserialized.
+
+        Returns:
+            The deserialized tracker.
+        """
+
+        dialogue = self._load_dialogue(sender_id, serialised_tracker)
 
+        return self._recreate_tracker(
+            sender_id, dialogue, serialised_snapshot, full_tracker
+        )
+
+    def _load_dialogue(
+            self, sender_id: Text, serialised_tracker: Union[Text, bytes]
+    ) -> Dialogue:
+        """Decodes the persisted tracker without creating its events.
+
+        Trackers which were pickled are loaded completely if `allow_pickle` is set.
+        """
         try:
-            dialogue = Dialogue.from_parameters(json.loads(serialised_tracker))
+            if binary_format.is_binary_payload(serialised_tracker):
+                return binary_format.decode_dialogue(serialised_tracker, lazy=True)
+            return LazyDialogue.from_parameters(json.loads(serialised_tracker))
         except UnicodeDecodeError:
-            dialogue = self._deserialize_dialogue_from_pickle(
+            return self._deserialize_dialogue_from_pickle(
                 sender_id, serialised_tracker
             )
 
-        tracker.recreate_from_dialogue(dialogue)
+    def deserialise_tracker_from_events(
+            self,
+            sender_id: Text,
+            serialised_events: Iterable[Union[Text, bytes]],
+            serialised_snapshot: Optional[Text] = None,
+            full_tracker: bool = True,
+    ) -> Optional[DialogueStateTracker]:
+        """Deserializes a tracker which was persisted in append-only mode.
+
+        If only the latest conversation session is deserialized, the slices are
+        decoded from the latest one backwards until the start of the session was
+        found. The slices of the previous sessions are not decoded.
+
+        Args:
+            sender_id: Conversation ID of the tracker.
+            serialised_events: The persisted event slices in the order in which they
+                were written (see `serialise_events` and `serialise_sessions`).
+            serialised_snapshot: The latest persisted snapshot of the tracker state
+                (see `serialise_snapshot`), if any.
+            full_tracker: If `False` only the events of the latest conversation
+                session are deserialized.
+
+        Returns:
+            The tracker containing the events of all slices.
+        """
+        decoded: List[List[Dict[Text, Any]]] = []
+        starts_with_session = False
+        for serialised in reversed(list(serialised_events)):
+            events = self._decode_event_slice(serialised)
+            decoded.append(events)
+            if full_tracker:
+                continue
+
+            # the previous slice was only needed for the `action_session_start`
+            # which might precede the `SessionStarted` event
+            if starts_with_session or any(
+                event.get("event") == SessionStarted.type_name for event in events[1:]
+            ):
+                break
+            starts_with_session = (
+                bool(events) and events[0].get("event") == SessionStarted.type_name
+            )
+
+        # the events are only created once they are used
+        dialogue = LazyDialogue(
+            sender_id, [event for events in reversed(decoded) for event in events]
+        )
+
+        return self._recreate_tracker(
+            sender_id, dialogue, serialised_snapshot, full_tracker
+        )
+
+    def _recreate_tracker(
+            self,
+            sender_id: Text,
+            dialogue: Dialogue,
+            serialised_snapshot: Optional[Text] = None,
+            full_tracker: bool = True,
+    ) -> DialogueStateTracker:
+        tracker = self.init_tracker(sender_id)
+
+        if not full_tracker and isinstance(dialogue, LazyDialogue):
+            # the events of the previous sessions are neither created nor replayed
+            dialogue = Dialogue(dialogue.name, dialogue.events_of_latest_session())
+
+        snapshot = self._load_snapshot(sender_id, serialised_snapshot)
+        if not snapshot or not self._restore_from_snapshot(
+            tracker, dialogue.events, snapshot
+        ):
+            tracker.recreate_from_dialogue(dialogue)
+
+        tracker.mark_as_persisted()
+        return tracker
+
+    def _domain_fingerprint(self) -> Optional[Text]:
+        return self.domain.fingerprint() if self.domain else None
+
+    def should_snapshot(
+            self,
+            tracker: DialogueStateTracker,
+            serialised_snapshot: Optional[Text] = None,
+    ) -> bool:
+        """Checks whether a new snapshot should be persisted for the tracker.
+
+        Args:
+            tracker: The tracker which is being saved.
+            serialised_snapshot: The latest persisted snapshot of the tracker state
+                (see `serialise_snapshot`), if any.
+
+        Returns:
+            `True` if snapshots are enabled and there is either no valid snapshot for
+            the conversation or at least `snapshot_interval` events were added since
+            the latest snapshot.
+        """
+        if not self.snapshot_interval:
+            return False
+
+        snapshot = self._load_snapshot(tracker.sender_id, serialised_snapshot)
+        if not snapshot or snapshot.get("last_event") is None:
+            return True
+
+        # the tracker might have been changed by another process since the snapshot
+        # was taken, hence look for the event instead of counting events
+        events = tracker.events
+        for number_of_new_events in range(min(self.snapshot_interval, len(events))):
+            event = events[len(events) - 1 - number_of_new_events]
+            if is_persisted_event(event, snapshot["last_event"]):
+                return False
+
+        return True
+
+    def serialise_snapshot(self, tracker: DialogueStateTracker) -> Text:
+        """Serializes the current state of the tracker.
+
+        The snapshot contains everything which is needed to continue the tracker
+        after its latest event without replaying the previous events. Events are
+        referenced by their type and timestamp, which stay the same no matter which
+        part of the conversation a tracker contains.
+
+        Args:
+            tracker: The tracker to take the snapshot of.
+
+        Returns:
+            Representation of the snapshot.
+        """
+        events = tracker.events
+        latest_message = tracker.latest_message
+        snapshot = {
+            "last_event": _event_marker(events[-1]) if events else None,
+            "domain_fingerprint": self._domain_fingerprint(),
+            "slots": {
+                slot.name: slot.value
+                for slot in tracker.slots.values()
+                if slot.has_been_set
+            },
+            "latest_message": {
+                "event": _event_marker(latest_message),
+                # `EntitiesAdded` and `DefinePrevUserUtteredFeaturization` events
+                # modify the latest message after it was added to the tracker
+                "entities": latest_message.entities if latest_message else [],
+                "use_text_for_featurization": (
+                    latest_message.use_text_for_featurization
+                    if latest_message
+                    else None
+                ),
+            },
+            "latest_bot_utterance": _event_marker(tracker.latest_bot_utterance),
+            "latest_action": tracker.latest_action,
+            "active_loop": tracker.active_loop,
+            "followup_action": tracker.followup_action,
+            "paused": tracker.is_paused(),
+        }
+
+        return json.dumps(snapshot)
+
+    def _load_snapshot(
+            self, sender_id: Text, serialised_snapshot: Optional[Text]
+    ) -> Optional[Dict[Text, Any]]:
+        if not serialised_snapshot:
+            return None
+
+        snapshot = json.loads(serialised_snapshot)
+        if snapshot.get("domain_fingerprint") != self._domain_fingerprint():
+            # the slots of the domain might have changed, the snapshot is replaced
+            # with a new one during the next save
+            logger.debug(
+                f"Ignoring tracker snapshot for conversation ID '{sender_id}' as it "
+                f"was created with a different domain."
+            )
+            return None
+
+        return snapshot
+
+    @staticmethod
+    def _restore_from_snapshot(
+            tracker: DialogueStateTracker,
+            events: List[Event],
+            snapshot: Dict[Text, Any],
+    ) -> bool:
+        """Restores the tracker state from a snapshot.
+
+        Args:
+            tracker: The tracker to restore.
+            events: The events of the tracker.
+            snapshot: The snapshot.
+
+        Returns:
+            `False` if the snapshot doesn't refer to one of the events, in which case
+            the tracker is left unchanged.
+        """
+
+        def index_of(
+                marker: Optional[Dict[Text, Any]], end: int
+        ) -> Optional[int]:
+            if marker is None:
+                return None
+            for index in range(end - 1, -1, -1):
+                if is_persisted_event(events[index], marker):
+                    return index
+            return None
+
+        last_event = index_of(snapshot.get("last_event"), len(events))
+        if last_event is None:
+            logger.debug(
+                f"Ignoring tracker snapshot for conversation ID '{tracker.sender_id}' "
+                f"as it refers to events which were not retrieved."
+            )
+            return False
+
+        offset = last_event + 1
+        tracker.events.extend(events[:offset])
+
+        for slot_name, value in snapshot["slots"].items():
+            if slot_name in tracker.slots:
+                tracker.slots[slot_name].value = value
+
+        # the latest message and bot utterance are `None` if they are part of a
+        # previous session which wasn't retrieved, the session start reset them
+        latest_message = snapshot["latest_message"]
+        latest_message_index = index_of(latest_message["event"], offset)
+        if latest_message_index is not None:
+            # a copy, the event is shared with `tracker.events` and the dialogue
+            tracker.latest_message = copy.copy(events[latest_message_index])
+            tracker.latest_message.entities = list(latest_message["entities"])
+            tracker.latest_message.use_text_for_featurization = latest_message[
+                "use_text_for_featurization"
+            ]
+        else:
+            tracker.latest_message = UserUttered.empty()
+
+        latest_bot_utterance_index = index_of(snapshot["latest_bot_utterance"], offset)
+        if latest_bot_utterance_index is not None:
+            tracker.latest_bot_utterance = events[latest_bot_utterance_index]
+        else:
+            tracker.latest_bot_utterance = BotUttered.empty()
+
+        tracker.latest_action = snapshot["latest_action"]
+        tracker.active_loop = snapshot["active_loop"]
+        tracker.followup_action = snapshot["followup_action"]
+        tracker._paused = snapshot["paused"]
+
+        # apply the remaining events the same way as they were applied originally
+        for event in events[offset:]:
+            tracker.update(event)
+
+        return True
+
+
+class InMemoryTrackerStore(TrackerStore):
+    """Stores conversation history in memory."""
+
+    def __init__(
+            self,
+            domain: Domain,
+            event_broker: Optional["EventBroker"] = None,
+            append_only: bool = False,
+            binary: bool = False,
+            snapshot_interval: Optional[int] = None,
+            **kwargs: Dict[Text, Any],
+    ) -> None:
+        # serialised event slices per `sender_id`, one slice per conversation
+        # session or per save in case the tracker store persists in append-only
+        # mode. Trackers which were persisted by older versions are a single
+        # serialised tracker.
+        self.store: Dict[Text, Union[Text, bytes, List[Union[Text, bytes]]]] = {}
+        # latest serialised snapshot of the tracker state per `sender_id`
+        self.snapshots: Dict[Text, Text] = {}
+        # number of saves per `sender_id`, see `conversation_version`
+        self.versions: Dict[Text, int] = {}
+        super().__init__(
+            domain, event_broker, append_only, binary, snapshot_interval, **kwargs
+        )
+
+    def save(self, tracker: DialogueStateTracker) -> None:
+        """Updates and saves the current conversation state."""
+        if self.event_broker:
+            self.stream_events(tracker)
+
+        if self.append_only:
+            new_events = self.unpersisted_events(tracker)
+            if new_events:
+                self.store.setdefault(tracker.sender_id, []).append(
+                    self.serialise_events(new_events, self.binary)
+                )
+        else:
+            self.store[tracker.sender_id] = self.serialise_sessions(
+                tracker, self.store.get(tracker.sender_id)
+            )
+
+        if self.should_snapshot(tracker, self.snapshots.get(tracker.sender_id)):
+            self.snapshots[tracker.sender_id] = self.serialise_snapshot(tracker)
+
+        self.versions[tracker.sender_id] = self.versions.get(tracker.sender_id, 0) + 1
+        tracker.mark_as_persisted()
+
+    def retrieve(self, sender_id: Text) -> Optional[DialogueStateTracker]:
+        """Returns tracker matching sender_id.
+
+        Only the events of the latest conversation session are deserialized.
+        """
+        return self._retrieve(
+            sender_id,
+            full_tracker=bool(
+                self.retrieve_events_from_previous_conversation_sessions
+            ),
+        )
+
+    def retrieve_full_tracker(
+            self, conversation_id: Text
+    ) -> Optional[DialogueStateTracker]:
+        """Returns tracker matching sender_id including all conversation sessions."""
+        return self._retrieve(conversation_id, full_tracker=True)
+
+    def _retrieve(
+            self, sender_id: Text, full_tracker: bool
+    ) -> Optional[DialogueStateTracker]:
+        if sender_id not in self.store:
+            logger.debug(f"Creating a new tracker for id '{sender_id}'.")
+            return None
+
+        logger.debug(f"Recreating tracker for id '{sender_id}'")
+        return self.deserialise_tracker_from_events(
+            sender_id,
+            self._persisted_slices(sender_id, self.store[sender_id]),
+            self.snapshots.get(sender_id),
+            full_tracker,
+        )
+
+    def conversation_version(self, sender_id: Text) -> Optional[int]:
+        """Returns the number of times the conversation was saved."""
+        return self.versions.get(sender_id, 0)
+
+    def keys(self) -> Iterable[Text]:
+        """Returns sender_ids of the Tracker Store in memory."""
+        return self.store.keys()
 
+
+class CachedTrackerStore(TrackerStore):
+    """Keeps recently used trackers in memory in front of another tracker store.
+
+    Trackers are evicted in least-recently-used order once `max_size` trackers are
+    cached, and are retrieved from the wrapped tracker store again once they are
+    older than `ttl` seconds. Saving writes through to the wrapped tracker store.
+
+    Cached trackers are pickled when they are saved and unpickled when they are
+    retrieved, hence changes to a retrieved tracker only become visible once it is
+    saved. The pickled trackers never leave the process.
+
+    If the wrapped tracker store counts the saves of a conversation (see
+    `TrackerStore.conversation_version`), every cache hit is validated against
+    that counter, hence conversations which were saved by another process (e.g.
+    another Sanic worker) are retrieved again. Otherwise only the `ttl` limits how
+    long a stale tracker can be returned.
+    """
+
+    def __init__(
+            self,
+            tracker_store: TrackerStore,
+            max_size: int = dm_config.DEFAULT_TRACKER_CACHE_SIZE,
+            ttl: Optional[float] = dm_config.DEFAULT_TRACKER_CACHE_TTL,
+    ) -> None:
+        """Create a `CachedTrackerStore`.
+
+        Args:
+            tracker_store: The tracker store which persists the trackers.
+            max_size: Maximum number of trackers which are kept in memory.
+            ttl: Number of seconds after which a cached tracker is retrieved from
+                `tracker_store` again. `None` to keep trackers until they are evicted,
+                which is only safe if `tracker_store` counts the saves of a
+                conversation or if no other process saves the conversations.
+        """
+        self._tracker_store = tracker_store
+        self.max_size = max_size
+        self.ttl = ttl
+
+        # `sender_id` -> (pickled tracker, time the tracker was cached, version of
+        # the conversation in the wrapped tracker store)
+        self._cache: OrderedDict[Text, Tuple[bytes, float, Optional[int]]] = (
+            OrderedDict()
+        )
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # events are streamed by the wrapped tracker store
+        super().__init__(tracker_store.domain, None)
+
+    @property
+    def domain(self) -> Optional[Domain]:
+        """Returns the domain of the wrapped tracker store."""
+        return self._tracker_store.domain
+
+    @domain.setter
+    def domain(self, domain: Optional[Domain]) -> None:
+        """Sets the domain of the wrapped tracker store."""
+        self._tracker_store.domain = domain
+
+    @property
+    def tracker_store(self) -> TrackerStore:
+        """Returns the wrapped tracker store."""
+        return self._tracker_store
+
+    def invalidate(self, sender_id: Text) -> None:
+        """Removes the tracker of a conversation from the cache."""
+        self._cache.pop(sender_id, None)
+
+    def clear(self) -> None:
+        """Removes all trackers from the cache."""
+        self._cache.clear()
+
+    def cache_info(self) -> Dict[Text, Any]:
+        """Returns statistics about the cache usage for monitoring."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "size": len(self._cache),
+            "max_size": self.max_size,
+        }
+
+    def _cached(self, sender_id: Text) -> Optional[bytes]:
+        """Returns the cached tracker unless it expired or the conversation changed."""
+        cached = self._cache.get(sender_id)
+        if cached is None:
+            return None
+
+        tracker, cached_at, version = cached
+        if (self.ttl is not None and time.monotonic() - cached_at > self.ttl) or (
+            version is not None
+            and self._tracker_store.conversation_version(sender_id) != version
+        ):
+            del self._cache[sender_id]
+            return None
+
+        self._cache.move_to_end(sender_id)
         return tracker
+
+    def _cache_tracker(
+            self, tracker: DialogueStateTracker, version: Optional[int]
+    ) -> None:
+        # unpickling is several times faster than `copy.deepcopy`, see
+        # `benchmarks/bench_tracker_cache.py`
+        self._cache[tracker.sender_id] = (
+            pickle.dumps(tracker, protocol=pickle.HIGHEST_PROTOCOL),
+            time.monotonic(),
+            version,
+        )
+        self._cache.move_to_end(tracker.sender_id)
+
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+
+    def save(self, tracker: DialogueStateTracker) -> None:
+        """Saves the tracker in the wrapped tracker store and caches it."""
+        version = self._tracker_store.conversation_version(tracker.sender_id)
+        self._tracker_store.save(tracker)
+        if version is None:
+            self._cache_tracker(tracker, None)
+            return
+
+        # if another process saved the conversation in the meantime, the saved
+        # tracker isn't the latest state of the conversation
+        saved_version = self._tracker_store.conversation_version(tracker.sender_id)
+        if saved_version == version + 1:
+            self._cache_tracker(tracker, saved_version)
+        else:
+            self.invalidate(tracker.sender_id)
+
+    def retrieve(self, sender_id: Text) -> Optional[DialogueStateTracker]:
+        """Returns a copy of the cached tracker or retrieves it from the wrapped store."""
+        cached = self._cached(sender_id)
+        if cached is not None:
+            self.hits += 1
+            return pickle.loads(cached)
+
+        self.misses += 1
+        # read before retrieving, a save in between only leads to another miss
+        version = self._tracker_store.conversation_version(sender_id)
+        self._tracker_store.max_event_history = self.max_event_history
+        tracker = self._tracker_store.retrieve(sender_id)
+        if tracker is not None:
+            self._cache_tracker(tracker, version)
+
+        return tracker
+
+    def retrieve_full_tracker(
+            self, conversation_id: Text
+    ) -> Optional[DialogueStateTracker]:
+        """Retrieves the tracker including all sessions from the wrapped store."""
+        return self._tracker_store.retrieve_full_tracker(conversation_id)
+
+    def conversation_version(self, sender_id: Text) -> Optional[int]:
+        """Returns the number of saves of the conversation in the wrapped store."""
+        return self._tracker_store.conversation_version(sender_id)
+
+    def exists(self, conversation_id: Text) -> bool:
+        """Checks if tracker exists for the specified ID."""
+        return self._cached(
+            conversation_id
+        ) is not None or self._tracker_store.exists(conversation_id)
+
+    def keys(self) -> Iterable[Text]:
+        """Returns the set of values for the wrapped tracker store's primary key."""
+        return self._tracker_store.keys()
+
+
+def _event_marker(event: Optional[Event]) -> Optional[Dict[Text, Any]]:
+    # identifies a persisted event, see `is_persisted_event`
+    if event is None:
+        return None
+    return {"event": event.type_name, "timestamp": event.timestamp}
+
+
+def _index_of_persisted_event(
+        event: Event, serialised_events: List[Dict[Text, Any]]
+) -> Optional[int]:
+    for index in range(len(serialised_events) - 1, -1, -1):
+        if is_persisted_event(event, serialised_events[index]):
+            return index
+    return None
+
+
+def is_persisted_event(event: Event, serialised: Dict[Text, Any]) -> bool:
+    """Checks whether `serialised` is the persisted form of `event`.
+
+    Events are identified by their type and timestamp.
+    """
+    if event.timestamp != serialised.get("timestamp"):
+        return False
+
+    type_name = serialised.get("event")
+    # e.g. legacy `form` events are persisted as `active_loop` events
+    return type_name == event.type_name or type_name == event.as_dict()["event"]
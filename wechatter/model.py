@@ -42,4 +42,110 @@ from wechatter.exceptions import ModelNotFound
 
 logger = logging.getLogger(__name__)
 
+# Type alias for the fingerprint
+Fingerprint = Dict[Text, Union[Text, List[Text], int, float]]
 
+FINGERPRINT_FILE_PATH = "fingerprint.json"
+
+
+def get_latest_model(model_path: Text = DEFAULT_MODELS_PATH) -> Optional[Text]:
+    """Get the latest model from a path.
+
+    Args:
+        model_path: Path to a directory containing zipped models.
+
+    Returns:
+        Path to latest model in the given directory.
+    """
+    if not os.path.exists(model_path) or os.path.isfile(model_path):
+        model_path = os.path.dirname(model_path)
+
+    list_of_files = glob.glob(os.path.join(model_path, "*.tar.gz"))
+
+    if len(list_of_files) == 0:
+        return None
+
+    return max(list_of_files, key=os.path.getctime)
+
+
+def unpack_model(
+        model_file: Text, working_directory: Optional[Union[Path, Text]] = None
+) -> wechatter.utils.io.TempDirectoryPath:
+    """Unpack a zipped model into a working directory.
+
+    Args:
+        model_file: Path to zipped model.
+        working_directory: Location where the model should be unpacked to.
+                           If `None` a temporary directory will be created.
+
+    Returns:
+        Path to unpacked model.
+    """
+    import tarfile
+
+    if working_directory is None:
+        working_directory = tempfile.mkdtemp()
+
+    # All files are in a subdirectory.
+    try:
+        with tarfile.open(model_file, mode="r:gz") as tar:
+            tar.extractall(working_directory)
+            logger.debug(f"Extracted model to '{working_directory}'.")
+    except (tarfile.TarError, ValueError) as e:
+        logger.error(f"Failed to extract model at {model_file}. Error: {e}")
+        raise ModelNotFound(f"Failed to extract model at '{model_file}'.")
+
+    return wechatter.utils.io.TempDirectoryPath(working_directory)
+
+
+def get_model_subdirectories(
+        unpacked_model_path: Text,
+) -> Tuple[Optional[Text], Optional[Text]]:
+    """Return paths for Core and NLU model directories, if they exist.
+
+    If neither directories exist, a `ModelNotFound` exception is raised.
+
+    Args:
+        unpacked_model_path: Path to unpacked model.
+
+    Returns:
+        Tuple (path to Core subdirectory if it exists or `None` otherwise,
+               path to NLU subdirectory if it exists or `None` otherwise).
+    """
+    core_path = os.path.join(unpacked_model_path, DEFAULT_CORE_SUBDIRECTORY_NAME)
+    nlu_path = os.path.join(unpacked_model_path, DEFAULT_NLU_SUBDIRECTORY_NAME)
+
+    if not os.path.isdir(core_path):
+        core_path = None
+
+    if not os.path.isdir(nlu_path):
+        nlu_path = None
+
+    if not core_path and not nlu_path:
+        raise ModelNotFound(
+            "No NLU or Core data for unpacked model at: '{}'.".format(
+                unpacked_model_path
+            )
+        )
+
+    return core_path, nlu_path
+
+
+def fingerprint_from_path(model_path: Text) -> Fingerprint:
+    """Load a persisted fingerprint.
+
+    Args:
+        model_path: Path to directory containing the fingerprint.
+
+    Returns:
+        The fingerprint or an empty dict if no fingerprint was found.
+    """
+    if not model_path or not os.path.exists(model_path):
+        return {}
+
+    fingerprint_path = os.path.join(model_path, FINGERPRINT_FILE_PATH)
+
+    if os.path.isfile(fingerprint_path):
+        return wechatter.shared.utils.io.read_json_file(fingerprint_path)
+    else:
+        return {}
@@ -77,7 +77,7 @@ async def train_async(
         domain,
         training_files
     )
-    with TempDirectoryPath(tempfile.mkdtemp()) as train_path:
+    with tempfile.TemporaryDirectory() as train_path:
         domain = await file_importer.get_domain()
 
         if domain.is_empty():
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   launcher.py
+
+@Time    :   2021/4/26 10:20 上午
+
+@Desc    :   生产环境启动：主进程加载一次模型后fork出worker，worker通过写时复制共享模型内存
+
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional, Text
+
+from wechatter.dialog_config import (
+    DEFAULT_SANIC_BACKLOG,
+    DEFAULT_SANIC_WORKERS,
+    ENV_SANIC_BACKLOG,
+    ENV_SANIC_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_PORT = 9015
+
+# seconds after the start until the memory usage of the workers is reported
+MEMORY_REPORT_DELAY = 10
+# seconds between two checks whether a worker stopped
+WORKER_POLL_INTERVAL = 0.5
+# a worker which stops earlier after its start would crash again when respawned
+MIN_WORKER_LIFETIME = 5
+
+
+def number_of_workers() -> int:
+    """Returns the number of server workers configured by `SANIC_WORKERS`."""
+    return max(1, int(os.environ.get(ENV_SANIC_WORKERS, DEFAULT_SANIC_WORKERS)))
+
+
+def backlog() -> int:
+    """Returns the socket backlog configured by `SANIC_BACKLOG`."""
+    return int(os.environ.get(ENV_SANIC_BACKLOG, DEFAULT_SANIC_BACKLOG))
+
+
+def memory_usage(pid: int) -> Dict[Text, int]:
+    """Returns the memory usage of a process in kB.
+
+    `rss` counts the shared pages fully for every process, `pss` divides them between
+    the processes sharing them, `shared` are the pages shared with other processes.
+    Only available on Linux, other systems report `0`.
+    """
+    usage = {"rss": 0, "pss": 0, "shared": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key == "Rss":
+                    usage["rss"] = int(value.split()[0])
+                elif key == "Pss":
+                    usage["pss"] = int(value.split()[0])
+                elif key in ("Shared_Clean", "Shared_Dirty"):
+                    usage["shared"] += int(value.split()[0])
+    except OSError:
+        pass
+    return usage
+
+
+def report_memory_usage(worker_pids: List[int]) -> None:
+    """Logs the memory usage of the master process and the workers."""
+    for pid in [os.getpid()] + worker_pids:
+        usage = memory_usage(pid)
+        role = "master" if pid == os.getpid() else "worker"
+        logger.info(
+            f"Memory usage of {role} {pid}: rss {usage['rss']} kB, pss "
+            f"{usage['pss']} kB, shared {usage['shared']} kB."
+        )
+
+
+def _bind_socket(host: Text, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog())
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket) -> None:
+    from wechatter.server.run_server import app
+
+    # the objects loaded by the master were frozen, collecting them would write to
+    # their pages and end the sharing
+    gc.enable()
+    app.run(sock=sock, workers=1, backlog=backlog(), auto_reload=False)
+
+
+def _fork_worker(sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid != 0:
+        return pid
+
+    # the handlers of the master stop all workers
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    try:
+        _run_worker(sock)
+    except BaseException:
+        logger.exception(f"Worker {os.getpid()} crashed.")
+        os._exit(1)
+    os._exit(0)
+
+
+def _describe_exit(status: int) -> Text:
+    if os.WIFSIGNALED(status):
+        return f"was killed by signal {os.WTERMSIG(status)}"
+    return f"exited with code {os.WEXITSTATUS(status)}"
+
+
+def _supervise(sock: socket.socket, number_of_workers: int) -> int:
+    """Runs the workers until the master is stopped.
+
+    Workers which stop are replaced by a new fork of the master, which still holds
+    the preloaded model. If a worker stops right after its start, the server is
+    stopped instead of respawning workers in a loop.
+
+    Returns:
+        The exit code of the master, `1` if the server was stopped because a worker
+        failed to start.
+    """
+    workers: Dict[int, float] = {}
+    exit_code: Optional[int] = None
+
+    def stop(signum: int, _frame) -> None:
+        nonlocal exit_code
+        if exit_code is None:
+            exit_code = 0
+        for worker_pid in list(workers):
+            try:
+                os.kill(worker_pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(number_of_workers):
+        workers[_fork_worker(sock)] = time.monotonic()
+
+    report_at: Optional[float] = time.monotonic() + MEMORY_REPORT_DELAY
+    while workers:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+
+        if pid == 0:
+            if report_at is not None and time.monotonic() >= report_at:
+                report_memory_usage(list(workers))
+                report_at = None
+            time.sleep(WORKER_POLL_INTERVAL)
+            continue
+
+        started_at = workers.pop(pid, None)
+        if started_at is None or exit_code is not None:
+            continue
+
+        logger.warning(f"Worker {pid} {_describe_exit(status)}.")
+        if time.monotonic() - started_at < MIN_WORKER_LIFETIME:
+            logger.error(
+                f"Worker {pid} stopped within {MIN_WORKER_LIFETIME} seconds after "
+                f"its start. Stopping the server."
+            )
+            stop(signal.SIGTERM, None)
+            exit_code = 1
+            continue
+
+        new_pid = _fork_worker(sock)
+        workers[new_pid] = time.monotonic()
+        logger.info(f"Replaced worker {pid} by worker {new_pid}.")
+
+    return exit_code or 0
+
+
+def serve(
+        host: Text = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        model_file: Optional[Text] = None,
+) -> None:
+    """Loads the model once and forks the server workers.
+
+    Workers which stop are replaced, the server exits if a worker fails to start.
+
+    Args:
+        host: Interface to listen on.
+        port: Port to listen on.
+        model_file: Model to load. Defaults to the latest model.
+    """
+    # no collections while loading, otherwise the objects which are shared with the
+    # workers are touched before they are frozen
+    gc.disable()
+
+    from wechatter.server.run_server import model_manager
+
+    model_manager().preload(model_file)
+
+    if hasattr(gc, "freeze"):
+        # moves all objects to the permanent generation which is never collected
+        gc.freeze()
+
+    sock = _bind_socket(host, port)
+    logger.info(
+        f"Starting {number_of_workers()} workers on {host}:{port} with the model "
+        f"loaded once in the master process."
+    )
+    try:
+        exit_code = _supervise(sock, number_of_workers())
+    finally:
+        sock.close()
+
+    if exit_code:
+        sys.exit(exit_code)
+
+
+def main(args: Optional[List[Text]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Starts the wechatter server.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Interface to listen on.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port.")
+    parser.add_argument("--model", default=None, help="Model to load.")
+    parsed = parser.parse_args(args)
+
+    logging.basicConfig(format="%(levelname)s:%(message)s", level=logging.INFO)
+    serve(parsed.host, parsed.port, parsed.model)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
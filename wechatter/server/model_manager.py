@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   model_manager.py
+
+@Time    :   2021/4/25 4:02 下午
+
+@Desc    :   模型热更新：后台加载、预热新模型，然后在所有worker中原子地替换当前模型
+
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Text
+
+import wechatter.shared.utils.io
+import wechatter.utils.io
+from wechatter import model
+from wechatter.exceptions import ModelNotFound
+from wechatter.dialog_config import (
+    DEFAULT_MODEL_POLL_INTERVAL,
+    DEFAULT_WARM_UP_MESSAGES,
+    ENV_PARSE_CACHE,
+    ENV_PARSE_CACHE_PATH,
+)
+from wechatter.shared.dialogue_config import (
+    DEFAULT_DOMAIN_PATH,
+    DEFAULT_MODEL_SERVER_STATE_PATH,
+    DEFAULT_MODELS_PATH,
+)
+from wechatter.shared.dm.domain import Domain
+from wechatter.shared.nlu.interpreter import CachingInterpreter, NatureLanguageInterpreter
+from wechatter.shared.nlu.parse_cache import (
+    InMemoryParseCache,
+    ParseCache,
+    SQLiteParseCache,
+)
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_MODEL_FILE = "active_model.json"
+WORKERS_DIRECTORY = "workers"
+PARSE_CACHE_FILE = "parse_cache.db"
+
+
+class LoadedModel:
+    """A model which was unpacked and loaded into memory."""
+
+    def __init__(
+            self,
+            model_file: Text,
+            fingerprint: Text,
+            interpreter: Optional[NatureLanguageInterpreter],
+            domain: Optional[Domain],
+            unpacked_directory: Text,
+    ) -> None:
+        self.model_file = model_file
+        self.fingerprint = fingerprint
+        self.interpreter = interpreter
+        self.domain = domain
+        self.loaded_at = time.time()
+
+        # requests which are still using this model keep it alive, the unpacked
+        # files are removed once the last reference is gone
+        weakref.finalize(
+            self, _remove_unpacked_model, unpacked_directory, os.getpid()
+        )
+
+
+class ModelManager:
+    """Loads new models in the background and swaps them in without a restart.
+
+    A swap which is requested in one server worker is written to a state file in
+    `state_directory`. All the other workers poll this file and load the new model
+    as well. Every worker reports its active model in the same directory.
+    """
+
+    def __init__(
+            self,
+            state_directory: Text = DEFAULT_MODEL_SERVER_STATE_PATH,
+            poll_interval: float = DEFAULT_MODEL_POLL_INTERVAL,
+            warm_up_messages: Optional[List[Text]] = None,
+            parse_cache: Optional[ParseCache] = None,
+            interpreter_loader: Optional[
+                Callable[[Text], NatureLanguageInterpreter]
+            ] = None,
+    ) -> None:
+        """Creates the manager.
+
+        Args:
+            state_directory: Directory which is shared by all workers of the server.
+            poll_interval: Seconds between two checks for a newly requested model.
+            warm_up_messages: Messages which are parsed with a new model before it's
+                used to serve requests.
+            parse_cache: If given, parse results are cached in it.
+            interpreter_loader: Creates the NLU interpreter of the model from the
+                path to the unpacked NLU model. Models are loaded without an NLU
+                interpreter if it's not given.
+        """
+        self.state_directory = state_directory
+        self.poll_interval = poll_interval
+        self.warm_up_messages = (
+            DEFAULT_WARM_UP_MESSAGES if warm_up_messages is None else warm_up_messages
+        )
+        self.parse_cache = parse_cache
+        self.interpreter_loader = interpreter_loader
+
+        self._active: Optional[LoadedModel] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+        os.makedirs(os.path.join(state_directory, WORKERS_DIRECTORY), exist_ok=True)
+
+    @property
+    def active(self) -> Optional[LoadedModel]:
+        """The model which serves new requests.
+
+        Request handlers should keep the returned object for the whole request, so
+        that they finish on the same model if it's swapped in the meantime.
+        """
+        return self._active
+
+    @property
+    def interpreter(self) -> Optional[NatureLanguageInterpreter]:
+        return self._active.interpreter if self._active else None
+
+    async def request_swap(self, model_file: Text) -> LoadedModel:
+        """Swaps the model in this worker and notifies all other workers."""
+        if not os.path.isfile(model_file):
+            raise ModelNotFound(f"Model file '{model_file}' does not exist.")
+
+        loaded = await self.swap(model_file)
+        wechatter.utils.io.write_json_state(
+            os.path.join(self.state_directory, ACTIVE_MODEL_FILE),
+            {
+                "model_file": os.path.abspath(model_file),
+                "fingerprint": loaded.fingerprint,
+                "requested_at": time.time(),
+            },
+        )
+        return loaded
+
+    async def swap(self, model_file: Text) -> LoadedModel:
+        """Loads a model in the background and makes it the active model.
+
+        The event loop keeps serving requests with the current model while the new
+        one is loaded and warmed up.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            loop = asyncio.get_event_loop()
+            loaded = await loop.run_in_executor(
+                None, self._load_and_warm_up, model_file
+            )
+
+            # a single reference assignment, requests either see the old or the new
+            # model; the old one is released once its last request is done
+            self._active = loaded
+            self._report_worker_state()
+
+            logger.info(
+                f"Swapped active model to '{model_file}' (fingerprint "
+                f"'{loaded.fingerprint}')."
+            )
+            return loaded
+
+    def preload(self, model_file: Optional[Text] = None) -> Optional[LoadedModel]:
+        """Loads the model before the server workers are started.
+
+        Workers which are forked afterwards share the loaded model with the master
+        process instead of loading it again.
+
+        Args:
+            model_file: The model to load. Defaults to the requested or the latest
+                model.
+        """
+        model_file = model_file or self._requested_model_file() or (
+            model.get_latest_model(DEFAULT_MODELS_PATH)
+        )
+        if not model_file:
+            logger.warning("No model found, the server starts without a model.")
+            return None
+
+        self._active = self._load_and_warm_up(model_file)
+        return self._active
+
+    async def watch(self) -> None:
+        """Loads the initial model and keeps in sync with requested swaps."""
+        if self._active:
+            # the model was preloaded by the master process
+            self._report_worker_state()
+
+        requested = self._requested_model_file() or model.get_latest_model(
+            DEFAULT_MODELS_PATH
+        )
+        failed = None
+        while True:
+            active_file = self._active.model_file if self._active else None
+            if requested and os.path.abspath(requested) not in (active_file, failed):
+                try:
+                    await self.swap(requested)
+                except Exception as e:
+                    failed = os.path.abspath(requested)
+                    logger.error(f"Failed to load model '{requested}'. Error: {e}")
+
+            await asyncio.sleep(self.poll_interval)
+            requested = self._requested_model_file() or requested
+
+    def close(self) -> None:
+        """Removes the report of this worker when the worker stops."""
+        try:
+            os.remove(self._worker_state_path())
+        except OSError:
+            pass
+
+    def workers(self) -> List[Dict[Text, Any]]:
+        """Returns the active model of every running server worker."""
+        workers_directory = os.path.join(self.state_directory, WORKERS_DIRECTORY)
+        workers = []
+        for filename in sorted(os.listdir(workers_directory)):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(workers_directory, filename)
+            state = wechatter.utils.io.read_json_state(path)
+            if state is None:
+                continue
+            if not wechatter.utils.io.is_process_running(state["pid"]):
+                # the worker was stopped, its report is outdated
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            workers.append(state)
+        return workers
+
+    def _requested_model_file(self) -> Optional[Text]:
+        state = wechatter.utils.io.read_json_state(
+            os.path.join(self.state_directory, ACTIVE_MODEL_FILE)
+        )
+        return state.get("model_file") if state else None
+
+    def _load_and_warm_up(self, model_file: Text) -> LoadedModel:
+        unpacked = model.unpack_model(model_file)
+        try:
+            core_path, nlu_path = model.get_model_subdirectories(unpacked)
+
+            domain = None
+            if core_path:
+                domain_path = os.path.join(core_path, DEFAULT_DOMAIN_PATH)
+                if os.path.isfile(domain_path):
+                    domain = Domain.load(domain_path)
+
+            fingerprint = wechatter.shared.utils.io.deep_container_fingerprint(
+                model.fingerprint_from_path(unpacked) or os.path.abspath(model_file)
+            )
+
+            interpreter = None
+            if nlu_path and self.interpreter_loader:
+                interpreter = self.interpreter_loader(nlu_path)
+            elif nlu_path:
+                logger.warning(
+                    f"Model '{model_file}' contains an NLU model, but no interpreter "
+                    f"loader was configured. Messages can't be parsed with it."
+                )
+            if interpreter is not None and self.parse_cache is not None:
+                interpreter = CachingInterpreter(
+                    interpreter, fingerprint, self.parse_cache
+                )
+        except Exception:
+            shutil.rmtree(unpacked, ignore_errors=True)
+            raise
+
+        loaded = LoadedModel(
+            os.path.abspath(model_file), fingerprint, interpreter, domain, unpacked
+        )
+        if isinstance(interpreter, CachingInterpreter):
+            # warm up the model itself, without touching the cache (which might be
+            # done by the master process before the workers are forked)
+            interpreter = interpreter.interpreter
+        if interpreter is not None:
+            self._warm_up(interpreter)
+        return loaded
+
+    def _warm_up(self, interpreter: NatureLanguageInterpreter) -> None:
+        # runs in the loading thread, which has no event loop of its own
+        loop = asyncio.new_event_loop()
+        try:
+            for message in self.warm_up_messages:
+                loop.run_until_complete(interpreter.parse(message))
+        finally:
+            loop.close()
+
+    def _worker_state_path(self) -> Text:
+        return os.path.join(
+            self.state_directory, WORKERS_DIRECTORY, f"{os.getpid()}.json"
+        )
+
+    def _report_worker_state(self) -> None:
+        wechatter.utils.io.write_json_state(
+            self._worker_state_path(),
+            {
+                "pid": os.getpid(),
+                "model_file": self._active.model_file if self._active else None,
+                "fingerprint": self._active.fingerprint if self._active else None,
+                "loaded_at": self._active.loaded_at if self._active else None,
+            },
+        )
+
+
+def parse_cache_from_env(
+        state_directory: Text = DEFAULT_MODEL_SERVER_STATE_PATH,
+) -> Optional[ParseCache]:
+    """Creates the parse cache which is selected with the `PARSE_CACHE` env var.
+
+    `memory` caches parse results in every worker, `sqlite` shares them between
+    all workers on the machine through the file `PARSE_CACHE_PATH`. Parse results
+    aren't cached if the variable isn't set.
+    """
+    cache_type = os.environ.get(ENV_PARSE_CACHE, "").strip().lower()
+    if not cache_type:
+        return None
+    if cache_type == "memory":
+        return InMemoryParseCache()
+    if cache_type == "sqlite":
+        return SQLiteParseCache(
+            os.environ.get(
+                ENV_PARSE_CACHE_PATH, os.path.join(state_directory, PARSE_CACHE_FILE)
+            )
+        )
+
+    logger.warning(
+        f"Unknown parse cache '{cache_type}' in the environment variable "
+        f"'{ENV_PARSE_CACHE}', use 'memory' or 'sqlite'. Parse results aren't cached."
+    )
+    return None
+
+
+def _remove_unpacked_model(directory: Text, unpacked_by: int) -> None:
+    # workers which were forked after the model was loaded share the directory
+    # with the process which unpacked it, only that process removes it
+    if os.getpid() == unpacked_by:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -17,6 +17,7 @@ import concurrent.futures
 import logging
 import multiprocessing
 import os
+import shutil
 import tempfile
 import traceback
 from collections import defaultdict
@@ -33,6 +34,7 @@ from typing import (
     Text,
     Union,
     Dict,
+    Tuple,
     TYPE_CHECKING,
     NoReturn
 )
@@ -55,7 +57,19 @@ import wechatter.shared
 import wechatter.utils.endpoints
 import wechatter.shared.utils
 import wechatter.shared.utils.io
-from wechatter.model_training import train_async
+from wechatter.exceptions import ModelNotFound
+from wechatter.server.launcher import backlog, number_of_workers
+from wechatter.server.model_manager import ModelManager, parse_cache_from_env
+from wechatter.server.uploads import MultipartError, MultipartSpooler
+from wechatter.server.training_jobs import (
+    STATUS_FINISHED,
+    TrainingJobManager,
+    TrainingJobNotFound,
+)
+from wechatter.dialog_config import (
+    DEFAULT_MAX_CONCURRENT_TRAININGS,
+    ENV_MAX_CONCURRENT_TRAININGS,
+)
 
 from wechatter.shared.dialogue_config import (
     DOCS_URL_TRAINING_DATA,
@@ -96,6 +110,82 @@ app.update_config(CONFIG)  # 系统配置信息
 # configure_cors(app, cors_origins)  # 解决跨域问题
 
 
+_model_manager: Optional[ModelManager] = None
+
+
+def model_manager() -> ModelManager:
+    """Returns the model manager of this server worker."""
+    global _model_manager
+    if _model_manager is None:
+        _model_manager = ModelManager(parse_cache=parse_cache_from_env())
+    return _model_manager
+
+
+@app.listener("before_server_start")
+async def watch_model(app: Sanic, loop: asyncio.AbstractEventLoop) -> None:
+    """Loads the model and keeps it in sync with the other workers."""
+    app.add_task(model_manager().watch())
+
+
+@app.listener("after_server_stop")
+async def close_endpoint_sessions(app: Sanic, loop: asyncio.AbstractEventLoop) -> None:
+    """Closes the pooled HTTP sessions of all endpoints when the worker stops."""
+    await wechatter.utils.endpoints.close_sessions()
+    model_manager().close()
+
+
+@app.put("/model")
+async def replace_model(request: Request) -> HTTPResponse:
+    """
+    热更新模型：后台加载并预热新模型后替换当前模型，其他worker会随后加载同一个模型，
+    正在处理的请求继续使用旧模型
+    :param request: {"model_file": 模型文件路径}
+    :return:
+    """
+    model_file = (request.json or {}).get("model_file")
+    if not model_file:
+        raise ErrorResponse(
+            HTTPStatus.BAD_REQUEST,
+            "BadRequest",
+            "The request is missing the required key `model_file`.",
+            {"parameter": "model_file", "in": "body"},
+        )
+
+    try:
+        loaded = await model_manager().request_swap(model_file)
+    except ModelNotFound as e:
+        raise ErrorResponse(HTTPStatus.BAD_REQUEST, "BadRequest", str(e))
+    except Exception as e:
+        logging.debug(traceback.format_exc())
+        raise ErrorResponse(
+            HTTPStatus.INTERNAL_SERVER_ERROR,
+            "LoadingError",
+            f"An unexpected error occurred while loading the model. Error: {e}",
+        )
+
+    return response.json(
+        {"model_file": loaded.model_file, "fingerprint": loaded.fingerprint}
+    )
+
+
+@app.get("/model/status")
+async def model_status(request: Request) -> HTTPResponse:
+    """
+    查询每个worker当前使用的模型
+    :param request:
+    :return:
+    """
+    active = model_manager().active
+    return response.json(
+        {
+            "pid": os.getpid(),
+            "model_file": active.model_file if active else None,
+            "fingerprint": active.fingerprint if active else None,
+            "workers": model_manager().workers(),
+        }
+    )
+
+
 @app.route("/")
 async def test(request):
     return text('Welcome to wechatty dialogue engine，Current version is:' + wechatter.__version__)
@@ -113,55 +203,280 @@ async def version(request: Request):
     )
 
 
+_training_job_manager: Optional[TrainingJobManager] = None
+
+
+def training_job_manager() -> TrainingJobManager:
+    """Returns the training job manager of this server worker."""
+    global _training_job_manager
+    if _training_job_manager is None:
+        _training_job_manager = TrainingJobManager(
+            max_concurrent_jobs=int(
+                os.environ.get(
+                    ENV_MAX_CONCURRENT_TRAININGS, DEFAULT_MAX_CONCURRENT_TRAININGS
+                )
+            )
+        )
+    return _training_job_manager
+
+
 @app.post("/model/train")
 async def train(request: Request) -> HTTPResponse:
     """
-    训练模型
+    训练模型，训练在单独的进程中运行，请求在训练结束后返回模型文件
     方式一：加载数据库，写入临时文件，训练模型
     :param temporary_directory:
     :param request:
     :return:
     """
-    training_payload = _training_payload_from_json(request)
+    training_payload, temp_dir = _training_payload_from_json(request)
 
-    try:
-        # with app.active_training_processes.get_lock():
-        #     app.active_training_processes.value += 1
-        training_result = await train_async(**training_payload)
+    job = training_job_manager().submit(training_payload, temp_dir)
+    job = await training_job_manager().wait(job["id"])
 
-        if training_result.model:
-            filename = os.path.basename(training_result.model)
+    try:
+        if job["status"] == STATUS_FINISHED:
+            filename = os.path.basename(job["model"])
 
+            # the file is read into the response, the job and a model stored in
+            # its directory can be removed afterwards
             return await response.file(
-                training_result.model,
+                job["model"],
                 filename=filename,
-
             )
         else:
             raise ErrorResponse(
                 HTTPStatus.INTERNAL_SERVER_ERROR,
                 "TrainingError",
-                "Ran training, but it finished without a trained model.",
+                f"Ran training, but it finished without a trained model. "
+                f"Error: {job['error']}",
             )
-    except ErrorResponse as e:
-        raise e
+    finally:
+        training_job_manager().remove(job["id"])
+
+
+@app.post("/model/train/jobs")
+async def submit_training_job(request: Request) -> HTTPResponse:
+    """
+    提交训练任务，立即返回任务信息，通过任务id查询训练状态
+    :param request:
+    :return:
+    """
+    training_payload, temp_dir = _training_payload_from_json(request)
+    job = training_job_manager().submit(training_payload, temp_dir)
+
+    return response.json(
+        job,
+        status=HTTPStatus.ACCEPTED,
+        headers={"Location": app.url_for("get_training_job", job_id=job["id"])},
+    )
+
+
+@app.get("/model/train/jobs/<job_id>")
+async def get_training_job(request: Request, job_id: Text) -> HTTPResponse:
+    """
+    查询训练任务的状态
+    :param request:
+    :param job_id:
+    :return:
+    """
+    return response.json(_get_training_job(job_id))
+
+
+@app.get("/model/train/jobs/<job_id>/model")
+async def get_training_job_model(request: Request, job_id: Text) -> HTTPResponse:
+    """
+    下载训练任务训练出的模型
+    :param request:
+    :param job_id:
+    :return:
+    """
+    job = _get_training_job(job_id)
+    if job["status"] != STATUS_FINISHED:
+        raise ErrorResponse(
+            HTTPStatus.CONFLICT,
+            "Conflict",
+            f"Training job '{job_id}' has no trained model, its status is "
+            f"'{job['status']}'.",
+        )
+
+    return await response.file(job["model"], filename=os.path.basename(job["model"]))
 
 
-def _training_payload_from_json(request: Request) -> Dict[Text, Any]:
+@app.delete("/model/train/jobs/<job_id>")
+async def cancel_training_job(request: Request, job_id: Text) -> HTTPResponse:
     """
-    读取请求的json文件，同时写入一个临时文件夹
+    取消排队中或者运行中的训练任务
     :param request:
-    :param temp_dir:
+    :param job_id:
     :return:
     """
+    _get_training_job(job_id)
+    return response.json(training_job_manager().cancel(job_id))
+
+
+def _get_training_job(job_id: Text) -> Dict[Text, Any]:
+    try:
+        return training_job_manager().get(job_id)
+    except TrainingJobNotFound:
+        raise ErrorResponse(
+            HTTPStatus.NOT_FOUND,
+            "NotFound",
+            f"Training job '{job_id}' does not exist.",
+        )
+
+
+@app.post("/model/parse/batch")
+async def parse_batch(request: Request) -> HTTPResponse:
+    """
+    批量解析消息，一次请求解析多条消息，按请求中的顺序返回解析结果
+    :param request: {"messages": [{"text": ..., "message_id": ..., "metadata": ...}]}
+    :return: {"results": [...]}
+    """
+    # keep the model for the whole request in case it's swapped in the meantime
+    active = model_manager().active
+    interpreter = active.interpreter if active else None
+    if interpreter is None:
+        raise ErrorResponse(
+            HTTPStatus.CONFLICT,
+            "Conflict",
+            "No NLU model loaded. The server can't parse messages.",
+        )
+
+    messages = _validate_batch_parse_payload(request.json)
+
+    try:
+        results = await asyncio.gather(
+            *[
+                interpreter.parse(
+                    message.get("text", ""),
+                    message.get("message_id"),
+                    metadata=message.get("metadata"),
+                )
+                for message in messages
+            ]
+        )
+    except Exception as e:
+        logging.debug(traceback.format_exc())
+        raise ErrorResponse(
+            HTTPStatus.INTERNAL_SERVER_ERROR,
+            "ParsingError",
+            f"An unexpected error occurred. Error: {e}",
+        )
+
+    return response.json({"results": results})
+
+
+def _validate_batch_parse_payload(rjs: Any) -> List[Dict[Text, Any]]:
+    messages = rjs.get("messages") if isinstance(rjs, dict) else None
+    if not isinstance(messages, list) or not all(
+            isinstance(message, dict) for message in messages
+    ):
+        raise ErrorResponse(
+            HTTPStatus.BAD_REQUEST,
+            "BadRequest",
+            "The batched parse request needs to contain a list of messages in the "
+            "key `messages`.",
+            {"parameter": "messages", "in": "body"},
+        )
+
+    return messages
+
+
+@app.post("/model/train/upload", stream=True)
+async def upload_training_job(request: Request) -> HTTPResponse:
+    """
+    以multipart/form-data的方式流式上传训练数据并提交训练任务，
+    上传的数据直接写入任务的临时文件夹，不会整体读入内存
+    字段：config, domain, nlu, stories, responses，nlu和stories可以上传多个文件，
+    model_name 为模型名称，其余训练参数和 /model/train 一样通过query参数传入
+    :param request:
+    :return:
+    """
+    boundary = MultipartSpooler.boundary_from_content_type(
+        request.headers.get("Content-Type", "")
+    )
+    if not boundary:
+        raise ErrorResponse(
+            HTTPStatus.BAD_REQUEST,
+            "BadRequest",
+            "The training data needs to be uploaded as `multipart/form-data`.",
+            {"parameter": "Content-Type", "in": "header"},
+        )
+
+    temp_dir = tempfile.mkdtemp()
+    spooler = MultipartSpooler(boundary, temp_dir)
+    try:
+        while True:
+            chunk = await request.stream.read()
+            if chunk is None:
+                break
+            spooler.feed(chunk)
+        spooler.close()
+
+        _validate_json_training_payload(spooler.files)
+    except (MultipartError, ErrorResponse) as e:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        if isinstance(e, ErrorResponse):
+            raise e
+        raise ErrorResponse(
+            HTTPStatus.BAD_REQUEST,
+            "BadRequest",
+            f"Failed to read the uploaded training data. Error: {e}",
+        )
+
+    training_payload = dict(
+        # 没有上传domain时不使用服务器工作目录下的domain
+        domain=spooler.files.get("domain", [None])[0],
+        config=spooler.files["config"][0],
+        training_files=temp_dir,
+        output=_model_output_directory(request, {}),
+        force_training=wechatter.utils.endpoints.bool_arg(
+            request, "force_training", False
+        ),
+        dm_additional_arguments=_extract_dm_additional_arguments(request),
+        nlu_additional_arguments=_extract_nlu_additional_arguments(request),
+    )
+    if "model_name" in spooler.fields:     # 制定模型名称
+        training_payload["model_name"] = spooler.fields["model_name"]
+
+    job = training_job_manager().submit(training_payload, temp_dir)
+
+    return response.json(
+        job,
+        status=HTTPStatus.ACCEPTED,
+        headers={"Location": app.url_for("get_training_job", job_id=job["id"])},
+    )
+
+
+def _training_payload_from_json(
+        request: Request,
+) -> Tuple[Dict[Text, Any], Text]:
+    """
+    读取请求的json文件，训练数据写入这次请求单独的临时文件夹
+    :param request:
+    :return: 训练参数和临时文件夹（训练结束后删除）
+    """
     logging.debug(
-        "Extracting JSON payload with Markdown training data from request body."
+        "Extracting JSON payload with training data from request body."
     )
 
     request_payload = request.json
     _validate_json_training_payload(request_payload)
 
-    temp_dir= ''
+    training_payload = dict(
+        output=_model_output_directory(request, request_payload),
+        force_training=request_payload.get(
+            "force", wechatter.utils.endpoints.bool_arg(request, "force_training", False)
+        ),
+        dm_additional_arguments=_extract_dm_additional_arguments(request),
+        nlu_additional_arguments=_extract_nlu_additional_arguments(request),
+    )
+    if "model_name" in request_payload:     # 制定模型名称
+        training_payload["model_name"] = request_payload["model_name"]
+
+    # 每个请求使用单独的临时文件夹，并发的训练请求不会覆盖彼此的文件
+    temp_dir = tempfile.mkdtemp()
     config_path = os.path.join(temp_dir, "config.yml")
 
     wechatter.shared.utils.io.write_text_file(request_payload["config"], config_path)
@@ -185,27 +500,39 @@ def _training_payload_from_json(request: Request) -> Dict[Text, Any]:
         domain_path = os.path.join(temp_dir, "domain.yml")
         wechatter.shared.utils.io.write_text_file(request_payload["domain"], domain_path)
 
-    if "model_name" in request_payload:     # 制定模型名称
-        model_name = request_payload["model_name"]
+    training_payload.update(
+        domain=domain_path,
+        config=config_path,
+        training_files=str(temp_dir),
+    )
+    return training_payload, temp_dir
 
-    model_output_directory = str(temp_dir)
+
+def _model_output_directory(
+        request: Request, request_payload: Dict
+) -> Optional[Text]:
     if request_payload.get(
             "save_to_default_model_directory",
             wechatter.utils.endpoints.bool_arg(request, "save_to_default_model_directory", True),
     ):  # 如果参数里save_to_default_model_directory = True，则保存在默认的文件夹里
-        model_output_directory = DEFAULT_MODELS_PATH
+        return DEFAULT_MODELS_PATH
+
+    # 模型保存在训练任务的文件夹里，和任务一起删除
+    return None
+
+
+def _extract_dm_additional_arguments(request: Request) -> Dict[Text, Any]:
+    return {
+        "augmentation_factor": wechatter.utils.endpoints.int_arg(
+            request, "augmentation", 50
+        )
+    }
 
-    return dict(
-        domain=domain_path,
-        config=config_path,
-        training_files=str(temp_dir),
-        output=model_output_directory,
-        force_training=request_payload.get(
-            "force", wechatter.utils.endpoints.bool_arg(request, "force_training", False)
-        ),
-        dm_additional_arguments=_extract_dm_additional_arguments(request),
-        nlu_additional_arguments=_extract_nlu_additional_arguments(request),
-    )
+
+def _extract_nlu_additional_arguments(request: Request) -> Dict[Text, Any]:
+    return {
+        "num_threads": wechatter.utils.endpoints.int_arg(request, "num_threads", 1)
+    }
 
 
 def _validate_json_training_payload(rjs: Dict):
@@ -279,5 +606,20 @@ class ErrorResponse(Exception):
         super(ErrorResponse, self).__init__()
 
 
+@app.exception(ErrorResponse)
+async def handle_error_response(
+    request: Request, exception: ErrorResponse
+) -> HTTPResponse:
+    """Returns the error information with the status code of the error."""
+    return response.json(exception.error_info, status=exception.status)
+
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=9015, auto_reload=True, workers=4)
+    # 开发环境使用，生产环境请使用 wechatter.server.launcher
+    app.run(
+        host='0.0.0.0',
+        port=9015,
+        auto_reload=True,
+        workers=number_of_workers(),
+        backlog=backlog(),
+    )
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   training_jobs.py
+
+@Time    :   2021/4/22 3:18 下午
+
+@Desc    :   模型训练任务的排队、执行、查询和取消
+
+"""
+
+import asyncio
+import contextlib
+import fcntl
+import logging
+import multiprocessing
+import os
+import shutil
+import time
+import uuid
+from typing import IO, Any, Dict, Iterator, Optional, Text
+
+import wechatter.utils.io
+from wechatter.dialog_config import (
+    DEFAULT_MAX_CONCURRENT_TRAININGS,
+    DEFAULT_TRAINING_JOB_POLL_INTERVAL,
+    DEFAULT_TRAINING_JOB_RETENTION,
+)
+from wechatter.shared.dialogue_config import DEFAULT_TRAINING_JOBS_PATH
+
+logger = logging.getLogger(__name__)
+
+JOB_STATE_FILE = "job.json"
+JOB_RESULT_FILE = "result.json"
+JOB_LOCK_FILE = "job.lock"
+JOB_MODEL_DIRECTORY = "models"
+SLOTS_DIRECTORY = "slots"
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_FINISHED = "finished"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+FINAL_STATUSES = {STATUS_FINISHED, STATUS_FAILED, STATUS_CANCELLED}
+
+
+class TrainingJobNotFound(Exception):
+    """Raised if there is no training job with the given id."""
+
+
+class TrainingJobManager:
+    """Runs training jobs in separate processes.
+
+    Every job runs in its own training process, so training never blocks the event
+    loop which serves the chat traffic and a running job can be cancelled without
+    affecting the other jobs. The state of the jobs is kept in `jobs_directory`,
+    which allows every server worker to report the status of and to cancel jobs
+    which were submitted to another worker.
+
+    All managers which share `jobs_directory` run at most `max_concurrent_jobs`
+    jobs at the same time: a job has to lock one of the slot files in the jobs
+    directory before it starts. The locks are released by the operating system if
+    a worker dies.
+    """
+
+    def __init__(
+            self,
+            jobs_directory: Text = DEFAULT_TRAINING_JOBS_PATH,
+            max_concurrent_jobs: int = DEFAULT_MAX_CONCURRENT_TRAININGS,
+            poll_interval: float = DEFAULT_TRAINING_JOB_POLL_INTERVAL,
+            retention: Optional[float] = DEFAULT_TRAINING_JOB_RETENTION,
+    ) -> None:
+        """Creates the manager.
+
+        Args:
+            jobs_directory: Directory in which the state of the jobs is stored.
+            max_concurrent_jobs: Maximum number of jobs which run at the same time in
+                all managers sharing `jobs_directory`. Further jobs are queued.
+            poll_interval: Seconds between two checks for a free slot and for the
+                cancellation of a running job.
+            retention: Seconds after which the state of finished, failed and
+                cancelled jobs is removed. `None` to keep it forever.
+        """
+        self.jobs_directory = jobs_directory
+        self.max_concurrent_jobs = max(1, max_concurrent_jobs)
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._tasks: Dict[Text, asyncio.Future] = {}
+
+        os.makedirs(os.path.join(jobs_directory, SLOTS_DIRECTORY), exist_ok=True)
+
+    def submit(
+            self,
+            training_payload: Dict[Text, Any],
+            training_data_directory: Optional[Text] = None,
+    ) -> Dict[Text, Any]:
+        """Queues a training job.
+
+        Args:
+            training_payload: Keyword arguments for `train_async`. Without an
+                `output` the model is stored in the directory of the job and is
+                removed together with the job.
+            training_data_directory: Temporary directory with the training data of
+                the job. It's removed once the job is done.
+
+        Returns:
+            The state of the queued job.
+        """
+        self.remove_expired_jobs()
+
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._job_directory(job_id))
+        if training_payload.get("output") is None:
+            training_payload = dict(
+                training_payload,
+                output=os.path.join(self._job_directory(job_id), JOB_MODEL_DIRECTORY),
+            )
+
+        state = {
+            "id": job_id,
+            "status": STATUS_QUEUED,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "model": None,
+            "error": None,
+            # the worker which runs the job, the job failed if it was stopped
+            "worker_pid": os.getpid(),
+        }
+        self._write_state(job_id, state)
+
+        self._tasks[job_id] = asyncio.ensure_future(
+            self._run(job_id, training_payload, training_data_directory)
+        )
+        self._tasks[job_id].add_done_callback(
+            lambda _: self._tasks.pop(job_id, None)
+        )
+
+        return self.get(job_id)
+
+    async def wait(self, job_id: Text) -> Dict[Text, Any]:
+        """Waits until a job which was submitted to this manager is done."""
+        task = self._tasks.get(job_id)
+        if task is not None:
+            await asyncio.shield(task)
+
+        return self.get(job_id)
+
+    def get(self, job_id: Text) -> Dict[Text, Any]:
+        """Returns the state of a job.
+
+        Queued and running jobs of server workers which were stopped are marked as
+        failed.
+
+        Raises:
+            TrainingJobNotFound: If there is no job with this id.
+        """
+        state = self._read_state(job_id)
+        if _is_orphaned(state):
+            with self._locked_state(job_id) as state:
+                if _is_orphaned(state):
+                    state["status"] = STATUS_FAILED
+                    state["error"] = (
+                        f"The server worker {state['worker_pid']} which ran the job "
+                        f"was stopped."
+                    )
+                    state["finished_at"] = time.time()
+                    logger.error(f"Training job '{job_id}' failed. {state['error']}")
+        return state
+
+    def cancel(self, job_id: Text) -> Dict[Text, Any]:
+        """Cancels a queued or running job.
+
+        Jobs which are already done are not changed. A running training process is
+        stopped by the worker which started it.
+
+        Raises:
+            TrainingJobNotFound: If there is no job with this id.
+        """
+        with self._locked_state(job_id) as state:
+            if state["status"] not in FINAL_STATUSES:
+                state["status"] = STATUS_CANCELLED
+                state["finished_at"] = time.time()
+
+        return self.get(job_id)
+
+    def remove(self, job_id: Text) -> None:
+        """Removes the state of a job which is done and the model stored with it."""
+        self._read_state(job_id)
+        shutil.rmtree(self._job_directory(job_id), ignore_errors=True)
+
+    def remove_expired_jobs(self) -> None:
+        """Removes the jobs which are done for more than `retention` seconds."""
+        if self.retention is None:
+            return
+
+        expired_before = time.time() - self.retention
+        for job_id in os.listdir(self.jobs_directory):
+            if job_id == SLOTS_DIRECTORY or job_id in self._tasks:
+                continue
+            try:
+                state = self.get(job_id)
+            except TrainingJobNotFound:
+                continue
+            if (
+                    state["status"] in FINAL_STATUSES
+                    and (state["finished_at"] or 0) < expired_before
+            ):
+                self.remove(job_id)
+
+    async def _run(
+            self,
+            job_id: Text,
+            training_payload: Dict[Text, Any],
+            training_data_directory: Optional[Text],
+    ) -> None:
+        try:
+            slot = await self._acquire_slot(job_id)
+            if slot is None:
+                return
+            try:
+                await self._run_training(job_id, training_payload)
+            finally:
+                slot.close()
+        finally:
+            if training_data_directory:
+                shutil.rmtree(training_data_directory, ignore_errors=True)
+
+    async def _acquire_slot(self, job_id: Text) -> Optional[IO]:
+        """Waits until one of the slot files is locked for the job.
+
+        Returns:
+            The locked slot file, closing it releases the slot. `None` if the job
+            was cancelled while it was queued.
+        """
+        while self._read_state(job_id)["status"] != STATUS_CANCELLED:
+            for slot in range(self.max_concurrent_jobs):
+                f = open(
+                    os.path.join(self.jobs_directory, SLOTS_DIRECTORY, f"{slot}.lock"),
+                    "a",
+                )
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    f.close()
+                    continue
+                return f
+
+            await asyncio.sleep(self.poll_interval)
+
+        return None
+
+    async def _run_training(
+            self, job_id: Text, training_payload: Dict[Text, Any]
+    ) -> None:
+        with self._locked_state(job_id) as state:
+            if state["status"] == STATUS_CANCELLED:
+                return
+            state["status"] = STATUS_RUNNING
+            state["started_at"] = time.time()
+
+        job_directory = self._job_directory(job_id)
+        # don't fork the server worker, its event loop and connections must
+        # not be shared with the training process
+        process = multiprocessing.get_context("spawn").Process(
+            target=_train_in_process, args=(job_directory, training_payload)
+        )
+        process.start()
+        try:
+            while process.is_alive():
+                await asyncio.sleep(self.poll_interval)
+                if self._read_state(job_id)["status"] == STATUS_CANCELLED:
+                    # the process is a child of this worker which wasn't joined
+                    # yet, hence its pid can't have been reused
+                    process.terminate()
+                    break
+        finally:
+            await asyncio.get_event_loop().run_in_executor(None, process.join)
+
+        result = wechatter.utils.io.read_json_state(
+            os.path.join(job_directory, JOB_RESULT_FILE)
+        ) or {}
+        with self._locked_state(job_id) as state:
+            if state["status"] == STATUS_CANCELLED:
+                return
+
+            if result.get("model"):
+                state["status"] = STATUS_FINISHED
+                state["model"] = result["model"]
+            else:
+                state["status"] = STATUS_FAILED
+                state["error"] = result.get("error") or (
+                    f"Training finished without a trained model (exit code "
+                    f"{process.exitcode})."
+                )
+                logger.error(f"Training job '{job_id}' failed. {state['error']}")
+            state["finished_at"] = time.time()
+
+    def _job_directory(self, job_id: Text) -> Text:
+        return os.path.join(self.jobs_directory, job_id)
+
+    def _read_state(self, job_id: Text) -> Dict[Text, Any]:
+        # job ids are generated by `uuid4().hex`, anything else can't be a job and
+        # must not be used as a path
+        if not job_id.isalnum():
+            raise TrainingJobNotFound(job_id)
+
+        state = wechatter.utils.io.read_json_state(
+            os.path.join(self._job_directory(job_id), JOB_STATE_FILE)
+        )
+        if state is None:
+            raise TrainingJobNotFound(job_id)
+        return state
+
+    def _write_state(self, job_id: Text, state: Dict[Text, Any]) -> None:
+        wechatter.utils.io.write_json_state(
+            os.path.join(self._job_directory(job_id), JOB_STATE_FILE), state
+        )
+
+    @contextlib.contextmanager
+    def _locked_state(self, job_id: Text) -> Iterator[Dict[Text, Any]]:
+        """Reads, changes and writes the state of a job as one atomic operation.
+
+        All workers which share the jobs directory use the same lock file.
+        """
+        self._read_state(job_id)
+        with open(os.path.join(self._job_directory(job_id), JOB_LOCK_FILE), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                state = self._read_state(job_id)
+                yield state
+                self._write_state(job_id, state)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _is_orphaned(state: Dict[Text, Any]) -> bool:
+    return (
+            state["status"] not in FINAL_STATUSES
+            and state.get("worker_pid") is not None
+            and not wechatter.utils.io.is_process_running(state["worker_pid"])
+    )
+
+
+def _train_in_process(job_directory: Text, training_payload: Dict[Text, Any]) -> None:
+    """Trains a model. Runs in the training process."""
+    loop = asyncio.new_event_loop()
+    try:
+        from wechatter.model_training import train_async
+
+        trained = loop.run_until_complete(train_async(**training_payload))
+        result = {"model": trained.model}
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    finally:
+        loop.close()
+
+    wechatter.utils.io.write_json_state(
+        os.path.join(job_directory, JOB_RESULT_FILE), result
+    )
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   uploads.py
+
+@Time    :   2021/4/23 2:36 下午
+
+@Desc    :   流式解析multipart请求，把上传的训练数据直接写入文件
+
+"""
+
+import logging
+import os
+from email.message import Message
+from typing import BinaryIO, Dict, List, Optional, Text
+
+logger = logging.getLogger(__name__)
+
+# form fields which can be uploaded and the file names they are stored as
+TRAINING_UPLOAD_FIELDS = ("config", "domain", "nlu", "stories", "responses")
+TRAINING_UPLOAD_EXTENSIONS = (".yml", ".yaml", ".md", ".json")
+# form fields which are kept in memory as text
+TRAINING_FORM_FIELDS = ("model_name",)
+
+MAX_HEADER_SIZE = 16 * 1024
+MAX_FIELD_SIZE = 1024
+
+
+class MultipartError(ValueError):
+    """Raised if a multipart body is malformed."""
+
+
+class MultipartSpooler:
+    """Writes the parts of a `multipart/form-data` body to files chunk by chunk.
+
+    The body is never held in memory completely, so arbitrarily large training data
+    can be uploaded.
+    """
+
+    def __init__(self, boundary: Text, directory: Text) -> None:
+        """Creates the spooler.
+
+        Args:
+            boundary: The multipart boundary from the `Content-Type` header.
+            directory: Directory to which the uploaded files are written.
+        """
+        self.directory = directory
+        self.files: Dict[Text, List[Text]] = {}
+        self.fields: Dict[Text, Text] = {}
+
+        self._delimiter = b"--" + boundary.encode("latin-1")
+        self._body_delimiter = b"\r\n" + self._delimiter
+        self._buffer = bytearray()
+        self._state = "preamble"
+        self._file: Optional[BinaryIO] = None
+        self._field: Optional[Text] = None
+        self._field_value = bytearray()
+
+    @staticmethod
+    def boundary_from_content_type(content_type: Text) -> Optional[Text]:
+        """Returns the multipart boundary of a `Content-Type` header."""
+        header = _parse_header("Content-Type", content_type)
+        if header.get_content_type() != "multipart/form-data":
+            return None
+
+        return header.get_param("boundary") or None
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def feed(self, chunk: bytes) -> None:
+        """Processes the next chunk of the body."""
+        if self.done:
+            return
+
+        self._buffer += chunk
+        progressed = True
+        while progressed and not self.done:
+            if self._state == "preamble":
+                progressed = self._read_preamble()
+            elif self._state == "headers":
+                progressed = self._read_headers()
+            elif self._state == "body":
+                progressed = self._read_body()
+            elif self._state == "delimiter_end":
+                progressed = self._read_delimiter_end()
+
+    def close(self) -> None:
+        """Finishes processing the body.
+
+        Raises:
+            MultipartError: If the body ended in the middle of a part.
+        """
+        self._close_part()
+
+        if not self.done:
+            raise MultipartError("Multipart body ended unexpectedly.")
+
+    def _read_preamble(self) -> bool:
+        index = self._buffer.find(self._delimiter)
+        if index < 0:
+            # keep the end in case the delimiter is split across chunks
+            del self._buffer[: max(0, len(self._buffer) - len(self._delimiter))]
+            return False
+
+        del self._buffer[: index + len(self._delimiter)]
+        self._state = "delimiter_end"
+        return True
+
+    def _read_delimiter_end(self) -> bool:
+        if len(self._buffer) < 2:
+            return False
+
+        ending = bytes(self._buffer[:2])
+        del self._buffer[:2]
+        if ending == b"--":
+            self._state = "done"
+        elif ending == b"\r\n":
+            self._state = "headers"
+        else:
+            raise MultipartError("Malformed multipart delimiter.")
+        return True
+
+    def _read_headers(self) -> bool:
+        index = self._buffer.find(b"\r\n\r\n")
+        if index < 0:
+            if len(self._buffer) > MAX_HEADER_SIZE:
+                raise MultipartError("Multipart part headers are too large.")
+            return False
+
+        headers = bytes(self._buffer[:index]).decode("utf-8", "replace")
+        del self._buffer[: index + 4]
+        self._open_part(headers)
+        self._state = "body"
+        return True
+
+    def _read_body(self) -> bool:
+        index = self._buffer.find(self._body_delimiter)
+        if index < 0:
+            # everything except a possibly split delimiter can be written already
+            safe_length = len(self._buffer) - len(self._body_delimiter) + 1
+            if safe_length > 0:
+                self._write(self._buffer[:safe_length])
+                del self._buffer[:safe_length]
+            return False
+
+        self._write(self._buffer[:index])
+        del self._buffer[: index + len(self._body_delimiter)]
+        self._close_part()
+        self._state = "delimiter_end"
+        return True
+
+    def _write(self, data: bytearray) -> None:
+        if not data:
+            return
+
+        if self._file is not None:
+            self._file.write(data)
+        elif self._field is not None:
+            self._field_value += data
+            if len(self._field_value) > MAX_FIELD_SIZE:
+                raise MultipartError(f"Multipart field '{self._field}' is too large.")
+
+    def _close_part(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        if self._field is not None:
+            self.fields[self._field] = self._field_value.decode("utf-8", "replace")
+            self._field = None
+            self._field_value = bytearray()
+
+    def _open_part(self, headers: Text) -> None:
+        name, filename = None, None
+        for line in headers.split("\r\n"):
+            key, _, value = line.partition(":")
+            if key.strip().lower() != "content-disposition":
+                continue
+            # parameter values may be quoted strings which contain `;`
+            header = _parse_header("Content-Disposition", value)
+            name = header.get_param("name", header="Content-Disposition")
+            filename = header.get_filename()
+
+        if name in TRAINING_FORM_FIELDS:
+            self._field = name
+            return
+
+        if name not in TRAINING_UPLOAD_FIELDS:
+            logger.debug(f"Ignoring unknown field '{name}' of the training upload.")
+            self._file = None
+            return
+
+        extension = os.path.splitext(filename or "")[1].lower()
+        if extension not in TRAINING_UPLOAD_EXTENSIONS:
+            extension = ".yml"
+
+        # uploaded file names are never used as paths
+        paths = self.files.setdefault(name, [])
+        path = os.path.join(self.directory, f"{name}_{len(paths)}{extension}")
+        paths.append(path)
+        self._file = open(path, "wb")
+
+
+def _parse_header(key: Text, value: Text) -> Message:
+    header = Message()
+    header[key] = value.strip()
+    return header
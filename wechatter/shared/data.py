@@ -12,3 +12,20 @@
 @Desc    :   数据处理
  
 """
+
+from pathlib import Path
+from typing import Text, Union
+
+YAML_FILE_EXTENSIONS = {".yml", ".yaml"}
+
+
+def is_likely_yaml_file(file_path: Union[Text, Path]) -> bool:
+    """Checks if a file is likely a YAML file.
+
+    Args:
+        file_path: Path of the file to check.
+
+    Returns:
+        `True` if the file has a YAML extension, otherwise `False`.
+    """
+    return Path(file_path).suffix in YAML_FILE_EXTENSIONS
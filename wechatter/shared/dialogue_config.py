@@ -57,6 +57,9 @@ LATEST_TRAINING_DATA_FORMAT_VERSION = "2.0"
 
 DOMAIN_SCHEMA_FILE = "shared/utils/schemas/domain.yml"
 
+# directory in which compiled domains are cached, the cache is disabled if unset
+ENV_DOMAIN_CACHE_PATH = "DOMAIN_CACHE_PATH"
+
 DEFAULT_SESSION_EXPIRATION_TIME_IN_MINUTES = 60
 DEFAULT_CARRY_OVER_SLOTS_TO_NEW_SESSION = True
 
@@ -90,6 +93,8 @@ DEFAULT_CONFIG_PATH = "config.yml"
 DEFAULT_DOMAIN_PATH = "domain.yml"
 DEFAULT_ACTIONS_PATH = "actions"
 DEFAULT_MODELS_PATH = "models"     # 默认的模型存储路径
+DEFAULT_TRAINING_JOBS_PATH = "training_jobs"     # 训练任务的状态存储路径
+DEFAULT_MODEL_SERVER_STATE_PATH = "model_server"     # 各worker当前模型的状态存储路径
 DEFAULT_CONVERTED_DATA_PATH = "converted_data"
 DEFAULT_DATA_PATH = "data"
 DEFAULT_RESULTS_PATH = "results"
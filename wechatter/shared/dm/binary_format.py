@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   binary_format.py
+
+@Time    :   2021/4/20 2:41 下午
+
+@Desc    :   对话的二进制序列化格式
+
+"""
+
+from typing import Any, Dict, List, Optional, Text, Tuple
+
+import msgpack
+
+from wechatter.shared.dm.conversation import Dialogue, LazyDialogue
+from wechatter.shared.dm.events import Event
+
+# Every binary payload starts with `MAGIC` followed by the format version. The
+# leading null byte never starts a JSON document, which allows to tell binary and
+# JSON payloads apart. The rest of the payload is the dialogue name and the
+# serialised events (see `Event.as_dict`) packed with `msgpack`.
+MAGIC = b"\x00WTB"
+FORMAT_VERSION = 2
+
+_HEADER_SIZE = len(MAGIC) + 1
+
+
+class BinaryFormatError(ValueError):
+    """Raised if a binary payload can't be decoded."""
+
+
+def is_binary_payload(payload: Any) -> bool:
+    """Checks whether a serialised tracker or event slice uses the binary format."""
+    return isinstance(payload, (bytes, bytearray, memoryview)) and bytes(
+        payload[: len(MAGIC)]
+    ) == MAGIC
+
+
+def encode_dialogue(dialogue: Dialogue) -> bytes:
+    """Encodes a dialogue in the binary format.
+
+    Args:
+        dialogue: The dialogue to encode.
+
+    Returns:
+        The binary representation of the dialogue.
+    """
+    return encode_serialised_dialogue(
+        dialogue.name, [event.as_dict() for event in dialogue.events]
+    )
+
+
+def encode_serialised_dialogue(
+    name: Optional[Text], serialised_events: List[Dict[Text, Any]]
+) -> bytes:
+    """Encodes a dialogue whose events are already serialised with `Event.as_dict`."""
+    try:
+        packed = msgpack.packb({"name": name, "events": serialised_events})
+    except TypeError as e:
+        raise TypeError(f"Events can't be serialised in the binary tracker format. {e}")
+
+    return MAGIC + bytes([FORMAT_VERSION]) + packed
+
+
+def decode_dialogue(payload: bytes, lazy: bool = False) -> Dialogue:
+    """Decodes a dialogue which was encoded with `encode_dialogue`.
+
+    Args:
+        payload: The binary representation of the dialogue.
+        lazy: If `True` a `LazyDialogue` is returned, which creates the events only
+            when they are used.
+    """
+    name, events = _decode(payload)
+    if lazy:
+        return LazyDialogue.from_parameters({"name": name, "events": events})
+
+    return Dialogue.from_parameters({"name": name, "events": events})
+
+
+def encode_events(events: List[Event]) -> bytes:
+    """Encodes events in the binary format (e.g. for append-only persistence)."""
+    return encode_serialised_events([event.as_dict() for event in events])
+
+
+def encode_serialised_events(serialised_events: List[Dict[Text, Any]]) -> bytes:
+    """Encodes events which are already serialised with `Event.as_dict`."""
+    return encode_serialised_dialogue(None, serialised_events)
+
+
+def decode_events(payload: bytes) -> List[Dict[Text, Any]]:
+    """Decodes events which were encoded with `encode_events`.
+
+    Returns:
+        The serialised events in the same format as `Event.as_dict`.
+    """
+    _, events = _decode(payload)
+    return events
+
+
+def _decode(payload: bytes) -> Tuple[Optional[Text], List[Dict[Text, Any]]]:
+    if not is_binary_payload(payload):
+        raise BinaryFormatError("Payload is not in the binary tracker format.")
+
+    version = payload[len(MAGIC)]
+    if version != FORMAT_VERSION:
+        raise BinaryFormatError(
+            f"Unsupported binary tracker format version '{version}'. Supported "
+            f"version is '{FORMAT_VERSION}'."
+        )
+
+    try:
+        dialogue = msgpack.unpackb(
+            memoryview(payload)[_HEADER_SIZE:], strict_map_key=False
+        )
+    except ValueError as e:
+        raise BinaryFormatError(f"Binary tracker payload is corrupt: {e}")
+
+    if not isinstance(dialogue, dict) or not isinstance(dialogue.get("events"), list):
+        raise BinaryFormatError("Binary tracker payload doesn't contain events.")
+
+    return dialogue.get("name"), dialogue["events"]
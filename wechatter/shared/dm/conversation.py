@@ -13,8 +13,9 @@
  
 """
 
-from typing import Dict, List, Text, Any
-from wechatter.shared.dm.events import Event
+from typing import Dict, Iterator, List, Optional, Text, Any
+from wechatter.shared.dm.dm_config import ACTION_SESSION_START_NAME
+from wechatter.shared.dm.events import ActionExecuted, Event, SessionStarted
 
 
 class Dialogue:
@@ -64,3 +65,125 @@ class Dialogue:
             [Event.from_parameters(evt) for evt in parameters.get("events")],
         )
 
+
+class LazyDialogue(Dialogue):
+    """A dialogue which only creates its events when they are used.
+
+    The events are kept in their serialised form (see `Event.as_dict`) as they were
+    read from the persisted tracker. Events are created on first access, starting
+    from the end of the dialogue, so that e.g. the latest conversation session can
+    be restored without creating the events of the previous sessions.
+    """
+
+    def __init__(
+        self, name: Optional[Text], serialised_events: List[Dict[Text, Any]]
+    ) -> None:
+        """Creates the dialogue.
+
+        Args:
+            name: Name of the dialogue.
+            serialised_events: The serialised events of the dialogue.
+        """
+        self.name = name
+        self.serialised_events = serialised_events
+        self._events: List[Optional[Event]] = [None] * len(serialised_events)
+
+    @classmethod
+    def from_parameters(cls, parameters: Dict[Text, Any]) -> "LazyDialogue":
+        """Create `LazyDialogue` from parameters without creating any events.
+
+        Args:
+            parameters: Serialised dialogue, should contain keys 'name' and 'events'.
+
+        Returns:
+            Deserialised `LazyDialogue`.
+        """
+        return cls(parameters.get("name"), parameters.get("events") or [])
+
+    @property
+    def events(self) -> List[Event]:
+        """Returns all events of the dialogue."""
+        return self.events_since(0)
+
+    @property
+    def number_of_events(self) -> int:
+        """Returns the number of events without creating them."""
+        return len(self.serialised_events)
+
+    def event_at(self, index: int) -> Optional[Event]:
+        """Returns the event at `index`, creates it if it wasn't used before.
+
+        Returns:
+            The event or `None` if the serialised event is of an unknown type.
+        """
+        event = self._events[index]
+        if event is None:
+            event = self._events[index] = Event.from_parameters(
+                self.serialised_events[index]
+            )
+        return event
+
+    def reversed_events(self) -> Iterator[Event]:
+        """Iterates over the events from the latest to the first one."""
+        for index in range(self.number_of_events - 1, -1, -1):
+            event = self.event_at(index)
+            if event is not None:
+                yield event
+
+    def events_since(self, index: int) -> List[Event]:
+        """Returns the events from position `index` of `serialised_events` on.
+
+        Serialised events of unknown types are skipped, hence positions in the
+        returned list don't correspond to positions in `serialised_events`.
+        """
+        events = (self.event_at(i) for i in range(index, self.number_of_events))
+        return [event for event in events if event is not None]
+
+    def latest_session_start(self) -> int:
+        """Returns the position at which the latest conversation session starts.
+
+        Only the serialised events are inspected, no events are created.
+
+        Returns:
+            The position or `0` if the dialogue has a single session.
+        """
+        starts = session_starts(self.serialised_events)
+        return starts[-1] if starts else 0
+
+    def events_of_latest_session(self) -> List[Event]:
+        """Returns the events of the latest conversation session.
+
+        The session starts with the `action_session_start` action which precedes
+        the latest `SessionStarted` event. The events of the previous sessions are
+        not created.
+        """
+        return self.events_since(self.latest_session_start())
+
+
+def session_starts(serialised_events: List[Dict[Text, Any]]) -> List[int]:
+    """Returns the positions at which conversation sessions start.
+
+    A session starts with the `action_session_start` action which precedes its
+    `SessionStarted` event, or with the `SessionStarted` event if it isn't preceded
+    by the action.
+
+    Args:
+        serialised_events: Serialised events (see `Event.as_dict`).
+
+    Returns:
+        The positions of the session starts in ascending order.
+    """
+    starts = []
+    for index, serialised in enumerate(serialised_events):
+        if serialised.get("event") != SessionStarted.type_name:
+            continue
+
+        previous = serialised_events[index - 1] if index else {}
+        if (
+            previous.get("event") == ActionExecuted.type_name
+            and previous.get("name") == ACTION_SESSION_START_NAME
+        ):
+            index -= 1
+        starts.append(index)
+
+    return starts
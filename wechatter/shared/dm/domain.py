@@ -33,6 +33,7 @@ from typing import (
     Union,
     TYPE_CHECKING,
     Iterable,
+    Iterator,
 )
 
 import wechatter
@@ -43,10 +44,36 @@ import wechatter.shared.utils.validation
 import wechatter.shared.utils.common
 import wechatter.shared.dm
 import wechatter.shared.dm.dm_config
-from wechatter.shared.dm.events import UserUttered, SlotSet
-from wechatter.shared.dm.slots import Slot, AnySlot, TextSlot, CategoricalSlot
+import wechatter.shared.dm.trackers
+import wechatter.shared.nlu.nlu_config
+from wechatter.shared.dm import domain_cache
+from wechatter.shared.dm.events import (
+    UserUttered,
+    SlotSet,
+    ActionExecuted,
+    ActiveLoop,
+    AllSlotsReset,
+    DefinePrevUserUtteredFeaturization,
+    EntitiesAdded,
+    Event,
+    BotUttered,
+    FollowupAction,
+    LoopInterrupted,
+    ActionExecutionRejected,
+    ReminderScheduled,
+    ReminderCancelled,
+    ConversationPaused,
+    ConversationResumed,
+    AgentUttered,
+    StoryExported,
+)
+from wechatter.shared.dm.slots import Slot, AnySlot, TextSlot, CategoricalSlot, SlotTable
 
 from wechatter.shared.exceptions import WechatterException, YamlException, YamlSyntaxException
+from wechatter.shared.utils.validation import KEY_TRAINING_DATA_FORMAT_VERSION
+
+if TYPE_CHECKING:
+    from wechatter.shared.dm.trackers import DialogueStateTracker
 
 
 
@@ -81,6 +108,10 @@ ALL_DOMAIN_KEYS = [
 
 PREV_PREFIX = "prev_"
 
+# attributes which cache values derived from the domain, setting them doesn't
+# change the domain
+_CACHE_ATTRIBUTE_PREFIXES = ("_fingerprint", "_lazy_")
+
 logger = logging.getLogger(__name__)
 
 
@@ -128,7 +159,20 @@ class Domain:
         return cls([], [], [], {}, [], {})
 
     @classmethod
-    def load(cls, paths: Union[List[Union[Path, Text]], Text, Path]) -> "Domain":
+    def load(
+            cls,
+            paths: Union[List[Union[Path, Text]], Text, Path],
+            cache_directory: Optional[Text] = None,
+    ) -> "Domain":
+        """Loads and merges the domains of the given files and directories.
+
+        Args:
+            paths: The domain files or directories.
+            cache_directory: If set, the merged domain is cached in this directory
+                and the domain files are only parsed again if they changed. The
+                directory can also be set with `DOMAIN_CACHE_PATH`, otherwise
+                nothing is cached.
+        """
         if not paths:
             raise InvalidDomain(
                 "No domain file was specified. Please specify a path "
@@ -136,12 +180,22 @@ class Domain:
             )
         elif not isinstance(paths, list) and not isinstance(paths, set):
             paths = [paths]
+        paths = list(paths)
 
-        domain = Domain.empty()
+        cache_file = domain_cache.cache_file(paths, cache_directory)
+        if cache_file:
+            key = domain_cache.cache_key(cls, domain_cache.domain_files(paths))
+            domain_dict = domain_cache.load_compiled_domain(cache_file, key)
+            if domain_dict is not None:
+                return cls.from_dict(domain_dict)
+
+        builder = DomainBuilder()
         for path in paths:
-            other = cls.from_path(path)
-            domain = domain.merge(other)
+            builder.add(cls.from_path(path))
+        domain = builder.build()
 
+        if cache_file:
+            domain_cache.persist_compiled_domain(domain, cache_file, key)
         return domain
 
     @classmethod
@@ -171,17 +225,24 @@ class Domain:
                 yaml, wechatter.shared.dialogue_config.DOMAIN_SCHEMA_FILE
             )
 
-            data = wechatter.shared.utils.io.read_yaml(yaml)
-            if not wechatter.shared.utils.validation.validate_training_data_format_version(
-                    data, original_filename
-            ):
-                return Domain.empty()
-
-            return cls.from_dict(data)
+            data = wechatter.shared.utils.io.parse_yaml_file_content(
+                yaml, original_filename
+            )
+            return cls._from_yaml_data(data, original_filename)
         except YamlException as e:
             e.filename = original_filename
             raise e
 
+    @classmethod
+    def _from_yaml_data(cls, data: Dict, original_filename: Text = "") -> "Domain":
+        """Creates the domain from the parsed content of a domain file."""
+        if not wechatter.shared.utils.validation.validate_training_data_format_version(
+                data, original_filename
+        ):
+            return Domain.empty()
+
+        return cls.from_dict(data)
+
     @classmethod
     def from_dict(cls, data: Dict) -> "Domain":
         """
@@ -232,17 +293,51 @@ class Domain:
 
     @classmethod
     def from_directory(cls, path: Text) -> "Domain":
-        """Loads and merges multiple domain files recursively from a directory tree."""
+        """Loads and merges multiple domain files recursively from a directory tree.
 
-        domain = Domain.empty()
-        for root, _, files in os.walk(path, followlinks=True):
-            for file in files:
-                full_path = os.path.join(root, file)
-                if Domain.is_domain_file(full_path):
-                    other = Domain.from_file(full_path)
-                    domain = other.merge(domain)
+        Every file is read and parsed only once.
+        """
+        from wechatter.shared.data import is_likely_yaml_file
 
-        return domain
+        candidates = [
+            os.path.join(root, file)
+            for root, _, files in os.walk(path, followlinks=True)
+            for file in files
+            if is_likely_yaml_file(file)
+        ]
+
+        # files which are found later take precedence
+        builder = DomainBuilder(override=True)
+        for candidate in candidates:
+            builder.add(cls._from_domain_file(candidate))
+
+        return builder.build()
+
+    @classmethod
+    def _from_domain_file(cls, path: Text) -> Optional["Domain"]:
+        """Loads a domain from a file which is possibly a domain file.
+
+        Returns:
+            The domain or `None` if the file isn't a domain file (see
+            `is_domain_file`).
+        """
+        content = wechatter.shared.utils.io.read_file(path)
+        try:
+            data = wechatter.shared.utils.io.parse_yaml_file_content(content, path)
+        except (ValueError, YamlSyntaxException):
+            return None
+
+        if not isinstance(data, dict) or not any(key in data for key in ALL_DOMAIN_KEYS):
+            return None
+
+        try:
+            wechatter.shared.utils.validation.validate_yaml_schema(
+                content, wechatter.shared.dialogue_config.DOMAIN_SCHEMA_FILE
+            )
+            return cls._from_yaml_data(data, path)
+        except YamlException as e:
+            e.filename = path
+            raise e
 
     def merge(self, domain: Optional["Domain"], override: bool = False) -> "Domain":
         """Merge this domain with another one, combining their attributes.
@@ -257,8 +352,21 @@ class Domain:
         if self.is_empty():
             return domain
 
-        domain_dict = domain.as_dict()
-        combined = self.as_dict()
+        combined = self._merge_domain_dicts(
+            self.as_dict(), domain.as_dict(), override
+        )
+        return self.__class__.from_dict(combined)
+
+    @staticmethod
+    def _merge_domain_dicts(
+            combined: Dict[Text, Any],
+            domain_dict: Dict[Text, Any],
+            override: bool = False,
+    ) -> Dict[Text, Any]:
+        """Merges the serialized domain `domain_dict` into `combined` (see `merge`).
+
+        Both dictionaries are the output of `as_dict`, `domain_dict` isn't changed.
+        """
 
         def merge_dicts(
                 d1: Dict[Text, Any],
@@ -286,11 +394,13 @@ class Domain:
             return list(merged_dicts.values())
 
         if override:
-            config = domain_dict["config"]
-            for key, val in config.items():
-                combined["config"][key] = val
+            combined["config"] = {**combined["config"], **domain_dict["config"]}
 
-        if override or self.session_config == SessionConfig.default():
+        default_session_config = SessionConfig.default()
+        if override or combined[SESSION_CONFIG_KEY] == {
+            SESSION_EXPIRATION_TIME_KEY: default_session_config.session_expiration_time,
+            CARRY_OVER_SLOTS_KEY: default_session_config.carry_over_slots,
+        }:
             combined[SESSION_CONFIG_KEY] = domain_dict[SESSION_CONFIG_KEY]
 
         combined[KEY_INTENTS] = merge_lists_of_dicts(
@@ -298,17 +408,19 @@ class Domain:
         )
 
         # remove existing forms from new actions
+        actions = list(domain_dict[KEY_ACTIONS])
         for form in combined[KEY_FORMS]:
-            if form in domain_dict[KEY_ACTIONS]:
-                domain_dict[KEY_ACTIONS].remove(form)
+            if form in actions:
+                actions.remove(form)
 
-        for key in [KEY_ENTITIES, KEY_ACTIONS, KEY_E2E_ACTIONS]:
+        combined[KEY_ACTIONS] = merge_lists(combined[KEY_ACTIONS], actions)
+        for key in [KEY_ENTITIES, KEY_E2E_ACTIONS]:
             combined[key] = merge_lists(combined[key], domain_dict[key])
 
         for key in [KEY_FORMS, KEY_RESPONSES, KEY_SLOTS]:
             combined[key] = merge_dicts(combined[key], domain_dict[key], override)
 
-        return self.__class__.from_dict(combined)
+        return combined
 
     @staticmethod
     def collect_slots(slot_dict: Dict[Text, Any]) -> List[Slot]:
@@ -583,6 +695,9 @@ class Domain:
             session_config: Configuration for conversation sessions. Conversations are
                 restarted at the end of a session.
         """
+        # fingerprint of the domain, see `fingerprint` for when it is reset
+        self._fingerprint: Optional[bytes] = None
+
         self.entities, self.roles, self.groups = self.collect_entity_properties(
             entities
         )
@@ -707,24 +822,43 @@ class Domain:
 
         return [], {}, []
 
+    def __setattr__(self, name: Text, value: Any) -> None:
+        super().__setattr__(name, value)
+        if not name.startswith(_CACHE_ATTRIBUTE_PREFIXES):
+            # the domain changed, the fingerprint has to be computed again
+            self.__dict__["_fingerprint"] = None
+
     def __hash__(self) -> int:
         """Returns a unique hash for the domain."""
-        return int(self.fingerprint(), 16)
+        return int.from_bytes(self._fingerprint_digest(), "big")
 
     def fingerprint(self) -> Text:
         """Returns a unique hash for the domain which is stable across python runs.
 
+        The fingerprint is computed on the first call and kept afterwards. Assigning
+        an attribute of the domain resets it, changing the content of an attribute
+        in place (e.g. `domain.responses[name] = ...` or `domain.slots.append(...)`)
+        doesn't. Treat a domain as immutable once it's used, or create a changed
+        copy with `Domain.from_dict` / `merge` instead.
+
         Returns:
             fingerprint of the domain
         """
-        self_as_dict = self.as_dict()
-        self_as_dict[
-            KEY_INTENTS
-        ] = wechatter.shared.utils.common.sort_list_of_dicts_by_first_key(
-            self_as_dict[KEY_INTENTS]
-        )
-        self_as_dict[KEY_ACTIONS] = self.action_names_or_texts
-        return wechatter.shared.utils.io.get_dictionary_fingerprint(self_as_dict)
+        return self._fingerprint_digest().hex()
+
+    def _fingerprint_digest(self) -> bytes:
+        if self._fingerprint is None:
+            self_as_dict = self.as_dict()
+            self_as_dict[
+                KEY_INTENTS
+            ] = wechatter.shared.utils.common.sort_list_of_dicts_by_first_key(
+                self_as_dict[KEY_INTENTS]
+            )
+            self_as_dict[KEY_ACTIONS] = self.action_names_or_texts
+            self._fingerprint = wechatter.shared.utils.io.get_dictionary_digest(
+                self_as_dict
+            )
+        return self._fingerprint
 
     @wechatter.shared.utils.common.lazy_property
     def user_actions_and_forms(self):
@@ -799,7 +933,7 @@ class Domain:
             "The terminology 'template' is deprecated and replaced by 'response', call `is_retrieval_intent_response` instead of `is_retrieval_intent_template`.",
             docs=f"{wechatter.shared.dialogue_config.DOCS_URL_MIGRATION_GUIDE}#rasa-23-to-rasa-24",
         )
-        return wechatter.shared.nlu.constants.RESPONSE_IDENTIFIER_DELIMITER in response[0]
+        return wechatter.shared.nlu.nlu_config.RESPONSE_IDENTIFIER_DELIMITER in response[0]
 
     @staticmethod
     def is_retrieval_intent_response(
@@ -810,7 +944,7 @@ class Domain:
         These responses have a `/` symbol in their name. Use that to filter them from
         the rest.
         """
-        return wechatter.shared.nlu.constants.RESPONSE_IDENTIFIER_DELIMITER in response[0]
+        return wechatter.shared.nlu.nlu_config.RESPONSE_IDENTIFIER_DELIMITER in response[0]
 
     def _add_default_slots(self) -> None:
         """Sets up the default slots and slot values for the domain."""
@@ -827,6 +961,7 @@ class Domain:
         """
         for slot in [s for s in self.slots if isinstance(s, CategoricalSlot)]:
             slot.add_default_value()
+        self._fingerprint = None
 
     def add_categorical_slot_default_value(self) -> None:
         """See `_add_categorical_slot_default_value` for docstring."""
@@ -844,15 +979,16 @@ class Domain:
         The value of this slot will hold the name of the slot which the user
         needs to fill in next (either explicitly or implicitly) as part of a form.
         """
-        if self.form_names and wechatter.shared.dm.dialogue_config.REQUESTED_SLOT not in [
+        if self.form_names and wechatter.shared.dm.dm_config.REQUESTED_SLOT not in [
             s.name for s in self.slots
         ]:
             self.slots.append(
                 TextSlot(
-                    wechatter.shared.dm.dialogue_config.REQUESTED_SLOT,
+                    wechatter.shared.dm.dm_config.REQUESTED_SLOT,
                     influence_conversation=False,
                 )
             )
+            self._fingerprint = None
 
     def add_requested_slot(self) -> None:
         """See `_add_categorical_slot_default_value` for docstring."""
@@ -874,12 +1010,12 @@ class Domain:
         base slots.
         """
         if (
-                wechatter.shared.dm.dialogue_config.DEFAULT_KNOWLEDGE_BASE_ACTION
+                wechatter.shared.dm.dm_config.DEFAULT_KNOWLEDGE_BASE_ACTION
                 in self.action_names_or_texts
         ):
             logger.warning(
                 "You are using an experiential feature: Action '{}'!".format(
-                    wechatter.shared.dm.dialogue_config.DEFAULT_KNOWLEDGE_BASE_ACTION
+                    wechatter.shared.dm.dm_config.DEFAULT_KNOWLEDGE_BASE_ACTION
                 )
             )
             slot_names = [s.name for s in self.slots]
@@ -891,6 +1027,7 @@ class Domain:
             for s in knowledge_base_slots:
                 if s not in slot_names:
                     self.slots.append(TextSlot(s, influence_conversation=False))
+            self._fingerprint = None
 
     def add_knowledge_base_slots(self) -> None:
         """See `_add_categorical_slot_default_value` for docstring."""
@@ -906,6 +1043,7 @@ class Domain:
         self.slots.append(
             AnySlot(wechatter.shared.dm.dm_config.SESSION_START_METADATA_SLOT, )
         )
+        self._fingerprint = None
 
     def index_for_action(self, action_name: Text) -> int:
         """Looks up which action index corresponds to this action name."""
@@ -970,6 +1108,16 @@ class Domain:
             for feature_index in range(0, slot.feature_dimensionality())
         ]
 
+    @wechatter.shared.utils.common.lazy_property
+    def slot_feature_offsets(self) -> Dict[Text, Tuple[int, int]]:
+        """Returns start and end of the features of every slot in `slot_states`."""
+        offsets = {}
+        for index, slot_state in enumerate(self.slot_states):
+            slot_name = slot_state.rsplit("_", 1)[0]
+            start, _ = offsets.get(slot_name, (index, index))
+            offsets[slot_name] = (start, index + 1)
+        return offsets
+
     # noinspection PyTypeChecker
     @wechatter.shared.utils.common.lazy_property
     def entity_states(self) -> List[Text]:
@@ -1030,7 +1178,7 @@ class Domain:
 
     def _get_featurized_entities(self, latest_message: UserUttered) -> Set[Text]:
         intent_name = latest_message.intent.get(
-            wechatter.shared.nlu.constants.INTENT_NAME_KEY
+            wechatter.shared.nlu.nlu_config.INTENT_NAME_KEY
         )
         intent_config = self.intent_config(intent_name)
         entities = latest_message.entities
@@ -1086,12 +1234,12 @@ class Domain:
         # for deduplication
         entities = tuple(
             self._get_featurized_entities(latest_message)
-            & set(sub_state.get(wechatter.shared.nlu.constants.ENTITIES, ()))
+            & set(sub_state.get(wechatter.shared.nlu.nlu_config.ENTITIES, ()))
         )
         if entities:
-            sub_state[wechatter.shared.nlu.constants.ENTITIES] = entities
+            sub_state[wechatter.shared.nlu.nlu_config.ENTITIES] = entities
         else:
-            sub_state.pop(wechatter.shared.nlu.constants.ENTITIES, None)
+            sub_state.pop(wechatter.shared.nlu.nlu_config.ENTITIES, None)
 
         return sub_state
 
@@ -1108,6 +1256,10 @@ class Domain:
         Returns:
             a dictionary mapping slot names to their featurization
         """
+        if isinstance(tracker.slots, SlotTable):
+            # the features of the slots were computed when they were set
+            return tracker.slots.sub_state(omit_unset_slots)
+
         slots = {}
         for slot_name, slot in tracker.slots.items():
             if slot is not None and slot.as_feature():
@@ -1202,27 +1354,27 @@ class Domain:
         # remove slots which only occur in rules but not in stories
         if rule_only_slots:
             for slot in rule_only_slots:
-                state.get(wechatter.shared.core.constants.SLOTS, {}).pop(slot, None)
+                state.get(wechatter.shared.dm.dm_config.SLOTS, {}).pop(slot, None)
         # remove active loop which only occur in rules but not in stories
         if (
                 rule_only_loops
-                and state.get(wechatter.shared.core.constants.ACTIVE_LOOP, {}).get(
-            wechatter.shared.core.constants.LOOP_NAME
+                and state.get(wechatter.shared.dm.dm_config.ACTIVE_LOOP, {}).get(
+            wechatter.shared.dm.dm_config.LOOP_NAME
         )
                 in rule_only_loops
         ):
-            del state[wechatter.shared.core.constants.ACTIVE_LOOP]
+            del state[wechatter.shared.dm.dm_config.ACTIVE_LOOP]
 
     @staticmethod
     def _substitute_rule_only_user_input(state: State, last_ml_state: State) -> None:
         if not wechatter.shared.dm.trackers.is_prev_action_listen_in_state(state):
-            if not last_ml_state.get(wechatter.shared.dm.constants.USER) and state.get(
-                    wechatter.shared.core.constants.USER
+            if not last_ml_state.get(wechatter.shared.dm.dm_config.USER) and state.get(
+                    wechatter.shared.dm.dm_config.USER
             ):
-                del state[wechatter.shared.core.constants.USER]
-            elif last_ml_state.get(wechatter.shared.core.constants.USER):
-                state[wechatter.shared.core.constants.USER] = last_ml_state[
-                    wechatter.shared.core.constants.USER
+                del state[wechatter.shared.dm.dm_config.USER]
+            elif last_ml_state.get(wechatter.shared.dm.dm_config.USER):
+                state[wechatter.shared.dm.dm_config.USER] = last_ml_state[
+                    wechatter.shared.dm.dm_config.USER
                 ]
 
     def states_for_tracker_history(
@@ -1248,7 +1400,10 @@ class Domain:
         states = []
         last_ml_action_sub_state = None
         turn_was_hidden = False
-        for tr, hide_rule_turn in tracker.generate_all_prior_trackers():
+        # walks the events once, the sub-states are only updated if an event
+        # changed them
+        extractor = IncrementalStateExtractor(self, omit_unset_slots=omit_unset_slots)
+        for tr, hide_rule_turn in extractor.prior_trackers(tracker):
             if ignore_rule_only_turns:
                 # remember previous ml action based on the last non hidden turn
                 # we need this to override previous action in the ml state
@@ -1266,7 +1421,7 @@ class Domain:
                 if turn_was_hidden:
                     continue
 
-            state = self.get_active_states(tr, omit_unset_slots=omit_unset_slots)
+            state = extractor.active_states()
 
             if ignore_rule_only_turns:
                 # clean state from only rule features
@@ -1830,6 +1985,224 @@ class Domain:
         return self.forms.get(form_name, {})
 
 
+class DomainBuilder:
+    """Merges any number of domains and creates the merged `Domain` only once.
+
+    Merging the domains pairwise with `Domain.merge` serializes and rebuilds the
+    domain for every single merge. The builder folds the serialized domains with
+    the same rules as `Domain.merge` and calls `Domain.from_dict` a single time.
+    """
+
+    def __init__(self, override: bool = False) -> None:
+        """Creates the builder.
+
+        Args:
+            override: If `False` the domains are merged like
+                `merged.merge(domain)`, i.e. the attributes of the first domain
+                are kept. If `True` they are merged like `domain.merge(merged)`,
+                i.e. the attributes of domains which are added later win.
+        """
+        self.override = override
+        self._fragments: List[Tuple[Domain, Dict[Text, Any]]] = []
+        self._empty_domain_dict: Optional[Dict[Text, Any]] = None
+
+    def add(self, domain: Optional[Domain]) -> "DomainBuilder":
+        """Adds a domain which is merged with the other domains."""
+        if domain is None:
+            return self
+
+        if self._empty_domain_dict is None:
+            self._empty_domain_dict = Domain.empty().as_dict()
+
+        domain_dict = domain.as_dict()
+        if domain_dict != self._empty_domain_dict:
+            self._fragments.append((domain, domain_dict))
+        return self
+
+    def build(self) -> Domain:
+        """Creates the merged domain."""
+        if not self._fragments:
+            return Domain.empty()
+        if len(self._fragments) == 1:
+            return self._fragments[0][0]
+
+        merged_class = self._fragments[0][0].__class__
+        combined = dict(self._fragments[0][1])
+        for domain, domain_dict in self._fragments[1:]:
+            if self.override:
+                # `domain.merge(merged)`: the new domain is the receiver
+                merged_class = domain.__class__
+                combined = Domain._merge_domain_dicts(dict(domain_dict), combined)
+            else:
+                combined = Domain._merge_domain_dicts(combined, domain_dict)
+
+        return merged_class.from_dict(combined)
+
+
+class IncrementalStateExtractor:
+    """Extracts the states of all prior trackers in a single pass over the events.
+
+    `Domain.get_active_states` builds every sub-state from scratch for every turn.
+    The extractor applies the events to one tracker and only updates the sub-states
+    which were changed by the applied events. The slots of this tracker are kept in
+    a `SlotTable`. The states are the same as the ones of
+    `Domain.get_active_states` for the trackers of
+    `DialogueStateTracker.generate_all_prior_trackers`.
+    """
+
+    # events which don't change any of the sub-states
+    _STATELESS_EVENTS = (
+        BotUttered,
+        FollowupAction,
+        LoopInterrupted,
+        ActionExecutionRejected,
+        ReminderScheduled,
+        ReminderCancelled,
+        ConversationPaused,
+        ConversationResumed,
+        AgentUttered,
+        StoryExported,
+    )
+    _USER_EVENTS = (UserUttered, DefinePrevUserUtteredFeaturization, EntitiesAdded)
+
+    def __init__(self, domain: Domain, omit_unset_slots: bool = False) -> None:
+        """Creates the extractor.
+
+        Args:
+            domain: The domain which is used to featurize the user input.
+            omit_unset_slots: If `True` do not include the initial values of slots.
+        """
+        self.domain = domain
+        self.omit_unset_slots = omit_unset_slots
+
+        self._tracker: Optional["DialogueStateTracker"] = None
+        self._user_sub_state: Optional[Dict] = None
+        self._prev_action_sub_state: Optional[Dict] = None
+        self._active_loop_sub_state: Optional[Dict] = None
+        # featurization of every slot in the order of `tracker.slots`, `None` for
+        # slots which are not part of the state
+        self._slot_features: Dict[Text, Any] = {}
+        self._slots_sub_state: Optional[Dict] = None
+        self._changed_slots: Optional[Set[Text]] = None
+
+    def prior_trackers(
+            self, tracker: "DialogueStateTracker"
+    ) -> Iterator[Tuple["DialogueStateTracker", bool]]:
+        """Generates the tracker for every prior turn like
+        `DialogueStateTracker.generate_all_prior_trackers`.
+
+        The same tracker object is updated and returned for every turn. Call
+        `active_states` to get the states of the current turn.
+        """
+        self._tracker = tracker.init_copy()
+        if type(self._tracker.slots) is dict:
+            # the copied slots keep their features in a table which is updated
+            # whenever a slot is set, reading the features doesn't create lists
+            self._tracker.slots = SlotTable(self._tracker.slots.values())
+        self._mark_all_changed()
+
+        for event in tracker.applied_events():
+            if isinstance(event, ActionExecuted):
+                yield self._tracker, event.hide_rule_turn
+
+            self._tracker.update(event)
+            self._mark_changed(event)
+
+        yield self._tracker, False
+
+    def active_states(self) -> State:
+        """Returns the states of the current turn.
+
+        The returned state can be modified, it doesn't share any sub-state with
+        the states of other turns.
+        """
+        tracker = self._tracker
+        if self._user_sub_state is None:
+            self._user_sub_state = self.domain._get_user_sub_state(tracker)
+        if self._prev_action_sub_state is None:
+            self._prev_action_sub_state = self.domain._get_prev_action_sub_state(
+                tracker
+            )
+        if self._active_loop_sub_state is None:
+            self._active_loop_sub_state = self.domain._get_active_loop_sub_state(
+                tracker
+            )
+        if self._slots_sub_state is None:
+            self._update_slot_features()
+            self._slots_sub_state = {
+                slot_name: features
+                for slot_name, features in self._slot_features.items()
+                if features is not None
+            }
+
+        state = {
+            wechatter.shared.dm.dm_config.USER: dict(self._user_sub_state),
+            wechatter.shared.dm.dm_config.SLOTS: dict(self._slots_sub_state),
+            wechatter.shared.dm.dm_config.PREVIOUS_ACTION: dict(
+                self._prev_action_sub_state
+            ),
+            wechatter.shared.dm.dm_config.ACTIVE_LOOP: dict(
+                self._active_loop_sub_state
+            ),
+        }
+        return Domain._clean_state(state)
+
+    def _mark_all_changed(self) -> None:
+        self._user_sub_state = None
+        self._prev_action_sub_state = None
+        self._active_loop_sub_state = None
+        self._slots_sub_state = None
+        self._changed_slots = None
+
+    def _mark_changed(self, event: Event) -> None:
+        if isinstance(event, self._STATELESS_EVENTS):
+            return
+        if isinstance(event, ActionExecuted):
+            self._prev_action_sub_state = None
+        elif isinstance(event, self._USER_EVENTS):
+            self._user_sub_state = None
+        elif isinstance(event, SlotSet):
+            self._slots_sub_state = None
+            if self._changed_slots is not None:
+                self._changed_slots.add(event.key)
+        elif isinstance(event, ActiveLoop):
+            self._active_loop_sub_state = None
+        else:
+            # e.g. `AllSlotsReset` or events this extractor doesn't know about
+            self._mark_all_changed()
+
+    def _update_slot_features(self) -> None:
+        slots = self._tracker.slots
+        if self._changed_slots is None:
+            # recompute all slots, this also restores the order of `tracker.slots`
+            self._slot_features = {
+                slot_name: self._slot_feature(slot) for slot_name, slot in slots.items()
+            }
+        else:
+            for slot_name in self._changed_slots:
+                slot = slots.get(slot_name)
+                if slot is not None or slot_name in self._slot_features:
+                    self._slot_features[slot_name] = self._slot_feature(slot)
+        self._changed_slots = set()
+
+    def _slot_feature(self, slot: Optional[Slot]) -> Any:
+        """Featurizes a single slot like `Domain._get_slots_sub_state`."""
+        if slot is None:
+            return None
+        features = slot.features()
+        if not len(features):
+            return None
+        if self.omit_unset_slots and not slot.has_been_set:
+            return None
+        if slot.value == wechatter.shared.dm.dm_config.SHOULD_NOT_BE_SET:
+            return wechatter.shared.dm.dm_config.SHOULD_NOT_BE_SET
+
+        if any(features):
+            # only add slot if some of the features are not zero
+            return tuple(map(float, features))
+        return None
+
+
 class SlotMapping(Enum):
     """
     槽-值匹配
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   domain_cache.py
+
+@Time    :   2021/4/27 3:12 下午
+
+@Desc    :   编译后的domain缓存：按domain文件内容的哈希保存合并后的domain字典，启动时不再解析和校验YAML
+
+"""
+
+import functools
+import json
+import logging
+import os
+import sys
+import tempfile
+from hashlib import blake2b
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Text, Union, TYPE_CHECKING
+
+import wechatter
+import wechatter.shared.dialogue_config
+
+if TYPE_CHECKING:
+    from wechatter.shared.dm.domain import Domain
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE_EXTENSION = ".domain.json"
+
+# increase this if the serialized domain changes in a way which isn't covered by
+# the source of the domain module
+DOMAIN_CACHE_VERSION = 1
+
+
+def cache_directory(directory: Optional[Text] = None) -> Optional[Text]:
+    """Returns the directory of the domain cache or `None` if it's disabled.
+
+    The cache is only used if a directory is passed or set with the environment
+    variable `DOMAIN_CACHE_PATH`.
+    """
+    directory = directory or os.environ.get(
+        wechatter.shared.dialogue_config.ENV_DOMAIN_CACHE_PATH
+    )
+    return os.path.abspath(directory) if directory else None
+
+
+def domain_files(paths: List[Union[Text, Path]]) -> List[Text]:
+    """Returns all files which can contribute to the domain loaded from `paths`.
+
+    The files are returned in the order in which they are loaded.
+    """
+    from wechatter.shared.data import is_likely_yaml_file
+
+    files = []
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isfile(path):
+            files.append(path)
+        elif os.path.isdir(path):
+            for root, _, filenames in os.walk(path, followlinks=True):
+                files.extend(
+                    os.path.join(root, filename)
+                    for filename in filenames
+                    if is_likely_yaml_file(filename)
+                )
+    return files
+
+
+@functools.lru_cache(maxsize=None)
+def _code_version(domain_class: type) -> Text:
+    """Returns a hash of the source of the module which defines `domain_class`."""
+    digest = blake2b(digest_size=16)
+    digest.update(str(DOMAIN_CACHE_VERSION).encode("ascii"))
+    digest.update(wechatter.__version__.encode("utf-8"))
+    digest.update(f"{domain_class.__module__}.{domain_class.__qualname__}".encode())
+    module_file = getattr(sys.modules.get(domain_class.__module__), "__file__", None)
+    if module_file:
+        with open(module_file, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def cache_key(domain_class: type, files: List[Text]) -> Text:
+    """Returns the key of the compiled domain for the given domain files.
+
+    The key changes if any of the files is added, removed, moved or changed, or if
+    the code of the domain class changes (see `DOMAIN_CACHE_VERSION`).
+    """
+    digest = blake2b(digest_size=16)
+    digest.update(_code_version(domain_class).encode("ascii"))
+    for file in files:
+        digest.update(file.encode("utf-8"))
+        with open(file, "rb") as f:
+            digest.update(blake2b(f.read(), digest_size=16).digest())
+    return digest.hexdigest()
+
+
+def cache_file(
+    paths: List[Union[Text, Path]], directory: Optional[Text] = None
+) -> Optional[Text]:
+    """Returns the file in which the domain loaded from `paths` is cached.
+
+    There is one file per combination of paths, which is replaced if the domain
+    files change.
+
+    Args:
+        paths: The domain files or directories.
+        directory: The cache directory (see `cache_directory`).
+
+    Returns:
+        The cache file or `None` if the cache is disabled.
+    """
+    directory = cache_directory(directory)
+    if not directory:
+        return None
+
+    name = blake2b(
+        "\n".join(os.path.abspath(path) for path in paths).encode("utf-8"),
+        digest_size=16,
+    ).hexdigest()
+    return os.path.join(directory, name + CACHE_FILE_EXTENSION)
+
+
+def load_compiled_domain(path: Text, key: Text) -> Optional[Dict[Text, Any]]:
+    """Loads a cached domain.
+
+    Returns:
+        The serialized domain (see `Domain.as_dict`) or `None` if there is no valid
+        cached domain for `key`.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.debug(f"Ignoring invalid compiled domain '{path}'. Error: {e}")
+        return None
+
+    if not isinstance(cached, dict) or cached.get("key") != key:
+        return None
+
+    logger.debug(f"Loaded compiled domain from '{path}'.")
+    return cached.get("domain")
+
+
+def persist_compiled_domain(domain: "Domain", path: Text, key: Text) -> None:
+    """Caches a serialized domain together with the key of its domain files.
+
+    Failing to write the cache doesn't fail loading the domain.
+    """
+    try:
+        content = json.dumps({"key": key, "domain": domain.as_dict()})
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first, so that other processes never read a
+        # partially written cache
+        file_descriptor, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+    except Exception as e:
+        logger.debug(f"Failed to cache the compiled domain in '{path}'. Error: {e}")
@@ -17,6 +17,7 @@ import abc
 import json
 import logging
 import re
+import sys
 import time
 import uuid
 from abc import ABC
@@ -31,6 +32,7 @@ from typing import (
     Iterable,
     cast,
     Tuple,
+    TYPE_CHECKING,
 )
 from typing import Union
 
@@ -50,7 +52,6 @@ from wechatter.shared.dm.dm_config import (
     ACTION_SESSION_START_NAME,
     ACTION_LISTEN_NAME,
 )
-from wechatter.shared.dm.trackers import DialogueStateTracker
 from wechatter.shared.exceptions import UnsupportedFeatureException
 from wechatter.shared.nlu.nlu_config import (
     ENTITY_ATTRIBUTE_TYPE,
@@ -65,9 +66,21 @@ from wechatter.shared.nlu.nlu_config import (
     ENTITY_ATTRIBUTE_GROUP,
 )
 
+if TYPE_CHECKING:
+    from wechatter.shared.dm.trackers import DialogueStateTracker
+
 logger = logging.getLogger(__name__)
 
 
+def _intern(name: Optional[Text]) -> Optional[Text]:
+    """Interns names of actions, intents, slots and loops.
+
+    The same few names occur in the events of every tracker, interning them keeps
+    only a single copy of every name in memory.
+    """
+    return sys.intern(name) if type(name) is str else name
+
+
 def deserialise_events(serialized_events: List[Dict[Text, Any]]) -> List["Event"]:
     """
     Convert a list of dictionaries to a list of corresponding events.
@@ -227,6 +240,26 @@ class Event(ABC):
 
     type_name = "event"
 
+    # events don't have an instance `__dict__`, every subclass lists its attributes
+    # in `__slots__` to keep the many events of the live trackers small
+    __slots__ = ("timestamp", "_metadata")
+
+    # maps `type_name` to the event class which defines it, filled in whenever a
+    # subclass of `Event` is created (see `__init_subclass__`)
+    _registered_types: Dict[Text, Type["Event"]] = {}
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        """Registers the event class under its `type_name`.
+
+        Only classes which define their own `type_name` are registered, mixins which
+        inherit the type name of their parent are skipped. If two classes use the
+        same type name, the class which was defined first wins.
+        """
+        super().__init_subclass__(**kwargs)
+
+        if "type_name" in cls.__dict__:
+            Event._registered_types.setdefault(cls.type_name, cls)
+
     def __init__(
         self,
         timestamp: Optional[float] = None,
@@ -247,6 +280,15 @@ class Event(ABC):
         # CHANGELOG.rst.
         return getattr(self, "_metadata", {})
 
+    def __setstate__(self, state: Any) -> None:
+        # events pickled before they had `__slots__` store their attributes as
+        # `__dict__`, events with `__slots__` as tuple `(None, slots)`
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **(state[1] or {})}
+
+        for attribute, value in state.items():
+            setattr(self, attribute, value)
+
     def __ne__(self, other: Any) -> bool:
         # Not strictly necessary, but to avoid having both x==y and x!=y
         # True at the same time
@@ -326,10 +368,16 @@ class Event(ABC):
     def resolve_by_type(
         type_name: Text, default: Optional[Type["Event"]] = None
     ) -> Optional[Type["Event"]]:
-        """Returns a slots class by its type name."""
+        """Returns an event class by its type name."""
+        event_class = Event._registered_types.get(type_name)
+        if event_class is not None:
+            return event_class
 
+        # fall back to scanning the class hierarchy, e.g. for plugin events which
+        # got their `type_name` assigned after the class was created
         for cls in wechatter.shared.utils.common.all_subclasses(Event):
             if cls.type_name == type_name:
+                Event._registered_types[type_name] = cls
                 return cls
         if type_name == "topic":
             return None  # backwards compatibility to support old TopicSet evts
@@ -360,6 +408,8 @@ class Event(ABC):
 class AlwaysEqualEventMixin(Event, ABC):
     """Class to deduplicate common behavior for events without additional attributes."""
 
+    __slots__ = ()
+
     def __eq__(self, other: Any) -> bool:
         """Compares object with other object."""
         if not isinstance(other, self.__class__):
@@ -371,6 +421,8 @@ class AlwaysEqualEventMixin(Event, ABC):
 class SkipEventInMDStoryMixin(Event, ABC):
     """Skips the visualization of an event in Markdown stories."""
 
+    __slots__ = ()
+
     def as_story_string(self) -> None:
         """Returns the event as story string.
 
@@ -387,6 +439,16 @@ class UserUttered(Event):
     """
 
     type_name = "user"
+    __slots__ = (
+        "text",
+        "intent",
+        "entities",
+        "input_channel",
+        "message_id",
+        "use_text_for_featurization",
+        "_parse_data_extra",
+        "_parse_entities",
+    )
 
     def __init__(
         self,
@@ -416,9 +478,12 @@ class UserUttered(Event):
 
         """
         self.text = text
-        self.intent = intent if intent else {}
+        # a copy, interning the name mustn't change the caller's dictionary
+        self.intent = dict(intent) if intent else {}
+        if INTENT_NAME_KEY in self.intent:
+            self.intent[INTENT_NAME_KEY] = _intern(self.intent[INTENT_NAME_KEY])
         self.entities = entities if entities else []
-        self.input_channel = input_channel
+        self.input_channel = _intern(input_channel)
         self.message_id = message_id
 
         super().__init__(timestamp, metadata)
@@ -434,18 +499,54 @@ class UserUttered(Event):
             # happens during training
             self.use_text_for_featurization = False
 
-        self.parse_data = {
+        # `parse_data` is created from the attributes whenever it's accessed, only
+        # the parsing results which aren't stored in an attribute are kept
+        self._parse_data_extra: Optional[Dict[Text, Any]] = None
+        self._set_parse_data_extra(parse_data or {})
+
+    def _set_parse_data_extra(self, parse_data: Dict[Text, Any]) -> None:
+        attributes = {
             INTENT: self.intent,
-            # Copy entities so that changes to `self.entities` don't affect
-            # `self.parse_data` and hence don't get persisted
-            ENTITIES: self.entities.copy(),
+            ENTITIES: self.entities,
             TEXT: self.text,
             "message_id": self.message_id,
             "metadata": self.metadata,
         }
+        extra = {
+            key: value
+            for key, value in parse_data.items()
+            if key not in attributes or value != attributes[key]
+        }
+        self._parse_data_extra = extra or None
+        # Remember the entities so that changes to `self.entities` (e.g. by
+        # `EntitiesAdded`) don't affect `self.parse_data` and hence don't get
+        # persisted
+        self._parse_entities = (
+            tuple(self.entities) if self.entities and ENTITIES not in extra else None
+        )
 
-        if parse_data:
-            self.parse_data.update(**parse_data)
+    @property
+    def parse_data(self) -> Dict[Text, Any]:
+        """Detailed NLU parsing result of the message."""
+        parse_data = {
+            INTENT: self.intent,
+            ENTITIES: list(self._parse_entities or ()),
+            TEXT: self.text,
+            "message_id": self.message_id,
+            "metadata": self.metadata,
+        }
+        if self._parse_data_extra:
+            parse_data.update(self._parse_data_extra)
+        return parse_data
+
+    @parse_data.setter
+    def parse_data(self, parse_data: Dict[Text, Any]) -> None:
+        self._set_parse_data_extra(parse_data)
+
+    def __setstate__(self, state: Any) -> None:
+        self._parse_data_extra = None
+        self._parse_entities = None
+        super().__setstate__(state)
 
     @staticmethod
     def _from_parse_data(
@@ -650,6 +751,7 @@ class DefinePrevUserUtteredFeaturization(SkipEventInMDStoryMixin):
     """Stores information whether action was predicted based on text or intent."""
 
     type_name = "user_featurization"
+    __slots__ = ("use_text_for_featurization",)
 
     def __init__(
         self,
@@ -720,6 +822,7 @@ class EntitiesAdded(SkipEventInMDStoryMixin):
     """Event that is used to add extracted entities to the tracker state."""
 
     type_name = "entities"
+    __slots__ = ("entities",)
 
     def __init__(
         self,
@@ -797,6 +900,7 @@ class BotUttered(SkipEventInMDStoryMixin):
     """
 
     type_name = "bot"
+    __slots__ = ("text", "data")
 
     def __init__(self, text=None, data=None, metadata=None, timestamp=None) -> None:
         """Creates event for a bot response.
@@ -898,6 +1002,7 @@ class SlotSet(Event):
     """
 
     type_name = "slot"
+    __slots__ = ("key", "value")
 
     def __init__(
         self,
@@ -914,7 +1019,7 @@ class SlotSet(Event):
             timestamp: When the event was created.
             metadata: Additional event metadata.
         """
-        self.key = key
+        self.key = _intern(key)
         self.value = value
         super().__init__(timestamp, metadata)
 
@@ -982,6 +1087,7 @@ class Restarted(AlwaysEqualEventMixin):
     """
 
     type_name = "restart"
+    __slots__ = ()
 
     def __hash__(self) -> int:
         """Returns unique hash for event."""
@@ -1006,6 +1112,7 @@ class UserUtteranceReverted(AlwaysEqualEventMixin):
     """
 
     type_name = "rewind"
+    __slots__ = ()
 
     def __hash__(self) -> int:
         """Returns unique hash for event."""
@@ -1030,6 +1137,7 @@ class AllSlotsReset(AlwaysEqualEventMixin):
     """
 
     type_name = "reset_slots"
+    __slots__ = ()
 
     def __hash__(self) -> int:
         """Returns unique hash for event."""
@@ -1051,6 +1159,13 @@ class ReminderScheduled(Event):
     """
 
     type_name = "reminder"
+    __slots__ = (
+        "intent",
+        "entities",
+        "trigger_date_time",
+        "kill_on_user_message",
+        "name",
+    )
 
     def __init__(
         self,
@@ -1077,7 +1192,7 @@ class ReminderScheduled(Event):
             timestamp: Creation date of the event.
             metadata: Optional event metadata.
         """
-        self.intent = intent
+        self.intent = _intern(intent)
         self.entities = entities
         self.trigger_date_time = trigger_date_time
         self.kill_on_user_message = kill_on_user_message
@@ -1159,6 +1274,7 @@ class ReminderCancelled(Event):
     """Cancel certain jobs."""
 
     type_name = "cancel_reminder"
+    __slots__ = ("name", "intent", "entities")
 
     def __init__(
         self,
@@ -1184,7 +1300,7 @@ class ReminderCancelled(Event):
             metadata: Optional event metadata.
         """
         self.name = name
-        self.intent = intent
+        self.intent = _intern(intent)
         self.entities = entities
         super().__init__(timestamp, metadata)
 
@@ -1275,6 +1391,7 @@ class ActionReverted(AlwaysEqualEventMixin):
     """
 
     type_name = "undo"
+    __slots__ = ()
 
     def __hash__(self) -> int:
         """Returns unique hash for event."""
@@ -1294,6 +1411,7 @@ class StoryExported(Event):
     """Story should get dumped to a file."""
 
     type_name = "export"
+    __slots__ = ("path",)
 
     def __init__(
         self,
@@ -1346,6 +1464,7 @@ class FollowupAction(Event):
     """Enqueue a followup action."""
 
     type_name = "followup"
+    __slots__ = ("action_name",)
 
     def __init__(
         self,
@@ -1360,7 +1479,7 @@ class FollowupAction(Event):
             timestamp: When the event was created.
             metadata: Additional event metadata.
         """
-        self.action_name = name
+        self.action_name = _intern(name)
         super().__init__(timestamp, metadata)
 
     def __hash__(self) -> int:
@@ -1413,6 +1532,7 @@ class ConversationPaused(AlwaysEqualEventMixin):
     """
 
     type_name = "pause"
+    __slots__ = ()
 
     def __hash__(self) -> int:
         """Returns unique hash for event."""
@@ -1435,6 +1555,7 @@ class ConversationResumed(AlwaysEqualEventMixin):
     """
 
     type_name = "resume"
+    __slots__ = ()
 
     def __hash__(self) -> int:
         """Returns unique hash for event."""
@@ -1457,6 +1578,14 @@ class ActionExecuted(Event):
     """
 
     type_name = "action"
+    __slots__ = (
+        "action_name",
+        "policy",
+        "confidence",
+        "unpredictable",
+        "action_text",
+        "hide_rule_turn",
+    )
 
     def __init__(
         self,
@@ -1482,8 +1611,8 @@ class ActionExecuted(Event):
             hide_rule_turn: If `True`, this action should be hidden in the dialogue
                 history created for ML-based policies.
         """
-        self.action_name = action_name
-        self.policy = policy
+        self.action_name = _intern(action_name)
+        self.policy = _intern(policy)
         self.confidence = confidence
         self.unpredictable = False
         self.action_text = action_text
@@ -1585,6 +1714,7 @@ class AgentUttered(SkipEventInMDStoryMixin):
     """
 
     type_name = "agent"
+    __slots__ = ("text", "data")
 
     def __init__(
         self,
@@ -1641,6 +1771,7 @@ class ActiveLoop(Event):
     """If `name` is given: activates a loop with `name` else deactivates active loop."""
 
     type_name = "active_loop"
+    __slots__ = ("name",)
 
     def __init__(
         self,
@@ -1655,7 +1786,7 @@ class ActiveLoop(Event):
             timestamp: When the event was created.
             metadata: Additional event metadata.
         """
-        self.name = name
+        self.name = _intern(name)
         super().__init__(timestamp, metadata)
 
     def __str__(self) -> Text:
@@ -1708,6 +1839,7 @@ class LegacyForm(ActiveLoop):
     """
 
     type_name = "form"
+    __slots__ = ()
 
     def as_dict(self) -> Dict[Text, Any]:
         """Returns serialized event."""
@@ -1725,6 +1857,7 @@ class LoopInterrupted(SkipEventInMDStoryMixin):
     """
 
     type_name = "loop_interrupted"
+    __slots__ = ("is_interrupted",)
 
     def __init__(
         self,
@@ -1789,6 +1922,7 @@ class LegacyFormValidation(LoopInterrupted):
     """
 
     type_name = "form_validation"
+    __slots__ = ()
 
     def __init__(
         self,
@@ -1822,6 +1956,7 @@ class ActionExecutionRejected(SkipEventInMDStoryMixin):
     """Notify Core that the execution of the action has been rejected."""
 
     type_name = "action_execution_rejected"
+    __slots__ = ("action_name", "policy", "confidence")
 
     def __init__(
         self,
@@ -1840,8 +1975,8 @@ class ActionExecutionRejected(SkipEventInMDStoryMixin):
             timestamp: When the event was created.
             metadata: Additional event metadata.
         """
-        self.action_name = action_name
-        self.policy = policy
+        self.action_name = _intern(action_name)
+        self.policy = _intern(policy)
         self.confidence = confidence
         super().__init__(timestamp, metadata)
 
@@ -1895,6 +2030,7 @@ class SessionStarted(AlwaysEqualEventMixin):
     """Mark the beginning of a new conversation session."""
 
     type_name = "session_started"
+    __slots__ = ()
 
     def __hash__(self) -> int:
         """Returns unique hash for event."""
@@ -1909,4 +2045,4 @@ class SessionStarted(AlwaysEqualEventMixin):
     def apply_to(self, tracker: "DialogueStateTracker") -> None:
         """Applies event to current conversation state."""
         # noinspection PyProtectedMember
-        tracker._reset()
\ No newline at end of file
+        tracker._reset()
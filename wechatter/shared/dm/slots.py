@@ -13,9 +13,24 @@
  
 """
 
+import copy
 import logging
 
-from typing import Any, Dict, List, Optional, Text, Type
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Text,
+    Tuple,
+    Type,
+    TYPE_CHECKING,
+    Union,
+)
+
+import numpy as np
 
 import wechatter.shared.dm.dm_config
 from wechatter.shared.exceptions import WechatterException
@@ -23,6 +38,9 @@ import wechatter.shared.utils.common
 import wechatter.shared.utils.io
 from wechatter.shared.dialogue_config import DOCS_URL_SLOTS
 
+if TYPE_CHECKING:
+    from wechatter.shared.dm.domain import Domain
+
 logger = logging.getLogger(__name__)
 
 
@@ -41,6 +59,21 @@ class Slot:
 
     type_name = None
 
+    # the `SlotTable` which keeps the features of this slot, see `SlotTable`
+    _table: Optional["SlotTable"] = None
+    _table_slice: Optional[slice] = None
+
+    # maps slot type names (and already resolved module paths of custom slot
+    # types) to slot classes, see `register_type` and `resolve_by_type`
+    _registered_types: Dict[Text, Type["Slot"]] = {}
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        """Registers the slot class under its `type_name` if it defines one."""
+        super().__init_subclass__(**kwargs)
+
+        if cls.__dict__.get("type_name") is not None:
+            Slot._registered_types.setdefault(cls.type_name, cls)
+
     def __init__(
             self,
             name: Text,
@@ -102,6 +135,16 @@ class Slot:
 
         return self._as_feature()
 
+    def features(self) -> Sequence[float]:
+        """Returns the features of the slot like `as_feature`.
+
+        Slots of a `SlotTable` return a view of the features which were computed
+        when the value was set, other slots compute the features again.
+        """
+        if self._table is not None:
+            return self._table.features[self._table_slice]
+        return self.as_feature()
+
     def _as_feature(self) -> List[float]:
         raise NotImplementedError(
             "Each slot type needs to specify how its "
@@ -130,26 +173,83 @@ class Slot:
         """Sets the slot's value."""
         self._value = value
         self._has_been_set = True
+        if self._table is not None:
+            self._table.update_features(self)
 
     @property
     def has_been_set(self) -> bool:
         """Indicates if the slot's value has been set."""
         return self._has_been_set
 
+    def __copy__(self) -> "Slot":
+        """Copies the slot, the copy isn't part of the `SlotTable` of this slot."""
+        copied = self.__class__.__new__(self.__class__)
+        copied.__dict__.update(self.__dict__)
+        copied.__dict__.pop("_table", None)
+        copied.__dict__.pop("_table_slice", None)
+        return copied
+
     def __str__(self) -> Text:
         return f"{self.__class__.__name__}({self.name}: {self.value})"
 
     def __repr__(self) -> Text:
         return f"<{self.__class__.__name__}({self.name}: {self.value})>"
 
+    @staticmethod
+    def register_type(
+            slot_class: Type["Slot"], type_name: Optional[Text] = None
+    ) -> None:
+        """Registers a user-defined slot type.
+
+        Registered slot types can be referenced by their type name in the domain
+        without having to specify the module path of the slot class.
+
+        Args:
+            slot_class: The slot class to register.
+            type_name: The name to register the slot class under. Defaults to the
+                `type_name` of the slot class.
+
+        Raises:
+            InvalidSlotTypeException: If `slot_class` is not a `Slot`, if no type name
+                is given or if the type name is already taken by another slot class.
+        """
+        if not isinstance(slot_class, type) or not issubclass(slot_class, Slot):
+            raise InvalidSlotTypeException(
+                f"Failed to register slot type '{slot_class}'. Custom slot types "
+                f"need to inherit from '{Slot.__name__}'."
+            )
+
+        type_name = type_name or slot_class.type_name
+        if not type_name:
+            raise InvalidSlotTypeException(
+                f"Failed to register slot type '{slot_class.__name__}'. Please "
+                f"specify a type name for the slot type."
+            )
+
+        registered = Slot._registered_types.get(type_name)
+        if registered is not None and registered is not slot_class:
+            raise InvalidSlotTypeException(
+                f"Failed to register slot type '{slot_class.__name__}', the type name "
+                f"'{type_name}' is already used by '{registered.__name__}'."
+            )
+
+        Slot._registered_types[type_name] = slot_class
+
     @staticmethod
     def resolve_by_type(type_name) -> Type["Slot"]:
         """Returns a slots class by its type name."""
+        slot_class = Slot._registered_types.get(type_name)
+        if slot_class is not None:
+            return slot_class
+
         for cls in wechatter.shared.utils.common.all_subclasses(Slot):
             if cls.type_name == type_name:
+                Slot._registered_types[type_name] = cls
                 return cls
         try:
-            return wechatter.shared.utils.common.class_from_module_path(type_name)
+            slot_class = wechatter.shared.utils.common.class_from_module_path(
+                type_name
+            )
         except (ImportError, AttributeError):
             raise InvalidSlotTypeException(
                 f"Failed to find slot type, '{type_name}' is neither a known type nor "
@@ -158,6 +258,10 @@ class Slot:
                 f"You can find all build in types at {DOCS_URL_SLOTS}"
             )
 
+        # remember the module path so that the module isn't imported again
+        Slot._registered_types[type_name] = slot_class
+        return slot_class
+
     def persistence_info(self) -> Dict[str, Any]:
         return {
             "type": wechatter.shared.utils.common.module_path_from_instance(self),
@@ -167,7 +271,7 @@ class Slot:
         }
 
 
-class FloatSlot:
+class FloatSlot(Slot):
     """
     数字类型slot
     """
@@ -247,11 +351,32 @@ class BooleanSlot(Slot):
         return len(self.as_feature())
 
 
-class AnySlot:
-    """
+class AnySlot(Slot):
+    """Slot which can be used to store any value. Users need to create a subclass of
+    `Slot` in case the information is supposed to get featurized."""
 
-    """
-    pass
+    type_name = "any"
+
+    def __init__(
+            self,
+            name: Text,
+            initial_value: Any = None,
+            value_reset_delay: Optional[int] = None,
+            auto_fill: bool = True,
+            influence_conversation: bool = False,
+    ) -> None:
+        if influence_conversation:
+            raise ValueError(
+                f"An {AnySlot.__name__} cannot be featurized. "
+                f"Please use a different slot type for slot '{name}' instead. If you "
+                f"need to featurize a data type which is not supported out of the box, "
+                f"implement a custom slot type by subclassing '{Slot.__name__}'. "
+                f"See the documentation for more information: {DOCS_URL_SLOTS}"
+            )
+
+        super().__init__(
+            name, initial_value, value_reset_delay, auto_fill, influence_conversation
+        )
 
 
 class TextSlot(Slot):
@@ -287,6 +412,121 @@ class CategoricalSlot:
     """
 
 
+class SlotTable(dict):
+    """Maps slot names to slots and keeps their features in one contiguous array.
+
+    The features of a slot are computed once when its value is set and written to
+    the slot's slice of the array. Featurizing the slots then only reads the array
+    instead of creating the features of every slot again. The table can be used as
+    `slots` of a tracker.
+    """
+
+    def __init__(
+            self,
+            slots: Iterable[Slot],
+            offsets: Optional[Dict[Text, Tuple[int, int]]] = None,
+    ) -> None:
+        """Creates the table and attaches the slots to it.
+
+        Args:
+            slots: The slots. They keep their features in this table from now on.
+            offsets: Start and end of the features of every slot in the array, e.g.
+                `Domain.slot_feature_offsets`. Computed from the feature
+                dimensionality of the slots if not given.
+        """
+        super().__init__((slot.name, slot) for slot in slots)
+
+        if offsets is None:
+            offsets, start = {}, 0
+            for slot in self.values():
+                end = start + slot.feature_dimensionality()
+                offsets[slot.name] = (start, end)
+                start = end
+
+        self.features = np.zeros(
+            max((end for _, end in offsets.values()), default=0), dtype=np.float64
+        )
+        for slot in self.values():
+            if slot.name in offsets:
+                slot._table = self
+                slot._table_slice = slice(*offsets[slot.name])
+                self.update_features(slot)
+
+    @classmethod
+    def from_domain(cls, domain: "Domain") -> "SlotTable":
+        """Creates a table with copies of the domain's slots."""
+        return cls(
+            [copy.copy(slot) for slot in domain.slots], domain.slot_feature_offsets
+        )
+
+    def update_features(self, slot: Slot) -> None:
+        """Writes the features of a slot for its current value to the table.
+
+        A slot whose features don't fit its slice is removed from the table and
+        computes its features on demand from then on.
+        """
+        features = slot.as_feature()
+        table_slice = self.features[slot._table_slice]
+        if len(features) != len(table_slice):
+            logger.debug(
+                f"Slot '{slot.name}' created {len(features)} features, but "
+                f"{len(table_slice)} were expected. Its features aren't kept in "
+                f"the slot table anymore."
+            )
+            table_slice[:] = 0.0
+            slot._table = None
+            slot._table_slice = None
+            return
+        table_slice[:] = features
+
+    def sub_state(
+            self, omit_unset_slots: bool = False
+    ) -> Dict[Text, Union[Text, Tuple[float]]]:
+        """Returns the slots sub-state like `Domain._get_slots_sub_state`.
+
+        Args:
+            omit_unset_slots: If `True` do not include the initial values of slots.
+        """
+        slots, bounds = [], []
+        for slot_name, slot in self.items():
+            if slot is None or (omit_unset_slots and not slot.has_been_set):
+                continue
+            if slot._table is self:
+                if slot._table_slice.start == slot._table_slice.stop:
+                    continue
+                bounds.extend((slot._table_slice.start, slot._table_slice.stop))
+            slots.append((slot_name, slot))
+
+        # whether any of the features of every slot in the table isn't zero, the
+        # reduction runs over `[start, stop)` of every slot, the appended element
+        # allows a `stop` at the end of the array
+        is_non_zero = np.append(self.features != 0, False)
+        has_features = iter(
+            np.logical_or.reduceat(is_non_zero, bounds)[::2].tolist() if bounds else []
+        )
+
+        sub_state = {}
+        for slot_name, slot in slots:
+            if slot._table is self:
+                features = None
+                add_features = next(has_features)
+            else:
+                features = slot.as_feature()
+                if not features:
+                    continue
+                add_features = any(features)
+
+            if slot.value == wechatter.shared.dm.dm_config.SHOULD_NOT_BE_SET:
+                sub_state[slot_name] = wechatter.shared.dm.dm_config.SHOULD_NOT_BE_SET
+            elif add_features:
+                # only add slot if some of the features are not zero
+                if features is None:
+                    features = self.features[slot._table_slice].tolist()
+                sub_state[slot_name] = tuple(features)
+
+        return sub_state
+
+
 def bool_from_any(x: Any) -> bool:
     """ Converts bool/float/int/str to bool or raises error """
 
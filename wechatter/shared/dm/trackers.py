@@ -14,6 +14,7 @@
 """
 
 import abc
+import copy
 import json
 import logging
 import re
@@ -24,8 +25,10 @@ import time
 import uuid
 from dateutil import parser
 from datetime import datetime
+from collections import deque
 from typing import (
     List,
+    Deque,
     Dict,
     Text,
     Any,
@@ -33,6 +36,7 @@ from typing import (
     Optional,
     TYPE_CHECKING,
     Iterable,
+    Iterator,
     cast,
     Tuple,
 )
@@ -42,6 +46,8 @@ from typing import Union
 from enum import Enum
 
 from wechatter.shared.dialogue_config import DOCS_URL_TRAINING_DATA
+from wechatter.shared.dm import events
+from wechatter.shared.dm.conversation import Dialogue
 from wechatter.shared.dm.dm_config import (
     LOOP_NAME,
     EXTERNAL_MESSAGE_PREFIX,
@@ -52,6 +58,22 @@ from wechatter.shared.dm.dm_config import (
     ENTITY_LABEL_SEPARATOR,
     ACTION_SESSION_START_NAME,
     ACTION_LISTEN_NAME,
+    ACTIVE_LOOP,
+    FOLLOWUP_ACTION,
+    LOOP_REJECTED,
+    PREVIOUS_ACTION,
+    SHOULD_NOT_BE_SET,
+    TRIGGER_MESSAGE,
+)
+from wechatter.shared.dm.events import (
+    ActionExecuted,
+    ActionReverted,
+    BotUttered,
+    Event,
+    Restarted,
+    SessionStarted,
+    UserUttered,
+    UserUtteranceReverted,
 )
 from wechatter.shared.dm.slots import Slot
 from wechatter.shared.exceptions import UnsupportedFeatureException
@@ -68,6 +90,9 @@ from wechatter.shared.nlu.nlu_config import (
     ENTITY_ATTRIBUTE_GROUP,
 )
 
+if TYPE_CHECKING:
+    from wechatter.shared.dm.domain import Domain, State
+
 logger = logging.getLogger(__name__)
 
 
@@ -107,5 +132,615 @@ class AnySlotDict(dict):
 class DialogueStateTracker:
     """
     dst实现
+
+    Maintains the state of a conversation.
+
+    The field max_event_history will only give you these last events,
+    it can be set in the tracker_store.
+    """
+
+    @classmethod
+    def from_dict(
+            cls,
+            sender_id: Text,
+            events_as_dict: List[Dict[Text, Any]],
+            slots: Optional[Iterable[Slot]] = None,
+            max_event_history: Optional[int] = None,
+    ) -> "DialogueStateTracker":
+        """Create a tracker from dump.
+
+        The dump should be an array of dumped events. When restoring
+        the tracker, these events will be replayed to recreate the state."""
+        evts = events.deserialise_events(events_as_dict)
+
+        return cls.from_events(sender_id, evts, slots, max_event_history)
+
+    @classmethod
+    def from_events(
+            cls,
+            sender_id: Text,
+            evts: List[Event],
+            slots: Optional[Iterable[Slot]] = None,
+            max_event_history: Optional[int] = None,
+            sender_source: Optional[Text] = None,
+            domain: Optional["Domain"] = None,
+    ) -> "DialogueStateTracker":
+        """Creates tracker from existing events.
+
+        Args:
+            sender_id: The ID of the conversation.
+            evts: Existing events which should be applied to the new tracker.
+            slots: Slots which can be set.
+            max_event_history: Maximum number of events which should be stored.
+            sender_source: File source of the messages.
+            domain: The current model domain.
+
+        Returns:
+            Instantiated tracker with its state updated according to the given
+            events.
+        """
+        tracker = cls(sender_id, slots, max_event_history, sender_source)
+
+        for e in evts:
+            tracker.update(e, domain)
+
+        return tracker
+
+    def __init__(
+            self,
+            sender_id: Text,
+            slots: Optional[Iterable[Slot]],
+            max_event_history: Optional[int] = None,
+            sender_source: Optional[Text] = None,
+            is_rule_tracker: bool = False,
+    ) -> None:
+        """Initialize the tracker.
+
+        A set of events can be stored externally, and we will run through all
+        of them to get the current state. The tracker will represent all the
+        information we captured while processing messages of the dialogue."""
+
+        # maximum number of events to store
+        self._max_event_history = max_event_history
+        # list of previously seen events
+        self.events = self._create_events([])
+        # number of events which were added since the tracker was persisted the
+        # last time, see `TrackerStore.unpersisted_events`
+        self.number_of_unpersisted_events = 0
+        # id of the source of the messages
+        self.sender_id = sender_id
+        # slots that can be filled in this domain
+        if slots is not None:
+            self.slots = {slot.name: copy.copy(slot) for slot in slots}
+        else:
+            self.slots = AnySlotDict()
+        # file source of the messages
+        self.sender_source = sender_source
+        # whether the tracker belongs to a rule-based data
+        self.is_rule_tracker = is_rule_tracker
+
+        ###
+        # current state of the tracker - MUST be re-creatable by processing
+        # all the events. This only defines the attributes, values are set in
+        # `reset()`
+        ###
+        # if tracker is paused, no actions should be taken
+        self._paused = False
+        # A deterministically scheduled action to be executed next
+        self.followup_action: Optional[Text] = ACTION_LISTEN_NAME
+        self.latest_action: Optional[Dict[Text, Text]] = None
+        # Stores the most recent message sent by the user
+        self.latest_message: Optional[UserUttered] = None
+        self.latest_bot_utterance: Optional[BotUttered] = None
+        self.active_loop: Dict[Text, Union[Text, bool, Dict, None]] = {}
+        self._reset()
+
+    def current_state(
+            self, event_verbosity: EventVerbosity = EventVerbosity.NONE
+    ) -> Dict[Text, Any]:
+        """Returns the current tracker state as an object."""
+        _events = self._events_for_verbosity(event_verbosity)
+        if _events:
+            _events = [e.as_dict() for e in _events]
+        latest_event_time = None
+        if len(self.events) > 0:
+            latest_event_time = self.events[-1].timestamp
+
+        return {
+            "sender_id": self.sender_id,
+            "slots": self.current_slot_values(),
+            "latest_message": self._latest_message_data(),
+            "latest_event_time": latest_event_time,
+            FOLLOWUP_ACTION: self.followup_action,
+            "paused": self.is_paused(),
+            "events": _events,
+            "latest_input_channel": self.get_latest_input_channel(),
+            ACTIVE_LOOP: self.active_loop,
+            "latest_action": self.latest_action,
+            "latest_action_name": self.latest_action_name,
+        }
+
+    def _events_for_verbosity(
+            self, event_verbosity: EventVerbosity
+    ) -> Optional[List[Event]]:
+        if event_verbosity == EventVerbosity.ALL:
+            return list(self.events)
+        if event_verbosity == EventVerbosity.AFTER_RESTART:
+            return self.events_after_latest_restart()
+        if event_verbosity == EventVerbosity.APPLIED:
+            return self.applied_events()
+
+        return None
+
+    def _latest_message_data(self) -> Dict[Text, Any]:
+        parse_data_with_nlu_state = self.latest_message.parse_data.copy()
+        # Combine entities predicted by NLU with entities predicted by policies so that
+        # users can access them together via `latest_message` (e.g. in custom actions)
+        parse_data_with_nlu_state[ENTITIES] = self.latest_message.entities
+
+        return parse_data_with_nlu_state
+
+    def past_states(
+            self,
+            domain: "Domain",
+            omit_unset_slots: bool = False,
+            ignore_rule_only_turns: bool = False,
+            rule_only_data: Optional[Dict[Text, Any]] = None,
+    ) -> List["State"]:
+        """Generates the past states of this tracker based on the history.
+
+        Args:
+            domain: The Domain.
+            omit_unset_slots: If `True` do not include the initial values of slots.
+            ignore_rule_only_turns: If True ignore dialogue turns that are present
+                only in rules.
+            rule_only_data: Slots and loops,
+                which only occur in rules but not in stories.
+
+        Returns:
+            A list of states
+        """
+        return domain.states_for_tracker_history(
+            self,
+            omit_unset_slots=omit_unset_slots,
+            ignore_rule_only_turns=ignore_rule_only_turns,
+            rule_only_data=rule_only_data,
+        )
+
+    def change_loop_to(self, loop_name: Optional[Text]) -> None:
+        """Set the currently active loop.
+
+        Args:
+            loop_name: The name of loop which should be marked as active.
+        """
+        if loop_name is not None:
+            self.active_loop = {
+                LOOP_NAME: loop_name,
+                LOOP_INTERRUPTED: False,
+                LOOP_REJECTED: False,
+                TRIGGER_MESSAGE: self.latest_message.parse_data,
+            }
+        else:
+            self.active_loop = {}
+
+    def interrupt_loop(self, is_interrupted: bool) -> None:
+        """Interrupt loop and mark that we entered an unhappy path in the conversation.
+
+        Args:
+            is_interrupted: `True` if the loop was run after an unhappy path.
+        """
+        self.active_loop[LOOP_INTERRUPTED] = is_interrupted
+
+    def reject_action(self, action_name: Text) -> None:
+        """Notify active loop that it was rejected."""
+        if action_name == self.active_loop_name:
+            self.active_loop[LOOP_REJECTED] = True
+
+    def set_latest_action(self, action: Dict[Text, Text]) -> None:
+        """Sets latest action name or text.
+
+        Resets the loop rejection if the active loop is executed again.
+
+        Args:
+            action: Serialized action event.
+        """
+        self.latest_action = action
+        if self.active_loop_name and self.active_loop_name == action.get(ACTION_NAME):
+            self.active_loop[LOOP_REJECTED] = False
+
+    def current_slot_values(self) -> Dict[Text, Any]:
+        """Return the currently set values of the slots."""
+        return {key: slot.value for key, slot in self.slots.items()}
+
+    def get_slot(self, key: Text) -> Optional[Any]:
+        """Retrieves the value of a slot."""
+        if key in self.slots:
+            return self.slots[key].value
+        else:
+            logger.info(f"Tried to access non existent slot '{key}'")
+            return None
+
+    def get_latest_entity_values(
+            self,
+            entity_type: Text,
+            entity_role: Optional[Text] = None,
+            entity_group: Optional[Text] = None,
+    ) -> Iterator[Text]:
+        """Get entity values found for the passed entity type and optional role and
+        group in latest message.
+
+        If you are only interested in the first entity of a given type use
+        `next(tracker.get_latest_entity_values("my_entity_name"), None)`.
+        If no entity is found `None` is the default result.
+
+        Args:
+            entity_type: the entity type of interest
+            entity_role: optional entity role of interest
+            entity_group: optional entity group of interest
+
+        Returns:
+            Entity values.
+        """
+        if self.latest_message is None:
+            return iter([])
+
+        return (
+            x.get(ENTITY_ATTRIBUTE_VALUE)
+            for x in self.latest_message.entities
+            if x.get(ENTITY_ATTRIBUTE_TYPE) == entity_type
+            and x.get(ENTITY_ATTRIBUTE_GROUP) == entity_group
+            and x.get(ENTITY_ATTRIBUTE_ROLE) == entity_role
+        )
+
+    def get_latest_input_channel(self) -> Optional[Text]:
+        """Get the name of the input_channel of the latest UserUttered event."""
+        for e in reversed(self.events):
+            if isinstance(e, UserUttered):
+                return e.input_channel
+        return None
+
+    def is_paused(self) -> bool:
+        """State whether the tracker is currently paused."""
+        return self._paused
+
+    def idx_after_latest_restart(self) -> int:
+        """Return the idx of the most recent restart in the list of events.
+
+        If the conversation has not been restarted, ``0`` is returned.
+        """
+        for i, event in enumerate(reversed(self.events)):
+            if isinstance(event, Restarted):
+                return len(self.events) - i
+
+        return 0
+
+    def events_after_latest_restart(self) -> List[Event]:
+        """Return a list of events after the most recent restart."""
+        return list(self.events)[self.idx_after_latest_restart():]
+
+    def init_copy(self) -> "DialogueStateTracker":
+        """Creates a new state tracker with the same initial values."""
+        return DialogueStateTracker(
+            self.sender_id or "",
+            self.slots.values(),
+            self._max_event_history,
+            is_rule_tracker=self.is_rule_tracker,
+        )
+
+    def generate_all_prior_trackers(
+            self,
+    ) -> Iterator[Tuple["DialogueStateTracker", bool]]:
+        """Returns a generator of the previous trackers of this tracker.
+
+        Returns:
+            The tuple with the tracker before each action,
+            and the boolean flag representing whether this action should be hidden
+            in the dialogue history created for ML-based policies.
+        """
+        tracker = self.init_copy()
+
+        for event in self.applied_events():
+
+            if isinstance(event, ActionExecuted):
+                yield tracker, event.hide_rule_turn
+
+            tracker.update(event)
+
+        yield tracker, False
+
+    def applied_events(self) -> List[Event]:
+        """Returns all actions that should be applied - w/o reverted events.
+
+        Returns:
+            The events applied to the tracker.
+        """
+        applied_events = []
+
+        for event in self.events:
+            if isinstance(event, (Restarted, SessionStarted)):
+                applied_events = []
+            elif isinstance(event, ActionReverted):
+                self._undo_till_previous(ActionExecuted, applied_events)
+            elif isinstance(event, UserUtteranceReverted):
+                # Seeing a user uttered event automatically implies there was
+                # a listen event right before it, so we'll first rewind the
+                # user utterance, then get the action right before it (also removes
+                # the `action_listen` action right before it).
+                self._undo_till_previous(UserUttered, applied_events)
+                self._undo_till_previous(ActionExecuted, applied_events)
+            else:
+                applied_events.append(event)
+
+        return applied_events
+
+    @staticmethod
+    def _undo_till_previous(event_type: Type[Event], done_events: List[Event]) -> None:
+        """Removes events from `done_events`.
+
+        Removes events from `done_events` until the first occurrence `event_type`
+        is found which is also removed.
+        """
+        # list gets modified - hence we need to copy events!
+        for e in reversed(done_events[:]):
+            del done_events[-1]
+            if isinstance(e, event_type):
+                break
+
+    def replay_events(self) -> None:
+        """Update the tracker based on a list of events."""
+        applied_events = self.applied_events()
+        for event in applied_events:
+            event.apply_to(self)
+
+    def recreate_from_dialogue(self, dialogue: Dialogue) -> None:
+        """Use a serialised `Dialogue` to update the trackers state.
+
+        This uses the state as is persisted in a ``TrackerStore``. If the
+        tracker is blank before calling this method, the final state will be
+        identical to the tracker from which the dialogue was created.
+        """
+        if not isinstance(dialogue, Dialogue):
+            raise ValueError(
+                f"story {dialogue} is not of type Dialogue. "
+                f"Have you deserialized it?"
+            )
+
+        self._reset()
+        self.events.extend(dialogue.events)
+        self.number_of_unpersisted_events += len(dialogue.events)
+        self.replay_events()
+
+    def copy(self) -> "DialogueStateTracker":
+        """Creates a duplicate of this tracker"""
+        return self.travel_back_in_time(float("inf"))
+
+    def travel_back_in_time(self, target_time: float) -> "DialogueStateTracker":
+        """Creates a new tracker with a state at a specific timestamp.
+
+        A new tracker will be created and all events previous to the
+        passed time stamp will be replayed. Events that occur exactly
+        at the target time will be included."""
+        tracker = self.init_copy()
+
+        for event in self.events:
+            if event.timestamp <= target_time:
+                tracker.update(event)
+            else:
+                break
+
+        return tracker  # yields the final state
+
+    def as_dialogue(self) -> Dialogue:
+        """Return a ``Dialogue`` object containing all of the turns.
+
+        This can be serialised and later used to recover the state
+        of this tracker exactly."""
+        return Dialogue(self.sender_id, list(self.events))
+
+    def update(self, event: Event, domain: Optional["Domain"] = None) -> None:
+        """Modify the state of the tracker according to an ``Event``."""
+        if not isinstance(event, Event):  # pragma: no cover
+            raise ValueError("event to log must be an instance of a subclass of Event.")
+
+        self.events.append(event)
+        self.number_of_unpersisted_events += 1
+        event.apply_to(self)
+
+        if domain and isinstance(event, UserUttered):
+            # store all entities as slots
+            for e in domain.slots_for_entities(event.parse_data[ENTITIES]):
+                self.update(e)
+
+    def mark_as_persisted(self) -> None:
+        """Marks all events of the tracker as persisted.
+
+        Tracker stores call this once they saved or retrieved the tracker.
+        """
+        self.number_of_unpersisted_events = 0
+
+    def update_with_events(
+            self,
+            new_events: List[Event],
+            domain: Optional["Domain"],
+            override_timestamp: bool = True,
+    ) -> None:
+        """Adds multiple events to the tracker.
+
+        Args:
+            new_events: Events to apply.
+            domain: The current model's domain.
+            override_timestamp: If `True` refresh all timestamps of the events. As the
+                events are usually created at some earlier point, this makes sure that
+                all new events come after any current tracker events.
+        """
+        if override_timestamp:
+            for e in new_events:
+                e.timestamp = time.time()
+
+        for e in new_events:
+            self.update(e, domain)
+
+    def export_stories_to_file(self, export_path: Text = "debug_stories.yml") -> None:
+        """Dump the tracker as a story to a file."""
+        raise UnsupportedFeatureException(
+            f"Exporting the stories of conversation ID '{self.sender_id}' to "
+            f"'{export_path}' is not supported, there is no story writer yet."
+        )
+
+    def get_last_event_for(
+            self,
+            event_type: Type[Event],
+            action_names_to_exclude: List[Text] = None,
+            skip: int = 0,
+            event_verbosity: EventVerbosity = EventVerbosity.APPLIED,
+    ) -> Optional[Event]:
+        """Gets the last event of a given type which was actually applied.
+
+        Args:
+            event_type: The type of event you want to find.
+            action_names_to_exclude: Events of type `ActionExecuted` which
+                should be excluded from the results. Can be used to skip
+                `action_listen` events.
+            skip: Skips n possible results before return an event.
+            event_verbosity: Which `EventVerbosity` should be used to search for events.
+
+        Returns:
+            event which matched the query or `None` if no event matched.
+        """
+        to_exclude = action_names_to_exclude or []
+
+        def filter_function(e: Event) -> bool:
+            has_instance = isinstance(e, event_type)
+            excluded = isinstance(e, ActionExecuted) and e.action_name in to_exclude
+            return has_instance and not excluded
+
+        filtered = filter(
+            filter_function, reversed(self._events_for_verbosity(event_verbosity) or [])
+        )
+        for _ in range(skip):
+            next(filtered, None)
+
+        return next(filtered, None)
+
+    def last_executed_action_has(self, name: Text, skip: int = 0) -> bool:
+        """Returns whether last `ActionExecuted` event had a specific name.
+
+        Args:
+            name: Name of the event which should be matched.
+            skip: Skips n possible results in between.
+
+        Returns:
+            `True` if last executed action had name `name`, otherwise `False`.
+        """
+        last: Optional[ActionExecuted] = self.get_last_event_for(
+            ActionExecuted, action_names_to_exclude=[ACTION_LISTEN_NAME], skip=skip
+        )
+        return last is not None and last.action_name == name
+
+    ###
+    # Internal methods for the modification of the trackers state. Should
+    # only be called by events, not directly. Rather update the tracker
+    # with an event that in its ``apply_to`` method modifies the tracker.
+    ###
+    def _reset(self) -> None:
+        """Reset tracker to initial state - doesn't delete events though!."""
+        self._reset_slots()
+        self._paused = False
+        self.latest_action = {}
+        self.latest_message = UserUttered.empty()
+        self.latest_bot_utterance = BotUttered.empty()
+        self.followup_action = ACTION_LISTEN_NAME
+        self.active_loop = {}
+
+    def _reset_slots(self) -> None:
+        """Set all the slots to their initial value."""
+        for slot in self.slots.values():
+            slot.reset()
+
+    def _set_slot(self, key: Text, value: Any) -> None:
+        """Set the value of a slot if that slot exists."""
+        if key in self.slots:
+            slot = self.slots[key]
+            slot.value = value
+        else:
+            logger.error(
+                f"Tried to set non existent slot '{key}'. Make sure you "
+                f"added all your slots to your domain file."
+            )
+
+    def _create_events(self, evts: List[Event]) -> Deque[Event]:
+        if evts and not isinstance(evts[0], Event):  # pragma: no cover
+            raise ValueError("events, if given, must be a list of events")
+        return deque(evts, self._max_event_history)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(self, type(other)):
+            return other.events == self.events and self.sender_id == other.sender_id
+        else:
+            return False
+
+    def __ne__(self, other: Any) -> bool:
+        return not self.__eq__(other)
+
+    def trigger_followup_action(self, action: Text) -> None:
+        """Triggers another action following the execution of the current."""
+        self.followup_action = action
+
+    def clear_followup_action(self) -> None:
+        """Clears follow up action when it was executed."""
+        self.followup_action = None
+
+    @property
+    def active_loop_name(self) -> Optional[Text]:
+        """Get the name of the currently active loop.
+
+        Returns: `None` if no active loop or the name of the currently active loop.
+        """
+        if not self.active_loop or self.active_loop.get(LOOP_NAME) == SHOULD_NOT_BE_SET:
+            return None
+
+        return self.active_loop.get(LOOP_NAME)
+
+    @property
+    def latest_action_name(self) -> Optional[Text]:
+        """Get the name of the previously executed action or text of e2e action.
+
+        Returns: name of the previously executed action or text of e2e action
+        """
+        if not self.latest_action:
+            return None
+
+        return self.latest_action.get(ACTION_NAME) or self.latest_action.get(
+            ACTION_TEXT
+        )
+
+
+def get_active_loop_name(state: "State") -> Optional[Text]:
+    """Get the name of current active loop.
+
+    Args:
+        state: The state from which the name of active loop should be extracted
+
+    Return:
+        the name of active loop or None
     """
+    if (
+            not state.get(ACTIVE_LOOP)
+            or state[ACTIVE_LOOP].get(LOOP_NAME) == SHOULD_NOT_BE_SET
+    ):
+        return None
+
+    return state[ACTIVE_LOOP].get(LOOP_NAME)
+
 
+def is_prev_action_listen_in_state(state: "State") -> bool:
+    """Check if action_listen is the previous executed action.
+
+    Args:
+        state: The state for which the check should be performed
+
+    Return:
+        boolean value indicating whether action_listen is previous action
+    """
+    prev_action_name = state.get(PREVIOUS_ACTION, {}).get(ACTION_NAME)
+    return prev_action_name == ACTION_LISTEN_NAME
@@ -13,12 +13,16 @@
  
 """
 
+import copy
 import json
 import logging
 import re
+import unicodedata
 from json.decoder import JSONDecodeError
 from typing import Text, Optional, Dict, Any, Union, List, Tuple
 
+from wechatter.shared.nlu.parse_cache import InMemoryParseCache, ParseCache
+
 logger = logging.getLogger(__name__)
 
 class NatureLanguageInterpreter:
@@ -26,12 +30,111 @@ class NatureLanguageInterpreter:
         self,
         text: Text,
         message_id: Optional[Text] = None,
-        tracker: Optional[DialogueStateTracker] = None,
+        tracker: Optional["DialogueStateTracker"] = None,
         metadata: Optional[Dict] = None,
     ) -> Dict[Text, Any]:
         raise NotImplementedError(
             "Interpreter needs to be able to parse messages into structured output."
         )
 
-    def featurize_message(self, message: Message) -> Optional[Message]:
+    def featurize_message(self, message: "Message") -> Optional["Message"]:
         pass
+
+
+class CachingInterpreter(NatureLanguageInterpreter):
+    """Caches the parse results of another interpreter.
+
+    Parse results are cached by the normalized message text and the fingerprint of
+    the model which parsed it, so results of an old model are never returned once
+    a new model was loaded. The wrapped interpreter must not use the `tracker` to
+    parse messages.
+    """
+
+    def __init__(
+        self,
+        interpreter: NatureLanguageInterpreter,
+        model_fingerprint: Optional[Text] = None,
+        cache: Optional[ParseCache] = None,
+    ) -> None:
+        """Creates the interpreter.
+
+        Args:
+            interpreter: The interpreter which parses messages on cache misses.
+            model_fingerprint: Fingerprint of the model used by `interpreter`.
+            cache: Where parse results are cached. Pass a shared cache (e.g.
+                `SQLiteParseCache`) to share the results between server workers.
+        """
+        self.interpreter = interpreter
+        self.model_fingerprint = model_fingerprint or ""
+        self.cache = cache if cache is not None else InMemoryParseCache()
+        self.hits = 0
+        self.misses = 0
+
+    def update_model(
+        self, interpreter: NatureLanguageInterpreter, model_fingerprint: Optional[Text]
+    ) -> None:
+        """Switches to the interpreter of a newly loaded model.
+
+        Cached results of the previous model are not used anymore since the model
+        fingerprint is part of the cache key.
+        """
+        self.interpreter = interpreter
+        self.model_fingerprint = model_fingerprint or ""
+        if isinstance(self.cache, InMemoryParseCache):
+            # the cache isn't shared with other workers, drop the stale results
+            self.cache.clear()
+
+    @staticmethod
+    def normalize_text(text: Text) -> Text:
+        """Normalizes texts which should share a parse result.
+
+        Full- and half-width characters are unified, surrounding whitespace is
+        removed and inner whitespace is collapsed.
+        """
+        return " ".join(unicodedata.normalize("NFKC", text).split())
+
+    def cache_key(self, text: Text) -> Text:
+        return f"{self.model_fingerprint}:{self.normalize_text(text)}"
+
+    async def parse(
+        self,
+        text: Text,
+        message_id: Optional[Text] = None,
+        tracker: Optional["DialogueStateTracker"] = None,
+        metadata: Optional[Dict] = None,
+    ) -> Dict[Text, Any]:
+        """Returns the cached parse result or parses the message on a cache miss."""
+        key = self.cache_key(text or "")
+        parse_data = self.cache.get(key)
+        if parse_data is None:
+            self.misses += 1
+            parse_data = await self.interpreter.parse(
+                text, message_id, tracker, metadata
+            )
+            self.cache.set(key, copy.deepcopy(parse_data))
+            return parse_data
+
+        self.hits += 1
+        # parse results are mutated further down the pipeline and the text of the
+        # cached result might differ in whitespace from this message
+        parse_data = copy.deepcopy(parse_data)
+        if "text" in parse_data:
+            parse_data["text"] = text
+        if "message_id" in parse_data:
+            parse_data["message_id"] = message_id
+        return parse_data
+
+    def featurize_message(self, message: "Message") -> Optional["Message"]:
+        return self.interpreter.featurize_message(message)
+
+    def cache_info(self) -> Dict[Text, Any]:
+        """Returns statistics about the cache usage for monitoring."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.cache.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "size": len(self.cache),
+            "max_size": self.cache.max_size,
+        }
@@ -54,3 +54,9 @@ NO_ENTITY_TAG = "O"
 SPLIT_ENTITIES_BY_COMMA = "split_entities_by_comma"
 SPLIT_ENTITIES_BY_COMMA_DEFAULT_VALUE = True
 SINGLE_ENTITY_ALLOWED_INTERLEAVING_CHARSET = {".", ",", " ", ";"}
+
+# number of parse results which are kept by the parse cache
+DEFAULT_PARSE_CACHE_SIZE = 10000
+
+# seconds after which a cached parse result expires, `None` to never expire
+DEFAULT_PARSE_CACHE_TTL = 3600
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Author  :   Xu
+
+@Software:   PyCharm
+
+@File    :   parse_cache.py
+
+@Time    :   2021/4/21 10:12 上午
+
+@Desc    :   nlu解析结果的缓存
+
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Text, Tuple
+
+from wechatter.shared.nlu.nlu_config import (
+    DEFAULT_PARSE_CACHE_SIZE,
+    DEFAULT_PARSE_CACHE_TTL,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ParseCache:
+    """Stores parse results by cache key."""
+
+    def __init__(
+            self,
+            max_size: int = DEFAULT_PARSE_CACHE_SIZE,
+            ttl: Optional[float] = DEFAULT_PARSE_CACHE_TTL,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = 0
+
+    def get(self, key: Text) -> Optional[Dict[Text, Any]]:
+        """Returns the cached parse result or `None` if there is none."""
+        raise NotImplementedError()
+
+    def set(self, key: Text, parse_data: Dict[Text, Any]) -> None:
+        """Caches a parse result."""
+        raise NotImplementedError()
+
+    def clear(self) -> None:
+        """Removes all cached parse results."""
+        raise NotImplementedError()
+
+    def __len__(self) -> int:
+        raise NotImplementedError()
+
+
+class InMemoryParseCache(ParseCache):
+    """Caches parse results of a single process with LRU / TTL eviction."""
+
+    def __init__(
+            self,
+            max_size: int = DEFAULT_PARSE_CACHE_SIZE,
+            ttl: Optional[float] = DEFAULT_PARSE_CACHE_TTL,
+    ) -> None:
+        super().__init__(max_size, ttl)
+        self._cache: "OrderedDict[Text, Tuple[Dict[Text, Any], float]]" = OrderedDict()
+
+    def get(self, key: Text) -> Optional[Dict[Text, Any]]:
+        cached = self._cache.get(key)
+        if cached is None:
+            return None
+
+        parse_data, cached_at = cached
+        if self.ttl is not None and time.monotonic() - cached_at > self.ttl:
+            del self._cache[key]
+            return None
+
+        self._cache.move_to_end(key)
+        return parse_data
+
+    def set(self, key: Text, parse_data: Dict[Text, Any]) -> None:
+        self._cache[key] = (parse_data, time.monotonic())
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+class SQLiteParseCache(ParseCache):
+    """Caches parse results in a local SQLite file.
+
+    The file can be shared by all server workers on the same machine, so that a
+    message which was parsed by one worker is a cache hit for all the others.
+    Once the cache is full the oldest entries are removed.
+
+    Every process opens its own connection on first use, as SQLite connections
+    must not be used across `fork`.
+    """
+
+    def __init__(
+            self,
+            path: Text,
+            max_size: int = DEFAULT_PARSE_CACHE_SIZE,
+            ttl: Optional[float] = DEFAULT_PARSE_CACHE_TTL,
+    ) -> None:
+        super().__init__(max_size, ttl)
+        self.path = path
+        # entries are only trimmed every so many writes to keep writes cheap
+        self._trim_interval = max(1, max_size // 10)
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        self._pid: Optional[int] = None
+        self._process_connection: Optional[sqlite3.Connection] = None
+        # connections of the parent process, which are neither used nor closed
+        self._inherited_connections: List[sqlite3.Connection] = []
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        if self._pid == os.getpid():
+            return self._process_connection
+
+        if self._process_connection is not None:
+            self._inherited_connections.append(self._process_connection)
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        connection = sqlite3.connect(
+            self.path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS parse_cache ("
+            "key TEXT PRIMARY KEY, parse_data TEXT NOT NULL, cached_at REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS parse_cache_cached_at "
+            "ON parse_cache (cached_at)"
+        )
+
+        self._process_connection = connection
+        self._pid = os.getpid()
+        return connection
+
+    def get(self, key: Text) -> Optional[Dict[Text, Any]]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT parse_data, cached_at FROM parse_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        serialised, cached_at = row
+        if self.ttl is not None and time.time() - cached_at > self.ttl:
+            return None
+
+        return json.loads(serialised)
+
+    def set(self, key: Text, parse_data: Dict[Text, Any]) -> None:
+        try:
+            serialised = json.dumps(parse_data, ensure_ascii=False)
+        except (TypeError, ValueError):
+            logger.debug(f"Parse result for cache key '{key}' is not serialisable.")
+            return
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO parse_cache (key, parse_data, cached_at) "
+                "VALUES (?, ?, ?)",
+                (key, serialised, time.time()),
+            )
+            self._writes += 1
+            if self._writes % self._trim_interval == 0:
+                self._trim()
+
+    def _trim(self) -> None:
+        if self.ttl is not None:
+            cursor = self._connection.execute(
+                "DELETE FROM parse_cache WHERE cached_at < ?", (time.time() - self.ttl,)
+            )
+            self.evictions += max(cursor.rowcount, 0)
+
+        cursor = self._connection.execute(
+            "DELETE FROM parse_cache WHERE key IN (SELECT key FROM parse_cache "
+            "ORDER BY cached_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_size,),
+        )
+        self.evictions += max(cursor.rowcount, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM parse_cache")
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._connection.execute(
+                "SELECT COUNT(*) FROM parse_cache"
+            ).fetchone()
+        return count
+
+    def close(self) -> None:
+        """Closes the connection of this process to the cache file."""
+        if self._pid == os.getpid():
+            self._process_connection.close()
+        self._process_connection = None
+        self._pid = None
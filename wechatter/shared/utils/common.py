@@ -20,8 +20,8 @@ import inspect
 import logging
 from typing import Text, Dict, Optional, Any, List, Callable, Collection
 
-import rasa.shared.utils.io
-from rasa.shared.constants import NEXT_MAJOR_VERSION_FOR_DEPRECATIONS
+import wechatter.shared.utils.io
+from wechatter.shared.dialogue_config import NEXT_MAJOR_VERSION_FOR_DEPRECATIONS
 
 
 logger = logging.getLogger(__name__)
@@ -60,7 +60,7 @@ def class_from_module_path(
         raise ImportError(f"Cannot retrieve class from path {module_path}.")
 
     if not inspect.isclass(klass):
-        rasa.shared.utils.io.raise_deprecation_warning(
+        wechatter.shared.utils.io.raise_deprecation_warning(
             f"`class_from_module_path()` is expected to return a class, "
             f"but {module_path} is not one. "
             f"This warning will be converted "
@@ -15,16 +15,18 @@
 from collections import OrderedDict
 import errno
 import glob
-from hashlib import md5
+from hashlib import blake2b, md5
 from io import StringIO
 import json
 import os
 from pathlib import Path
 import re
+import threading
 from typing import Any, Dict, List, Optional, Text, Type, Union, FrozenSet
 import warnings
 from ruamel import yaml
 
+from wechatter.shared.dialogue_config import NEXT_MAJOR_VERSION_FOR_DEPRECATIONS
 from wechatter.shared.exceptions import (
     FileIOException,
     FileNotFoundException,
@@ -34,6 +36,73 @@ from wechatter.shared.exceptions import (
 DEFAULT_ENCODING = 'utf-8'  # 默认用utf-8，打开文件时用
 
 
+def raise_warning(
+    message: Text,
+    category: Optional[Type[Warning]] = None,
+    docs: Optional[Text] = None,
+    **kwargs: Any,
+) -> None:
+    """Emit a `warnings.warn` with sensible defaults and a colored warning msg."""
+    original_formatter = warnings.formatwarning
+
+    def should_show_source_line() -> bool:
+        if "stacklevel" not in kwargs:
+            if category == UserWarning or category is None:
+                return False
+            if category == FutureWarning:
+                return False
+        return True
+
+    def formatwarning(
+        message: Text,
+        category: Optional[Type[Warning]],
+        filename: Text,
+        lineno: Optional[int],
+        line: Optional[Text] = None,
+    ) -> Text:
+        """Function to format a warning the standard way."""
+        if not should_show_source_line():
+            if docs:
+                line = f"More info at {docs}"
+            else:
+                line = ""
+
+        return original_formatter(message, category, filename, lineno, line)
+
+    warnings.formatwarning = formatwarning
+    if "stacklevel" not in kwargs:
+        # try to set useful defaults for the most common warning categories
+        if category == UserWarning:
+            kwargs["stacklevel"] = 2
+        elif category in (DeprecationWarning, FutureWarning):
+            kwargs["stacklevel"] = 3
+
+    warnings.warn(message, category=category, **kwargs)
+    warnings.formatwarning = original_formatter
+
+
+def raise_deprecation_warning(
+    message: Text,
+    warn_until_version: Text = NEXT_MAJOR_VERSION_FOR_DEPRECATIONS,
+    docs: Optional[Text] = None,
+    **kwargs: Any,
+) -> None:
+    """
+    Thin wrapper around `raise_warning()` to raise a deprecation warning. It requires
+    a version until which we'll warn, and after which the support for the feature will
+    be removed.
+    """
+    if warn_until_version not in message:
+        message = f"{message} (will be removed in {warn_until_version})"
+
+    # need the correct stacklevel now
+    kwargs.setdefault("stacklevel", 3)
+    # we're raising a `FutureWarning` instead of a `DeprecationWarning` because
+    # we want these warnings to be visible in the terminal of our users
+    # https://docs.python.org/3/library/warnings.html#warning-categories
+    raise_warning(message, FutureWarning, docs, **kwargs)
+
+
 def read_file(filename: Union[Text, Path], encoding: Text = DEFAULT_ENCODING) -> Any:
     """Read text from a file."""
 
@@ -65,8 +134,9 @@ def read_yaml(content: Text, reader_type: Union[Text, List[Text]] = "safe") -> A
     Raises:
         ruamel.yaml.parser.ParserError: If there was an error when parsing the YAML.
     """
-    if _is_ascii(content):
-        # Required to make sure emojis are correctly parsed
+    if "\\" in content and _is_ascii(content):
+        # Required to make sure emojis are correctly parsed. Without backslashes
+        # there are no escape sequences and the conversion wouldn't change anything.
         content = (
             content.encode("utf-8")
                 .decode("raw_unicode_escape")
@@ -74,17 +144,59 @@ def read_yaml(content: Text, reader_type: Union[Text, List[Text]] = "safe") -> A
                 .decode("utf-16")
         )
 
-    yaml_parser = yaml.YAML(typ=reader_type)
-    # yaml_parser.version = YAML_VERSION
-    yaml_parser.preserve_quotes = True
+    return _yaml_parser(reader_type).load(content) or {}
 
-    return yaml_parser.load(content) or {}
+
+# parsers are reused across calls, they aren't thread-safe though, hence every
+# thread has its own parsers
+_yaml_parsers = threading.local()
+
+
+def _yaml_parser(reader_type: Union[Text, List[Text]]) -> yaml.YAML:
+    key = tuple(reader_type) if isinstance(reader_type, list) else reader_type
+    parsers = _yaml_parsers.__dict__.setdefault("parsers", {})
+    if key not in parsers:
+        # `pure=False` prefers the libyaml based parser of `ruamel.yaml.clib` and
+        # falls back to the python parser if it isn't installed
+        yaml_parser = yaml.YAML(typ=reader_type, pure=False)
+        # yaml_parser.version = YAML_VERSION
+        yaml_parser.preserve_quotes = True
+        parsers[key] = yaml_parser
+    return parsers[key]
 
 
 def _is_ascii(text: Text) -> bool:
+    if hasattr(text, "isascii"):
+        # python 3.7+, the check is done in C
+        return text.isascii()
     return all(ord(character) < 128 for character in text)
 
 
+def read_yaml_file(filename: Union[Text, Path]) -> Union[List[Any], Dict[Text, Any]]:
+    """
+    Parses a yaml file.
+
+    Raises:
+        YamlSyntaxException: If the content of the file can not be parsed as YAML.
+    """
+    return parse_yaml_file_content(read_file(filename, DEFAULT_ENCODING), filename)
+
+
+def parse_yaml_file_content(
+    content: Text, filename: Optional[Union[Text, Path]] = None
+) -> Union[List[Any], Dict[Text, Any]]:
+    """
+    Parses the content of a yaml file which was read already.
+
+    Raises:
+        YamlSyntaxException: If the content can not be parsed as YAML.
+    """
+    try:
+        return read_yaml(content)
+    except yaml.YAMLError as e:
+        raise YamlSyntaxException(filename, e)
+
+
 def write_text_file(
     content: Text,
     file_path: Union[Text, Path],
@@ -102,4 +214,81 @@ def write_text_file(
     """
     mode = "a" if append else "w"
     with open(file_path, mode, encoding=encoding) as file:
-        file.write(content)
\ No newline at end of file
+        file.write(content)
+
+
+def read_json_file(filename: Union[Text, Path]) -> Any:
+    """Read json from a file."""
+    content = read_file(filename)
+    try:
+        return json.loads(content)
+    except ValueError as e:
+        raise FileIOException(
+            f"Failed to read json from '{os.path.abspath(filename)}'. Error: {e}"
+        )
+
+
+def json_to_string(obj: Any, **kwargs: Any) -> Text:
+    """Dumps a JSON-serializable object to string."""
+    indent = kwargs.pop("indent", 2)
+    ensure_ascii = kwargs.pop("ensure_ascii", False)
+    return json.dumps(obj, indent=indent, ensure_ascii=ensure_ascii, **kwargs)
+
+
+def dump_obj_as_json_to_file(filename: Union[Text, Path], obj: Any) -> None:
+    """Dump an object as a json string to a file."""
+    write_text_file(json_to_string(obj), filename)
+
+
+def get_text_hash(text: Text, encoding: Text = DEFAULT_ENCODING) -> Text:
+    """Calculate the md5 hash for a text."""
+    return md5(text.encode(encoding)).hexdigest()
+
+
+def get_dictionary_fingerprint(
+    dictionary: Dict[Text, Any], encoding: Text = DEFAULT_ENCODING
+) -> Text:
+    """Calculate the fingerprint for a dictionary.
+
+    The dictionary can contain any keys and values which are either a dict,
+    a list or a elementary Python datatype.
+    """
+    stringified_dict = json_to_string(dictionary, sort_keys=True)
+    return get_text_hash(stringified_dict, encoding)
+
+
+def get_list_fingerprint(
+    elements: List[Any], encoding: Text = DEFAULT_ENCODING
+) -> Text:
+    """Calculate a fingerprint for an unordered list."""
+    stringified = json.dumps(elements, sort_keys=True, ensure_ascii=False)
+    return get_text_hash(stringified, encoding)
+
+
+def deep_container_fingerprint(
+    obj: Union[List[Any], Dict[Any, Any], Any], encoding: Text = DEFAULT_ENCODING
+) -> Text:
+    """Calculate a hash which is stable across python runs.
+
+    Works for lists and dictionaries. For keys and values, we recursively call
+    `hash(...)` on them. Keep in mind that a list with keys in a different order
+    will create the same hash!
+    """
+    if isinstance(obj, dict):
+        return get_dictionary_fingerprint(obj, encoding)
+    if isinstance(obj, list):
+        return get_list_fingerprint(obj, encoding)
+    else:
+        return get_text_hash(str(obj), encoding)
+
+
+def get_dictionary_digest(dictionary: Dict[Text, Any]) -> bytes:
+    """Calculate a compact binary fingerprint for a dictionary.
+
+    Faster than `get_dictionary_fingerprint`, the dictionary is dumped without
+    indentation and hashed with BLAKE2b. The result is stable across python runs.
+    """
+    stringified_dict = json.dumps(
+        dictionary, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return blake2b(stringified_dict.encode(DEFAULT_ENCODING), digest_size=16).digest()
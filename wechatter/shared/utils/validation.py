@@ -9,6 +9,179 @@
  
 @Time    :   2021/4/8 6:04 下午
  
-@Desc    :
+@Desc    :   训练数据的格式和版本校验
  
 """
+
+import logging
+import os
+from typing import Any, Dict, Optional, Text
+
+from packaging import version
+from ruamel.yaml import YAMLError
+
+import wechatter.shared.utils.io
+from wechatter.shared.dialogue_config import (
+    DOCS_URL_TRAINING_DATA,
+    LATEST_TRAINING_DATA_FORMAT_VERSION,
+)
+from wechatter.shared.exceptions import YamlException
+
+logger = logging.getLogger(__name__)
+
+KEY_TRAINING_DATA_FORMAT_VERSION = "version"
+
+
+class YamlValidationException(YamlException, ValueError):
+    """Raised if a yaml file does not correspond to the expected schema."""
+
+    def __init__(self, message: Text, filename: Optional[Text] = None) -> None:
+        """Create exception.
+
+        Args:
+            message: message explaining what went wrong
+            filename: optional file the error occurred in
+        """
+        super().__init__(filename)
+        self.message = message
+
+    def __str__(self) -> Text:
+        if self.filename:
+            return f"Failed to validate '{self.filename}'. {self.message}"
+        return f"Failed to validate YAML. {self.message}"
+
+
+def validate_yaml_schema(yaml_file_content: Text, schema_path: Text) -> None:
+    """
+    Validate yaml content.
+
+    The content is validated against the schema at `schema_path` (relative to the
+    `wechatter` package) with `pykwalify`. The validation is skipped if `pykwalify`
+    isn't installed or the schema isn't part of the package, the content is then
+    only parsed by the caller.
+
+    Args:
+        yaml_file_content: the content of the yaml file to be validated
+        schema_path: the schema of the yaml file
+    """
+    schema_file = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))), schema_path
+    )
+    try:
+        from pykwalify.core import Core
+        from pykwalify.errors import SchemaError
+    except ImportError:
+        logger.debug(
+            f"Skipping the validation against '{schema_path}' as 'pykwalify' is not "
+            f"installed."
+        )
+        return
+
+    if not os.path.isfile(schema_file):
+        logger.debug(f"Skipping the validation as '{schema_path}' does not exist.")
+        return
+
+    # pykwalify logs every schema violation with level ERROR
+    logging.getLogger("pykwalify").setLevel(logging.CRITICAL)
+
+    try:
+        source_data = wechatter.shared.utils.io.read_yaml(
+            yaml_file_content, reader_type=["safe", "rt"]
+        )
+    except YAMLError:
+        raise YamlValidationException(
+            "The provided yaml file is invalid. You can use "
+            "http://www.yamllint.com/ to validate the yaml syntax "
+            "of your file."
+        )
+
+    schema_data = wechatter.shared.utils.io.read_yaml_file(schema_file)
+    core = Core(source_data=source_data, schema_data=schema_data)
+    try:
+        core.validate(raise_exception=True)
+    except SchemaError as e:
+        raise YamlValidationException(
+            f"Please make sure the file is correct and all mandatory parameters "
+            f"are specified. {e}"
+        )
+
+
+def validate_training_data_format_version(
+    yaml_file_content: Dict[Text, Any], filename: Optional[Text]
+) -> bool:
+    """Validates version on the training data content using `version` field
+       and warns users if the file is not compatible with the current version of
+       Rasa Open Source.
+
+    Args:
+        yaml_file_content: Raw content of training data file as a dictionary.
+        filename: Name of the validated file.
+
+    Returns:
+        `True` if the file can be processed by current version of Rasa Open Source,
+        `False` otherwise.
+    """
+    if filename:
+        filename = os.path.abspath(filename)
+
+    if not isinstance(yaml_file_content, dict):
+        raise YamlValidationException(
+            "The training data needs to be formatted as a YAML dictionary.", filename
+        )
+
+    version_value = yaml_file_content.get(KEY_TRAINING_DATA_FORMAT_VERSION)
+
+    if not version_value:
+        # not raising here since it's not critical
+        logger.info(
+            f"The '{KEY_TRAINING_DATA_FORMAT_VERSION}' key is missing in "
+            f"the training data file {filename}. "
+            f"Rasa Open Source will read the file as a "
+            f"version '{LATEST_TRAINING_DATA_FORMAT_VERSION}' file. "
+            f"See {DOCS_URL_TRAINING_DATA}."
+        )
+        return True
+
+    try:
+        if isinstance(version_value, str):
+            version_value = version_value.strip("\"'")
+        parsed_version = version.parse(version_value)
+        latest_version = version.parse(LATEST_TRAINING_DATA_FORMAT_VERSION)
+
+        if parsed_version < latest_version:
+            wechatter.shared.utils.io.raise_warning(
+                f"Training data file {filename} has a lower "
+                f"format version than your Rasa Open Source installation: "
+                f"{version_value} < {LATEST_TRAINING_DATA_FORMAT_VERSION}. "
+                f"Rasa Open Source will read the file as a version "
+                f"{LATEST_TRAINING_DATA_FORMAT_VERSION} file. "
+                f"Please update your version key to "
+                f"{LATEST_TRAINING_DATA_FORMAT_VERSION}. "
+                f"See {DOCS_URL_TRAINING_DATA}."
+            )
+
+        if latest_version >= parsed_version:
+            return True
+
+    except (TypeError, version.InvalidVersion):
+        wechatter.shared.utils.io.raise_warning(
+            f"Training data file {filename} must specify "
+            f"'{KEY_TRAINING_DATA_FORMAT_VERSION}' as string, for example:\n"
+            f"{KEY_TRAINING_DATA_FORMAT_VERSION}: "
+            f"'{LATEST_TRAINING_DATA_FORMAT_VERSION}'\n"
+            f"Rasa Open Source will read the file as a "
+            f"version '{LATEST_TRAINING_DATA_FORMAT_VERSION}' file.",
+            docs=DOCS_URL_TRAINING_DATA,
+        )
+        return True
+
+    wechatter.shared.utils.io.raise_warning(
+        f"Training data file {filename} has a greater "
+        f"format version than your Rasa Open Source installation: "
+        f"{version_value} > {LATEST_TRAINING_DATA_FORMAT_VERSION}. "
+        f"Please consider updating to "
+        f"the latest version of Rasa Open Source."
+        f"This file will be skipped.",
+        docs=DOCS_URL_TRAINING_DATA,
+    )
+    return False
@@ -18,12 +18,11 @@
 
 import os
 import logging
-from functools import reduce
 from typing import Text, Set, Dict, Optional, List, Union, Any
 
 import wechatter.shared.data
 import wechatter.shared.utils.io
-from wechatter.shared.dm.domain import Domain
+from wechatter.shared.dm.domain import Domain, DomainBuilder
 
 
 logger = logging.getLogger(__name__)
@@ -190,10 +189,10 @@ class MultiSkillImporter(TrainingDataImporter):
 
     async def get_domain(self) -> Domain:
         """Retrieves model domain (see parent class for full docstring)."""
-        domains = [Domain.load(path) for path in self._domain_paths]
-        return reduce(
-            lambda merged, other: merged.merge(other), domains, Domain.empty()
-        )
+        builder = DomainBuilder()
+        for path in self._domain_paths:
+            builder.add(Domain.load(path))
+        return builder.build()
 
     async def get_stories(
         self,
@@ -14,18 +14,37 @@
 """
 
 import aiohttp
+import asyncio
 import logging
 import os
+import weakref
 from aiohttp.client_exceptions import ContentTypeError
 from sanic.request import Request
 from typing import Any, Optional, Text, Dict
 
 import wechatter
 import wechatter.shared.utils.io
-from wechatter.dialog_config import DEFAULT_REQUEST_TIMEOUT
+from wechatter.dialog_config import (
+    DEFAULT_REQUEST_TIMEOUT,
+    DEFAULT_CONNECTION_LIMIT,
+    DEFAULT_CONNECTION_LIMIT_PER_HOST,
+    DEFAULT_KEEPALIVE_TIMEOUT,
+    DEFAULT_REQUEST_RETRIES,
+    DEFAULT_REQUEST_RETRY_BACKOFF,
+)
 
 logger = logging.getLogger(__name__)
 
+# endpoints which currently hold an open pooled session (see `close_sessions`),
+# keyed by `id` as `EndpointConfig`s are not hashable
+_endpoints_with_open_sessions: "weakref.WeakValueDictionary[int, EndpointConfig]" = (
+    weakref.WeakValueDictionary()
+)
+
+# requests with these methods can be repeated without changing the result, hence
+# they are retried on any connection error (see `EndpointConfig.request`)
+IDEMPOTENT_METHODS = frozenset(["get", "head", "options", "put", "delete", "trace"])
+
 
 def read_endpoint_config(
         filename: Text, endpoint_type: Text
@@ -51,6 +70,32 @@ def read_endpoint_config(
         return None
 
 
+def concat_url(base: Text, subpath: Optional[Text]) -> Text:
+    """Append a subpath to a base url.
+
+    Strips leading slashes from the subpath if necessary. This behaves
+    differently than `urlparse.urljoin` and will not treat the subpath
+    as a base url if it starts with `/` but will always append it to the
+    `base`.
+
+    Args:
+        base: Base URL.
+        subpath: Optional path to append to the base URL.
+
+    Returns:
+        Concatenated URL with base and subpath.
+    """
+    if not subpath:
+        return base
+
+    url = base
+    if not base.endswith("/"):
+        url += "/"
+    if subpath.startswith("/"):
+        subpath = subpath[1:]
+    return url + subpath
+
+
 class EndpointConfig:
     """
     外部端点配置
@@ -64,6 +109,11 @@ class EndpointConfig:
             basic_auth: Dict[Text, Text] = None,
             token: Optional[Text] = None,
             token_name: Text = "token",
+            connection_limit: int = DEFAULT_CONNECTION_LIMIT,
+            connection_limit_per_host: int = DEFAULT_CONNECTION_LIMIT_PER_HOST,
+            keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT,
+            retries: int = DEFAULT_REQUEST_RETRIES,
+            retry_backoff: float = DEFAULT_REQUEST_RETRY_BACKOFF,
             **kwargs,
     ):
         self.url = url
@@ -72,10 +122,25 @@ class EndpointConfig:
         self.basic_auth = basic_auth
         self.token = token
         self.token_name = token_name
+        self.connection_limit = connection_limit
+        self.connection_limit_per_host = connection_limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
         self.type = kwargs.pop("store_type", kwargs.pop("type", None))
         self.kwargs = kwargs
 
-    def session(self) -> aiohttp.ClientSession:
+        # long-lived session which is shared by all requests, see `pooled_session`
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sessions_created = 0
+        self._requests = 0
+        self._requests_in_flight = 0
+        self._retries = 0
+
+    def session(
+            self, connector: Optional[aiohttp.BaseConnector] = None
+    ) -> aiohttp.ClientSession:
         # create authentication parameters
         if self.basic_auth:
             auth = aiohttp.BasicAuth(
@@ -88,8 +153,76 @@ class EndpointConfig:
             headers=self.headers,
             auth=auth,
             timeout=aiohttp.ClientTimeout(total=DEFAULT_REQUEST_TIMEOUT),
+            connector=connector,
         )
 
+    def pooled_session(self) -> aiohttp.ClientSession:
+        """Returns the session which is shared by all requests to this endpoint.
+
+        The session is created on first use, so that it's bound to the event loop
+        of the server process. Keeping the session open keeps its connection pool,
+        DNS cache and keep-alive connections.
+        """
+        loop = asyncio.get_event_loop()
+        if (
+                self._session is None
+                or self._session.closed
+                or self._session_loop is not loop
+        ):
+            self._close_session_of_other_loop()
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                limit_per_host=self.connection_limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = self.session(connector)
+            self._session_loop = loop
+            self._sessions_created += 1
+            _endpoints_with_open_sessions[id(self)] = self
+
+        return self._session
+
+    def _close_session_of_other_loop(self) -> None:
+        # the session of a previous event loop (e.g. of a previous test or of the
+        # server process before a fork) can only be closed on that loop
+        session, loop = self._session, self._session_loop
+        if session is None or session.closed or loop is None:
+            return
+
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        elif not loop.is_closed():
+            # closed as soon as the loop runs again
+            loop.create_task(session.close())
+        else:
+            # the connections died with their loop, don't leak the session
+            session.detach()
+
+    async def close(self) -> None:
+        """Closes the pooled session of this endpoint (if any)."""
+        _endpoints_with_open_sessions.pop(id(self), None)
+
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
+    def pool_metrics(self) -> Dict[Text, Any]:
+        """Returns usage statistics of the pooled session for monitoring."""
+        return {
+            "requests": self._requests,
+            "requests_in_flight": self._requests_in_flight,
+            "retries": self._retries,
+            "sessions_created": self._sessions_created,
+            "connection_limit": self.connection_limit,
+            "connection_limit_per_host": self.connection_limit_per_host,
+            "pool_utilisation": (
+                self._requests_in_flight / self.connection_limit
+                if self.connection_limit
+                else None
+            ),
+        }
+
     def combine_parameters(
             self, kwargs: Optional[Dict[Text, Any]] = None
     ) -> Dict[Text, Any]:
@@ -114,6 +247,12 @@ class EndpointConfig:
     ) -> Optional[Any]:
         """Send a HTTP request to the endpoint. Return json response, if available.
 
+        Requests use the pooled session of the endpoint and are retried with an
+        exponential backoff on connection errors if `retries` is configured.
+        Requests with methods which aren't idempotent (e.g. `POST`) are only retried
+        if the connection couldn't be established, as the endpoint might have
+        received them otherwise.
+
         All additional arguments will get passed through
         to aiohttp's `session.request`."""
 
@@ -127,22 +266,53 @@ class EndpointConfig:
             del kwargs["headers"]
 
         url = concat_url(self.url, subpath)
-        async with self.session() as session:
-            async with session.request(
-                    method,
-                    url,
-                    headers=headers,
-                    params=self.combine_parameters(kwargs),
-                    **kwargs,
-            ) as response:
-                if response.status >= 400:
-                    raise ClientResponseError(
-                        response.status, response.reason, await response.content.read()
-                    )
-                try:
-                    return await response.json()
-                except ContentTypeError:
-                    return None
+        params = self.combine_parameters(kwargs)
+        session = self.pooled_session()
+
+        retry_errors = (
+            (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+            if method.lower() in IDEMPOTENT_METHODS
+            else aiohttp.ClientConnectorError
+        )
+
+        attempt = 0
+        while True:
+            self._requests += 1
+            self._requests_in_flight += 1
+            try:
+                async with session.request(
+                        method,
+                        url,
+                        headers=headers,
+                        params=params,
+                        **kwargs,
+                ) as response:
+                    if response.status >= 400:
+                        raise ClientResponseError(
+                            response.status,
+                            response.reason,
+                            await response.content.read(),
+                        )
+                    try:
+                        return await response.json()
+                    except ContentTypeError:
+                        return None
+            except retry_errors as e:
+                if attempt >= self.retries:
+                    raise
+
+                delay = self.retry_backoff * 2 ** attempt
+                attempt += 1
+                self._retries += 1
+                logger.debug(
+                    f"Request to '{url}' failed ({e}). Retrying in {delay} seconds "
+                    f"(attempt {attempt} of {self.retries})."
+                )
+            finally:
+                self._requests_in_flight -= 1
+
+            # the request isn't in flight while waiting for the retry
+            await asyncio.sleep(delay)
 
     @classmethod
     def from_dict(cls, data) -> "EndpointConfig":
@@ -156,6 +326,11 @@ class EndpointConfig:
             self.basic_auth,
             self.token,
             self.token_name,
+            self.connection_limit,
+            self.connection_limit_per_host,
+            self.keepalive_timeout,
+            self.retries,
+            self.retry_backoff,
             **self.kwargs,
         )
 
@@ -176,6 +351,22 @@ class EndpointConfig:
         return not self.__eq__(other)
 
 
+class ClientResponseError(aiohttp.ClientError):
+    """Raised if the endpoint responds with an error status."""
+
+    def __init__(self, status: int, message: Text, text: Text) -> None:
+        self.status = status
+        self.message = message
+        self.text = text
+        super().__init__(f"{status}, {message}, body='{text}'")
+
+
+async def close_sessions() -> None:
+    """Closes the pooled sessions of all endpoints, e.g. on server shutdown."""
+    for endpoint in list(_endpoints_with_open_sessions.values()):
+        await endpoint.close()
+
+
 def bool_arg(request: Request, name: Text, default: bool = True) -> bool:
     """Returns a passed boolean argument of the request or a default.
 
@@ -12,3 +12,57 @@
 @Desc    :
  
 """
+
+import json
+import os
+import shutil
+from typing import Any, Dict, Optional, Text
+
+
+class TempDirectoryPath(str):
+    """Represents a path to an temporary directory. When used as a context
+    manager, it erases the contents of the directory on exit.
+    """
+
+    def __enter__(self) -> "TempDirectoryPath":
+        return self
+
+    def __exit__(self, _exc: Any, _value: Any, _tb: Any) -> None:
+        if os.path.exists(self):
+            shutil.rmtree(self)
+
+
+def read_json_state(path: Text) -> Optional[Dict[Text, Any]]:
+    """Reads a JSON state file which is shared between processes.
+
+    Returns:
+        The content of the file or `None` if it doesn't exist (yet).
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json_state(path: Text, content: Dict[Text, Any]) -> None:
+    """Writes a JSON state file which is shared between processes.
+
+    The content is written to a temporary file first so that readers in other
+    processes never see partial content.
+    """
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        json.dump(content, f)
+    os.replace(temporary_path, path)
+
+
+def is_process_running(pid: int) -> bool:
+    """Checks if a process which wrote a state file is still running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True